@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Command line entry point that builds the whole project hierarchy in one
+pass: epics, stories and tasks are generated in memory as a pipeline.
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+from classes.exporters import SINKS, create_sink, default_path, export_project
+from functions.cli import add_agent_arguments, load_config, print_in_color
+
+# The agent, its backends and the HTTP client take longer to import than
+# an export takes to run, so each subcommand imports what it needs.
+# pylint: disable=import-outside-toplevel
+
+
+def run(args: argparse.Namespace) -> None:
+    """Generate epics, stories and tasks for the configured project."""
+    import asyncio
+
+    from dotenv import load_dotenv
+
+    from classes.incremental import save_state, state_path
+    from classes.model import Project
+    from functions.functions import close_agent, create_agent
+
+    load_dotenv()
+    config = load_config(args.config)
+
+    project = Project(config["PROJECT_NAME"], config["PROJECT_DESCRIPTION"])
+    openai_agent = create_agent(
+        config, args, os.environ.get("OPENAI_API_KEY")
+    )
+
+    try:
+        print_in_color("CONFIGURATION", "BLUE")
+        print(f"LLM   : {openai_agent.model}")
+
+        print_in_color("PROJECT", "CYAN")
+        print(f"{project.name}: {project.description}")
+
+        print_in_color("PROCESSING", "MAGENTA")
+
+        if openai_agent.journal is not None:
+            project = openai_agent.journal.restore(project)
+
+        asyncio.run(openai_agent.arun(project, args.checkpoint, args.output))
+        save_state(project, state_path(args.output))
+    finally:
+        close_agent(openai_agent)
+
+
+def regenerate(args: argparse.Namespace) -> None:
+    """Regenerate chosen or stale subtrees of a project file in place."""
+    import asyncio
+
+    from dotenv import load_dotenv
+
+    from classes.incremental import (
+        Regenerator,
+        load_state,
+        parse_story_path,
+        save_state,
+        stale_targets,
+        state_path,
+    )
+    from classes.storage import load_project, save_project
+    from functions.functions import close_agent, create_agent
+
+    load_dotenv()
+    config = load_config(args.config)
+    project = load_project(args.input)
+    state = load_state(state_path(args.input))
+
+    epic_ids = list(args.epic or [])
+    try:
+        story_paths = [parse_story_path(path) for path in args.story or []]
+    except ValueError as e:
+        sys.exit(str(e))
+    for epic_id in epic_ids:
+        if project.get_epic(epic_id) is None:
+            sys.exit(f"No epic {epic_id} in {args.input}")
+    for epic_id, story_id in story_paths:
+        if project.find(epic_id, story_id) is None:
+            sys.exit(f"No story {epic_id}.{story_id} in {args.input}")
+    if not epic_ids and not story_paths:
+        if state is None:
+            save_state(project, state_path(args.input))
+            print(
+                f"No state recorded for {args.input}; its current context "
+                "is now the baseline for later edits."
+            )
+            return
+        epic_ids, story_paths = stale_targets(project, state)
+    else:
+        # Explicit targets ask for new content even if nothing changed.
+        args.refresh = True
+
+    print_in_color("TARGETS", "BLUE")
+    print(f"Epics  : {', '.join(map(str, epic_ids)) or '-'}")
+    print(
+        "Stories: "
+        + (", ".join(f"{e}.{s}" for e, s in story_paths) or "-")
+    )
+    if args.dry_run or not (epic_ids or story_paths):
+        return
+
+    # Regenerated nodes replace journaled ones, so the journal is left off.
+    config["JOURNAL_PATH"] = None
+    args.journal = None
+    openai_agent = create_agent(
+        config, args, os.environ.get("OPENAI_API_KEY")
+    )
+    print_in_color("PROCESSING", "MAGENTA")
+    try:
+        asyncio.run(
+            Regenerator(openai_agent, state).arun(
+                project, epic_ids, story_paths
+            )
+        )
+    finally:
+        close_agent(openai_agent)
+
+    output = args.output or args.input
+    save_project(project, output)
+    save_state(project, state_path(output))
+    print(f"Project written to {output}")
+
+
+def batch(args: argparse.Namespace) -> None:
+    """Generate every project of a directory or manifest in parallel."""
+    from dotenv import load_dotenv
+
+    from functions.batch import (
+        load_definitions,
+        run_batch,
+        select_shard,
+        write_report,
+    )
+
+    load_dotenv()
+    config = load_config(args.config)
+    projects = select_shard(load_definitions(args.definitions), args.shard)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print_in_color("CONFIGURATION", "BLUE")
+    print(f"LLM   : {config['OPENAI_MODEL'].lower()}")
+    workers = args.workers or os.cpu_count()
+    print(f"JOBS  : {len(projects)} projects, {workers} workers")
+
+    print_in_color("PROCESSING", "MAGENTA")
+    options = {key: value for key, value in vars(args).items()}
+    del options["func"]
+    summaries = run_batch(
+        projects, args.output_dir, config, options, args.workers
+    )
+
+    print_in_color("SUMMARY", "CYAN")
+    print(f"Report written to {write_report(summaries, args.output_dir)}")
+    if any(summary["status"] != "ok" for summary in summaries):
+        sys.exit(1)
+
+
+def jira(args: argparse.Namespace) -> None:
+    """Create the issues of a generated project in Jira."""
+    from dotenv import load_dotenv
+
+    from classes.storage import load_project
+    from functions.functions import create_jira_exporter
+
+    load_dotenv()
+    config = load_config(args.config)
+    if args.url:
+        config["JIRA_URL"] = args.url
+    if args.project_key:
+        config["JIRA_PROJECT_KEY"] = args.project_key
+    project = load_project(args.input)
+    exporter = create_jira_exporter(config, os.environ.get("JIRA_API_TOKEN"))
+
+    print_in_color("CONFIGURATION", "BLUE")
+    print(f"JIRA  : {exporter.client.url} ({exporter.project_key})")
+
+    print_in_color("PROCESSING", "MAGENTA")
+    try:
+        result = exporter.export(project)
+    finally:
+        exporter.client.close()
+
+    print_in_color("SUMMARY", "CYAN")
+    print(
+        f"{len(result.keys)} issues created with {result.requests} requests "
+        f"in {result.elapsed:.2f}s"
+    )
+    for path, message in result.errors:
+        print(f"Failed {'.'.join(map(str, path))}: {message}")
+    if result.errors:
+        sys.exit(1)
+
+
+def export(args: argparse.Namespace) -> None:
+    """Write a project file to several formats with a single parse."""
+    outputs = dict(
+        (name, default_path(args.input, name, args.output_dir))
+        for name in args.format or []
+    )
+    for output in args.output or []:
+        name, _, path = output.partition("=")
+        if name not in SINKS:
+            sys.exit(
+                f"Unknown export format: {name} "
+                f"(expected one of {', '.join(sorted(SINKS))})"
+            )
+        outputs[name] = path or default_path(args.input, name, args.output_dir)
+    if not outputs:
+        sys.exit("Nothing to export: pass --format or --output")
+    os.makedirs(args.output_dir or ".", exist_ok=True)
+
+    try:
+        sinks = [create_sink(name, path) for name, path in outputs.items()]
+    except (ImportError, ValueError) as e:
+        sys.exit(str(e))
+    count = export_project(args.input, sinks, parallel=not args.sequential)
+    for name, path in outputs.items():
+        print(f"{name:<9} {path}")
+    print(f"{count} nodes exported")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parse the command line and dispatch to a subcommand."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="generate epics, stories and tasks in one pass"
+    )
+    run_parser.add_argument(
+        "--config", default="config.yaml", help="path to the config file"
+    )
+    run_parser.add_argument(
+        "--output", default="tasks.yaml", help="path of the resulting YAML"
+    )
+    run_parser.add_argument(
+        "--checkpoint",
+        help="optional YAML path rewritten each time an epic is complete",
+    )
+    add_agent_arguments(run_parser)
+    run_parser.set_defaults(func=run)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="generate many projects in parallel worker processes"
+    )
+    batch_parser.add_argument(
+        "definitions",
+        help="directory of project YAML files, or a manifest listing them",
+    )
+    batch_parser.add_argument(
+        "--config", default="config.yaml", help="path to the config file"
+    )
+    batch_parser.add_argument(
+        "--output-dir",
+        default="output",
+        help="directory receiving one subdirectory per project",
+    )
+    batch_parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    batch_parser.add_argument(
+        "--shard",
+        help="process only shard INDEX/COUNT of the projects, "
+        "to split a batch across machines",
+    )
+    add_agent_arguments(batch_parser)
+    batch_parser.set_defaults(func=batch)
+
+    jira_parser = subparsers.add_parser(
+        "jira", help="create the issues of a project file in Jira"
+    )
+    jira_parser.add_argument(
+        "input",
+        nargs="?",
+        default="tasks.yaml",
+        help="project YAML or JSON lines file (default: tasks.yaml)",
+    )
+    jira_parser.add_argument(
+        "--config", default="config.yaml", help="path to the config file"
+    )
+    jira_parser.add_argument("--url", help="Jira site (default: JIRA_URL)")
+    jira_parser.add_argument(
+        "--project-key", help="Jira project key (default: JIRA_PROJECT_KEY)"
+    )
+    jira_parser.set_defaults(func=jira)
+
+    regenerate_parser = subparsers.add_parser(
+        "regenerate",
+        help="regenerate chosen or stale subtrees of a project file",
+    )
+    regenerate_parser.add_argument(
+        "input",
+        nargs="?",
+        default="tasks.yaml",
+        help="project YAML or JSON lines file (default: tasks.yaml)",
+    )
+    regenerate_parser.add_argument(
+        "--epic",
+        type=int,
+        action="append",
+        help="regenerate the stories and tasks of this epic; may be repeated",
+    )
+    regenerate_parser.add_argument(
+        "--story",
+        action="append",
+        metavar="EPIC.STORY",
+        help="regenerate the tasks of this story, e.g. 2.4; may be repeated",
+    )
+    regenerate_parser.add_argument(
+        "--config", default="config.yaml", help="path to the config file"
+    )
+    regenerate_parser.add_argument(
+        "--output", help="path of the updated project (default: the input)"
+    )
+    regenerate_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only list the subtrees that would be regenerated",
+    )
+    add_agent_arguments(regenerate_parser)
+    regenerate_parser.set_defaults(func=regenerate)
+
+    export_parser = subparsers.add_parser(
+        "export", help="convert a project file to CSV, Markdown, Parquet..."
+    )
+    export_parser.add_argument(
+        "input", help="project YAML or JSON lines file, e.g. tasks.yaml"
+    )
+    export_parser.add_argument(
+        "--format",
+        nargs="+",
+        choices=sorted(SINKS),
+        help="formats written next to the input name in --output-dir",
+    )
+    export_parser.add_argument(
+        "--output",
+        action="append",
+        metavar="FORMAT=PATH",
+        help="a format written to an explicit path; may be repeated",
+    )
+    export_parser.add_argument(
+        "--output-dir", default="", help="directory of the derived paths"
+    )
+    export_parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="write the formats one after the other in the main thread",
+    )
+    export_parser.set_defaults(func=export)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks for the hierarchy generation pipeline."""
@@ -0,0 +1,94 @@
+"""Benchmark of the Jira export against the local mock server.
+
+A synthetic project of the given scale (epics, each with ten stories of
+ten tasks) is pushed through the bulk endpoint, and the wall time, the
+number of requests and the issues created per second are reported.
+
+Run from the repository root:
+    python -m benchmarks.bench_jira --scales 10 100 --latency 0.05
+"""
+import argparse
+import json
+from typing import List, Optional
+
+from benchmarks.jira_server import JiraMockServer
+from classes import Epic, Project, Story, Task
+from classes.jira import JiraClient, JiraExporter
+
+PROJECT_KEY = "BENCH"
+
+
+def synthetic_project(
+    epics: int, stories: int = 10, tasks: int = 10
+) -> Project:
+    """Builds a project with ``epics * (1 + stories * (1 + tasks))`` nodes."""
+    project = Project("Benchmark", "Synthetic project")
+    for epic_id in range(1, epics + 1):
+        epic = Epic(epic_id, f"Epic {epic_id}", f"Epic {epic_id} description")
+        for story_id in range(1, stories + 1):
+            story = Story(
+                story_id,
+                f"Story {epic_id}.{story_id}",
+                f"Story {epic_id}.{story_id} description",
+            )
+            story.tasks = [
+                Task(
+                    task_id,
+                    f"Task {epic_id}.{story_id}.{task_id}",
+                    f"Task {epic_id}.{story_id}.{task_id} description",
+                )
+                for task_id in range(1, tasks + 1)
+            ]
+            epic.stories.append(story)
+        project.epics.append(epic)
+    return project
+
+
+def run(
+    epics: int,
+    latency: float,
+    concurrency: int,
+    throttle_every: Optional[int] = None,
+) -> dict:
+    """Exports one synthetic project to a fresh mock server."""
+    project = synthetic_project(epics)
+    with JiraMockServer(
+        latency=latency, throttle_every=throttle_every
+    ) as server:
+        client = JiraClient(server.url, pool_size=concurrency)
+        exporter = JiraExporter(client, PROJECT_KEY, concurrency=concurrency)
+        try:
+            result = exporter.export(project)
+        finally:
+            client.close()
+        return {
+            "epics": epics,
+            "concurrency": concurrency,
+            "issues": len(result.keys),
+            "errors": len(result.errors),
+            "requests": result.requests,
+            "http_requests": server.requests,
+            "wall_s": round(result.elapsed, 3),
+            "issues_per_s": round(len(result.keys) / result.elapsed, 1),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Runs the benchmark and prints one JSON line per scale."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--throttle-every", type=int)
+    args = parser.parse_args(argv)
+    for epics in args.scales:
+        for concurrency in args.concurrency:
+            print(
+                json.dumps(
+                    run(epics, args.latency, concurrency, args.throttle_every)
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Benchmark of the hierarchy generation at synthetic scales.
+
+Every run replays canned responses through the real agents and reports
+wall time, calls issued, tokens consumed and peak traced memory. Modes:
+
+    stages        the create_*.py flow: synchronous agent, the project written
+                  and reloaded between the epic, story and task stages in
+                  the intermediate ``--format``
+    async-stages  the same flow with AsyncOpenAIAgent
+    pipeline      the single-pass ``babyagi run`` flow
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --scales 10 100 1000 --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+
+from benchmarks.replay import ReplayProvider, load_fixtures
+from classes import (
+    AsyncOpenAIAgent,
+    OpenAIAgent,
+    Project,
+    RateLimiter,
+    Scheduler,
+)
+from classes.storage import load_project, save_project
+
+MODES = ("stages", "async-stages", "pipeline")
+PROJECT_NAME = "CryptoNews"
+
+
+def reload(project: Project, path: str) -> Project:
+    """Writes a project to a file and reads it back, as the scripts do."""
+    save_project(project, path)
+    return load_project(path)
+
+
+def run_stages(
+    agent: OpenAIAgent, project: Project, workdir: str, fmt: str = "yaml"
+) -> Project:
+    """Runs the three generator stages with the synchronous agent."""
+    project = reload(agent.create_epics(project), f"{workdir}/epics.{fmt}")
+    project = reload(
+        agent.create_stories(project), f"{workdir}/stories.{fmt}"
+    )
+    return reload(agent.create_tasks(project), f"{workdir}/tasks.yaml")
+
+
+async def run_async_stages(
+    agent: AsyncOpenAIAgent,
+    project: Project,
+    workdir: str,
+    fmt: str = "yaml",
+) -> Project:
+    """Runs the three generator stages with the asynchronous agent."""
+    project = reload(
+        await agent.acreate_epics(project), f"{workdir}/epics.{fmt}"
+    )
+    project = reload(
+        await agent.acreate_stories(project), f"{workdir}/stories.{fmt}"
+    )
+    return reload(await agent.acreate_tasks(project), f"{workdir}/tasks.yaml")
+
+
+def run_pipeline(
+    agent: AsyncOpenAIAgent, project: Project, workdir: str
+) -> Project:
+    """Runs the single-pass pipeline."""
+    project = asyncio.run(agent.arun(project))
+    project.save_to_yaml(f"{workdir}/tasks.yaml")
+    return project
+
+
+def measure(
+    mode: str, scale: int, args: argparse.Namespace, fixtures: dict
+) -> dict:
+    """Generates a project of about ``scale`` tasks and measures the run.
+
+    Every level gets the same number of items, the rounded cube root of the
+    scale, so the number of tasks is close to ``scale``.
+    """
+    items = max(1, round(scale ** (1 / 3)))
+    provider = ReplayProvider(
+        fixtures,
+        items=items,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    options = {"batch_naming": args.batch_naming, "provider": provider}
+    if args.rpm:
+        options["rate_limiter"] = RateLimiter(requests_per_minute=args.rpm)
+    if mode == "stages":
+        agent = OpenAIAgent("replay", 0.1, 3000, None, **options)
+    else:
+        scheduler = Scheduler(
+            args.concurrency, priority=args.scheduler == "priority"
+        )
+        agent = AsyncOpenAIAgent(
+            "replay",
+            0.1,
+            3000,
+            None,
+            scheduler=scheduler,
+            streaming=args.streaming,
+            **options,
+        )
+    agent.MAX_RETRIES = args.max_retries
+
+    project = Project(PROJECT_NAME, fixtures["epic"][0]["description"])
+    with tempfile.TemporaryDirectory() as workdir, open(
+        os.devnull, "w", encoding="utf-8"
+    ) as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        start = time.perf_counter()
+        if mode == "stages":
+            project = run_stages(agent, project, workdir, args.format)
+        elif mode == "async-stages":
+            project = asyncio.run(
+                run_async_stages(agent, project, workdir, args.format)
+            )
+        else:
+            project = run_pipeline(agent, project, workdir)
+        wall_time = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "scale": scale,
+        "tasks": sum(
+            len(story.tasks)
+            for epic in project.epics
+            for story in epic.stories
+        ),
+        "wall_time": round(wall_time, 3),
+        "calls": provider.calls,
+        "errors": provider.errors,
+        "prompt_tokens": provider.prompt_tokens,
+        "completion_tokens": provider.completion_tokens,
+        "peak_memory_mb": round(peak / 2**20, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the benchmark matrix and print one row per run."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--scales", type=int, nargs="+", default=[10, 100, 1000, 10000]
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per call"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="latency deviation"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="failing call ratio"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--scheduler",
+        choices=("priority", "fifo"),
+        default="priority",
+        help="order of the pending requests of the async modes",
+    )
+    parser.add_argument(
+        "--rpm", type=int, help="client-side requests per minute budget"
+    )
+    parser.add_argument("--max-retries", type=int, default=10)
+    parser.add_argument("--batch-naming", action="store_true")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="stream list responses in the async modes",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("yaml", "jsonl"),
+        default="yaml",
+        help="intermediate file format of the stages modes",
+    )
+    parser.add_argument("--yaml", default="tasks_old.yaml")
+    parser.add_argument("--csv", default="jira_output.csv")
+    parser.add_argument("--json", help="append results as JSON lines")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.yaml, args.csv)
+    header = (
+        f"{'mode':<13} {'scale':>6} {'tasks':>6} {'wall s':>8} "
+        f"{'calls':>7} {'errors':>6} {'tokens':>9} {'peak MB':>8}"
+    )
+    print(header)
+    for scale in args.scales:
+        for mode in args.modes:
+            result = measure(mode, scale, args, fixtures)
+            tokens = result["prompt_tokens"] + result["completion_tokens"]
+            print(
+                f"{mode:<13} {scale:>6} {result['tasks']:>6} "
+                f"{result['wall_time']:>8.3f} {result['calls']:>7} "
+                f"{result['errors']:>6} {tokens:>9} "
+                f"{result['peak_memory_mb']:>8.2f}"
+            )
+            if args.json:
+                with open(args.json, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Benchmark and regression guard of the command line startup time.
+
+Each command runs in a fresh interpreter, as CI hooks invoke it, and the
+median wall time over the repetitions is reported next to that of a bare
+interpreter. The difference is the cost of the command's imports and work.
+A probe run of each command then lists the heavy modules it imported.
+
+The run fails, with exit status 1, when a command imports a module of
+``FORBIDDEN`` it does not need, when its overhead exceeds ``--max-ms``, or
+when it is more than ``--tolerance`` slower than in a ``--baseline`` file
+written earlier with ``--save``.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --repeat 20 --max-ms 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+# Modules that only the generation and Jira subcommands may import.
+FORBIDDEN = ("openai", "tiktoken", "chromadb", "llama_cpp", "requests")
+
+# Runs a command in the current interpreter, then prints the forbidden
+# modules it imported, even if the command exits.
+PROBE = """\
+import json, runpy, sys
+command, forbidden = json.loads(sys.argv[1]), set(json.loads(sys.argv[2]))
+try:
+    if command[0] == "-c":
+        sys.argv = ["-c"]
+        exec(command[1], {"__name__": "__main__"})
+    else:
+        sys.argv = command
+        runpy.run_path(command[0], run_name="__main__")
+finally:
+    loaded = {name.partition(".")[0] for name in sys.modules}
+    print(json.dumps(sorted(loaded & forbidden)))
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def commands(input_path: str, output_dir: str) -> Dict[str, List[str]]:
+    """The command lines measured, run from the repository root."""
+    return {
+        "help": ["babyagi.py", "--help"],
+        "export": [
+            "babyagi.py",
+            "export",
+            input_path,
+            "--format",
+            "csv",
+            "markdown",
+            "--output-dir",
+            output_dir,
+        ],
+        "yaml2csv": [
+            "-c",
+            "from yaml2csv import yaml_to_csv; "
+            f"yaml_to_csv({input_path!r}, "
+            f"{os.path.join(output_dir, 'yaml2csv.csv')!r})",
+        ],
+    }
+
+
+def time_command(argv: List[str], repeat: int) -> float:
+    """Returns the median wall time of a command in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *argv],
+            check=True,
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def imported(argv: List[str]) -> List[str]:
+    """Returns the forbidden modules a command imports."""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(argv), json.dumps(FORBIDDEN)],
+        check=True,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(input_path: str, repeat: int) -> dict:
+    """Times every command against a bare interpreter."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        interpreter = time_command(["-c", "pass"], repeat)
+        results = {"interpreter_ms": round(interpreter, 1), "commands": {}}
+        for name, argv in commands(input_path, output_dir).items():
+            wall = time_command(argv, repeat)
+            results["commands"][name] = {
+                "wall_ms": round(wall, 1),
+                "overhead_ms": round(wall - interpreter, 1),
+                "imported": imported(argv),
+            }
+    return results
+
+
+def check(
+    results: dict,
+    max_ms: Optional[float] = None,
+    baseline: Optional[dict] = None,
+    tolerance: float = 0.25,
+) -> List[str]:
+    """Lists the regressions of a run."""
+    failures = []
+    for name, result in results["commands"].items():
+        if result["imported"]:
+            failures.append(
+                f"{name} imports {', '.join(result['imported'])}"
+            )
+        if max_ms is not None and result["overhead_ms"] > max_ms:
+            failures.append(
+                f"{name} takes {result['overhead_ms']:.1f} ms "
+                f"over the interpreter, more than {max_ms:.0f} ms"
+            )
+        previous = (baseline or {}).get("commands", {}).get(name)
+        if previous is not None:
+            limit = previous["overhead_ms"] * (1 + tolerance)
+            if result["overhead_ms"] > limit:
+                failures.append(
+                    f"{name} takes {result['overhead_ms']:.1f} ms "
+                    f"over the interpreter, up from "
+                    f"{previous['overhead_ms']:.1f} ms"
+                )
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the benchmark, print the timings and fail on a regression."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--input", default="tasks_old.yaml", help="project file exported"
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--max-ms", type=float, help="largest overhead allowed per command"
+    )
+    parser.add_argument(
+        "--baseline", help="JSON results of an earlier run to compare with"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="slowdown allowed over the baseline, as a ratio",
+    )
+    parser.add_argument("--save", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = measure(os.path.abspath(args.input), args.repeat)
+    print(f"{'command':<10} {'wall ms':>8} {'overhead ms':>12}  imported")
+    print(f"{'python':<10} {results['interpreter_ms']:>8.1f}")
+    for name, result in results["commands"].items():
+        print(
+            f"{name:<10} {result['wall_ms']:>8.1f} "
+            f"{result['overhead_ms']:>12.1f}  "
+            f"{', '.join(result['imported']) or '-'}"
+        )
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    failures = check(results, args.max_ms, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Local stand-in for the Jira issue API.
+
+Serves the bulk create endpoint and issue lookups from memory, so the Jira
+export can be exercised offline. It validates what the real endpoint
+rejects most often: oversized batches, missing fields and unknown parents.
+Latency and throttling can be injected.
+
+Run from the repository root:
+    python -m benchmarks.jira_server --port 8080
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from classes.jira import BULK_PATH, MAX_BATCH_SIZE
+
+ISSUE_PATH = re.compile(r"^/rest/api/2/issue/([A-Z][A-Z0-9]*-\d+)$")
+
+
+class JiraMockServer:
+    """An in-memory Jira site served from a background thread.
+
+    Attributes:
+        issues: The created issues' fields by key.
+        latency: The delay added to every request in seconds.
+        throttle_every: Every n-th request is answered with HTTP 429, or
+            None to never throttle.
+        requests: The number of requests received.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        throttle_every: Optional[int] = None,
+    ):
+        self.issues: Dict[str, dict] = {}
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.requests = 0
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "JiraMockServer":
+        """Serves requests from a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serves requests from the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        """Stops serving and closes the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "JiraMockServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def count_request(self) -> bool:
+        """Counts a request and tells whether it is throttled."""
+        with self._lock:
+            self.requests += 1
+            return bool(
+                self.throttle_every
+                and self.requests % self.throttle_every == 0
+            )
+
+    def create(self, fields: dict) -> dict:
+        """Creates one issue, returning its reference or an error."""
+        errors = {}
+        project = (fields.get("project") or {}).get("key")
+        issue_type = (fields.get("issuetype") or {}).get("name")
+        if not project:
+            errors["project"] = "project is required"
+        if not issue_type:
+            errors["issuetype"] = "issue type is required"
+        if not fields.get("summary"):
+            errors["summary"] = "You must specify a summary of the issue."
+        parent = (fields.get("parent") or {}).get("key")
+        with self._lock:
+            if parent is not None and parent not in self.issues:
+                errors["parent"] = f"Issue {parent} does not exist."
+            if issue_type == "Sub-task" and parent is None:
+                errors["parent"] = "Sub-tasks must have a parent."
+            if errors:
+                return {"errors": errors}
+            number = self._counters.get(project, 0) + 1
+            self._counters[project] = number
+            key = f"{project}-{number}"
+            self.issues[key] = fields
+            issue_id = str(len(self.issues))
+        return {"id": issue_id, "key": key}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answers the requests of one connection."""
+
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:  # pylint: disable=W0221
+                """Keeps the console quiet."""
+
+            def reply(self, status: int, body, headers=None) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def throttled(self) -> bool:
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.count_request():
+                    self.reply(
+                        429,
+                        {"errorMessages": ["Rate limit exceeded."]},
+                        {"Retry-After": "0"},
+                    )
+                    return True
+                return False
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                if self.throttled():
+                    return
+                match = ISSUE_PATH.match(self.path)
+                fields = match and server.issues.get(match.group(1))
+                if not fields:
+                    self.reply(404, {"errorMessages": ["Issue not found."]})
+                    return
+                self.reply(200, {"key": match.group(1), "fields": fields})
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.throttled():
+                    return
+                if self.path != BULK_PATH:
+                    self.reply(404, {"errorMessages": ["Not found."]})
+                    return
+                updates = body.get("issueUpdates") or []
+                if len(updates) > MAX_BATCH_SIZE:
+                    self.reply(
+                        400,
+                        {
+                            "errorMessages": [
+                                f"At most {MAX_BATCH_SIZE} issues can be "
+                                "created in one request."
+                            ]
+                        },
+                    )
+                    return
+
+                issues, errors = [], []
+                for index, update in enumerate(updates):
+                    outcome = server.create(update.get("fields") or {})
+                    if "errors" in outcome:
+                        errors.append(
+                            {
+                                "status": 400,
+                                "elementErrors": {
+                                    "errorMessages": [],
+                                    "errors": outcome["errors"],
+                                },
+                                "failedElementNumber": index,
+                            }
+                        )
+                    else:
+                        outcome["self"] = (
+                            f"{server.url}/rest/api/2/issue/{outcome['id']}"
+                        )
+                        issues.append(outcome)
+                status = 400 if updates and not issues else 201
+                self.reply(status, {"issues": issues, "errors": errors})
+
+        return Handler
+
+
+def main() -> None:
+    """Serves a mock Jira site until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added per request"
+    )
+    parser.add_argument(
+        "--throttle-every",
+        type=int,
+        help="answer every n-th request with HTTP 429",
+    )
+    args = parser.parse_args()
+    server = JiraMockServer(
+        args.host, args.port, args.latency, args.throttle_every
+    )
+    print(f"Mock Jira listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
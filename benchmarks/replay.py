@@ -0,0 +1,152 @@
+"""Replay backend serving canned responses with injected latency and errors.
+
+The canned epics, stories and tasks come from the sample project files in
+the repository, so list lengths and text sizes match real runs.
+"""
+import asyncio
+import csv
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import yaml
+
+from classes.errors import ProviderError
+from classes.providers import Completion, FakeProvider
+
+
+def load_fixtures(
+    yaml_path: str = "tasks_old.yaml", csv_path: str = "jira_output.csv"
+) -> Dict[str, List[Dict[str, str]]]:
+    """Collects sample names and descriptions for every level.
+
+    Args:
+        yaml_path: A project file produced by the generators.
+        csv_path: A Jira CSV export.
+
+    Returns:
+        A mapping of "epic", "story" and "task" to lists of nodes with a
+        "name" and a "description".
+    """
+    fixtures = {"epic": [], "story": [], "task": []}
+    with open(yaml_path, "r", encoding="utf-8") as file:
+        project = yaml.safe_load(file)["project"]
+    for epic in project["epics"]:
+        fixtures["epic"].append(epic)
+        for story in epic.get("stories") or []:
+            fixtures["story"].append(story)
+            fixtures["task"].extend(story.get("tasks") or [])
+
+    with open(csv_path, "r", encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            level = row["Type"].lower()
+            if level in fixtures:
+                fixtures[level].append(
+                    {"name": row["Title"], "description": row["Description"]}
+                )
+    return fixtures
+
+
+class ReplayProvider(FakeProvider):
+    """A FakeProvider answering with fixture texts, slowly and unreliably.
+
+    Attributes:
+        fixtures: The sample nodes per level, see ``load_fixtures``.
+        latency: The mean delay of a request in seconds.
+        jitter: The maximum deviation from the mean delay in seconds.
+        error_rate: The probability that a request fails with a retryable
+            error.
+        prompt_tokens: The number of prompt tokens served.
+        completion_tokens: The number of completion tokens served.
+        errors: The number of injected errors.
+    """
+
+    def __init__(
+        self,
+        fixtures: Dict[str, List[Dict[str, str]]],
+        items: int = 3,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = 0,
+    ):
+        super().__init__(items)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def default_response(self, prompt: str) -> str:
+        if "short name" in prompt:
+            return super().default_response(prompt)
+
+        level = "task"
+        if "create epics" in prompt:
+            level = "epic"
+        elif "create user stories" in prompt:
+            level = "story"
+        samples = self.fixtures[level]
+        offset = len(prompt)
+        lines = []
+        for number in range(1, self.items + 1):
+            sample = samples[(offset + number) % len(samples)]
+            lines.append(f"{number}. {sample['description']}")
+        return "\n".join(lines)
+
+    def _draw(self) -> tuple:
+        with self._random_lock:
+            delay = self.latency + self._random.uniform(
+                -self.jitter, self.jitter
+            )
+            fail = self._random.random() < self.error_rate
+        return max(delay, 0.0), fail
+
+    def _finish(self, fail: bool, completion: Completion) -> Completion:
+        with self._lock:
+            if fail:
+                self.errors += 1
+            else:
+                self.prompt_tokens += completion.prompt_tokens
+                self.completion_tokens += completion.completion_tokens
+        if fail:
+            raise ProviderError("Injected replay error", retry_after=0.0)
+        return completion
+
+    def complete(self, messages, model, temperature, max_tokens, n=1):
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        completion = super().complete(
+            messages, model, temperature, max_tokens, n
+        )
+        return self._finish(fail, completion)
+
+    async def acomplete(self, messages, model, temperature, max_tokens, n=1):
+        delay, fail = self._draw()
+        if delay:
+            await asyncio.sleep(delay)
+        completion = super().complete(
+            messages, model, temperature, max_tokens, n
+        )
+        return self._finish(fail, completion)
+
+    async def astream(self, messages, model, temperature, max_tokens, on_text):
+        # The delay is spread over the lines in proportion to their length,
+        # and a failing request breaks off halfway through its response.
+        delay, fail = self._draw()
+        completion = super().complete(messages, model, temperature, max_tokens)
+        text = completion.choices[0]
+        lines = text.splitlines(keepends=True)
+        for index, line in enumerate(lines):
+            if fail and index >= len(lines) // 2:
+                break
+            if delay:
+                await asyncio.sleep(delay * len(line) / len(text))
+            on_text(line)
+        return self._finish(fail, completion)
@@ -1,2 +1,49 @@
-"""classes/__init__.py"""
-from classes.classes import Epic, OpenAIAgent, Project, Story, Task
+"""classes/__init__.py
+
+The names below are imported from their modules on first access, so that
+``import classes.storage`` or ``from classes import Project`` does not load
+the agent and its language model backends.
+"""
+import importlib
+
+_EXPORTS = {
+    "ResponseCache": "classes.cache",
+    "AsyncOpenAIAgent": "classes.classes",
+    "OpenAIAgent": "classes.classes",
+    "PromptBudget": "classes.context",
+    "JiraExportError": "classes.errors",
+    "OpenAIAgentError": "classes.errors",
+    "ProviderError": "classes.errors",
+    "RetriesExhaustedError": "classes.errors",
+    "CallRecord": "classes.metrics",
+    "JsonLinesCollector": "classes.metrics",
+    "PrometheusCollector": "classes.metrics",
+    "UsageCollector": "classes.metrics",
+    "Epic": "classes.model",
+    "Project": "classes.model",
+    "Story": "classes.model",
+    "Task": "classes.model",
+    "Completion": "classes.providers",
+    "FakeProvider": "classes.providers",
+    "LlamaCppProvider": "classes.providers",
+    "LLMProvider": "classes.providers",
+    "OpenAIProvider": "classes.providers",
+    "RateLimiter": "classes.ratelimit",
+    "Scheduler": "classes.scheduler",
+    "ChatSession": "classes.session",
+    "SessionPolicy": "classes.session",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
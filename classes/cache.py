@@ -0,0 +1,209 @@
+"""Persistent response cache for the OpenAI agent.
+
+Responses are stored in a SQLite database keyed by a hash of everything that
+determines the completion: backend, model, temperature, max_tokens and
+prompt. The blocking SQLite calls of an async agent run in worker threads
+through ``aget`` and ``aset``.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class ResponseCache:
+    """A content-addressed on-disk cache of API responses.
+
+    Attributes:
+        path: The path to the SQLite database file.
+        max_entries: The maximum number of responses kept, or None.
+        max_age: The maximum age of a response in seconds, or None.
+        refresh: Whether to ignore cached responses and overwrite them.
+        hits: The number of lookups served from the cache.
+        misses: The number of lookups not found in the cache.
+    """
+
+    EVICT_EVERY = 100
+    WRITE_ATTEMPTS = 5
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        max_age: Optional[float] = None,
+        refresh: bool = False,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Worker processes of a batch run share the database: WAL mode lets
+        # readers proceed during a write and the timeout waits out the lock.
+        self._connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._connection.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        prompt: str,
+        n: int = 1,
+    ) -> str:
+        """Hashes the request parameters into a cache key.
+
+        Args:
+            provider: The identity of the backend, see
+                ``LLMProvider.cache_id``.
+            model: The name of the model.
+            temperature: The sampling temperature.
+            max_tokens: The maximum number of tokens in the output.
+            prompt: The prompt sent to the model.
+            n: The number of candidates the response was chosen from.
+
+        Returns:
+            A hex digest identifying the request.
+        """
+        params = [provider, model, temperature, max_tokens, prompt]
+        if n != 1:
+            params.append(n)
+        payload = json.dumps(params, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Looks up a cached response.
+
+        Args:
+            key: The cache key built by ``make_key``.
+
+        Returns:
+            The cached response, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            if self.refresh:
+                self.misses += 1
+                return None
+            row = self._connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or (
+                self.max_age is not None and now - row[1] > self.max_age
+            ):
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._write(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        return row[0]
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Looks up a cached response without blocking the event loop."""
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key: str, response: str) -> None:
+        """Stores a response in the cache.
+
+        Args:
+            key: The cache key built by ``make_key``.
+            response: The response to store.
+        """
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+            (key, response, now, now),
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    async def aset(self, key: str, response: str) -> None:
+        """Stores a response without blocking the event loop."""
+        await asyncio.to_thread(self.set, key, response)
+
+    def _write(self, statement: str, params: tuple) -> int:
+        """Runs and commits one write statement.
+
+        The timeout of the connection only waits for so long while other
+        processes sharing the database write, so a statement still finding
+        it locked is retried with a growing delay, then dropped: a response
+        missing from the cache only costs a new request.
+
+        Returns:
+            The number of rows changed.
+        """
+        for attempt in range(self.WRITE_ATTEMPTS):
+            try:
+                with self._lock:
+                    cursor = self._connection.execute(statement, params)
+                    self._connection.commit()
+                return cursor.rowcount
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                with self._lock:
+                    self._connection.rollback()
+                time.sleep(0.1 * 2**attempt)
+        return 0
+
+    def evict(self) -> int:
+        """Removes expired responses and trims the cache to its size limit.
+
+        Returns:
+            The number of responses removed.
+        """
+        removed = 0
+        if self.max_age is not None:
+            removed += self._write(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.max_age,),
+            )
+        if self.max_entries is not None:
+            removed += self._write(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._connection.close()
@@ -1,297 +1,802 @@
 """Classes for the user story generator.
 
 This module contains the classes and methods for generating user stories and
-epics based on descriptions. It uses the OpenAI API for generating story names.
+epics based on descriptions. It uses a language model, the OpenAI API by
+default, for generating story names.
 """
-import re
-from typing import List
+import asyncio
+import functools
+import json
+import os
+import time
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from classes.cache import ResponseCache
+from classes.context import PromptBudget, count_tokens
+from classes.dedup import Deduplicator
+from classes.errors import (
+    OpenAIAgentError,
+    ProviderError,
+    RetriesExhaustedError,
+)
+from classes.metrics import CallRecord
+from classes.model import Epic, Project, Story, Task
+from classes.parsing import (
+    ListStream,
+    json_prompt,
+    parse_json_items,
+    parse_list,
+)
+from classes.providers import LLMProvider, OpenAIProvider
+from classes.streaming import OrderedEpicWriter, ProjectYamlWriter
+from classes.ranking import CandidateRanker
+from classes.ratelimit import RateLimiter, backoff_delay
+from classes.scheduler import CURRENT_GROUP, DEFAULT_CONCURRENCY, Scheduler
+from classes.session import ChatSession, SessionPolicy
+
+if TYPE_CHECKING:
+    from classes.journal import Journal
 
-import openai
-import yaml
 
+class OpenAIAgent:
+    """Agent generating the project hierarchy with a language model.
 
-class Project:
-    """A Project class"""
+    The agent builds the prompts and parses the responses; the requests
+    themselves go through a provider, which is OpenAI unless another
+    backend is given.
 
-    def __init__(self, name: str, description: str, epics=None):
-        self.name = name
-        self.description = description
-        self.epics = epics if epics is not None else []
+    Attributes:
+        model: The name of the OpenAI model to use.
+        temperature: The randomness of the model's output.
+        max_tokens: The maximum number of tokens in the output.
+        api_key: The OpenAI API key.
+        provider: The backend serving the requests.
+        batch_naming: Whether to name a whole level with a single call.
+        cache: An optional persistent cache of API responses.
+        journal: An optional journal recording every completed node.
+        rate_limiter: An optional client-side request and token budget.
+        hooks: Callables receiving a CallRecord after every call.
+        structured_output: Whether list prompts ask for a JSON array of
+            {id, name, description} objects, which names the items without
+            separate naming calls.
+        dedup: An optional index dropping or flagging generated stories and
+            tasks similar to existing ones, before they are named.
+        budget: An optional token budget trimming the context of prompts and
+            summarizing long project descriptions for story and task prompts.
+        conversation: An optional policy enabling the conversational mode, in
+            which the stories and tasks of an epic are generated as turns of
+            one chat session instead of independent prompts.
+        candidates: The number of completions requested for each list
+            prompt, in a single call; the best is kept.
+        ranker: Ranks the candidates when more than one is requested.
+    """
 
-    def to_dict(self) -> dict:
-        """Converts the project to a dictionary.
+    MAX_RETRIES = 3
+    BACKOFF_BASE = 1.0
+    BACKOFF_CAP = 60.0
+    LEVEL_LABELS = {"epic": "epic", "story": "user story", "task": "user task"}
+    SUMMARY_WORDS = 120
+
+    def __init__(
+        self,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        api_key: str,
+        batch_naming: bool = False,
+        cache: Optional[ResponseCache] = None,
+        journal: Optional["Journal"] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        provider: Optional[LLMProvider] = None,
+        hooks: Optional[List[Callable[[CallRecord], None]]] = None,
+        structured_output: bool = False,
+        dedup: Optional[Deduplicator] = None,
+        budget: Optional[PromptBudget] = None,
+        conversation: Optional[SessionPolicy] = None,
+        candidates: int = 1,
+        ranker: Optional[CandidateRanker] = None,
+    ):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.batch_naming = batch_naming
+        self.cache = cache
+        self.journal = journal
+        self.rate_limiter = rate_limiter
+        self.provider = provider or OpenAIProvider(api_key)
+        self.hooks = list(hooks or [])
+        self.structured_output = structured_output
+        self.dedup = dedup
+        self.budget = budget
+        self.conversation = conversation
+        self.candidates = max(1, candidates)
+        if ranker is None and self.candidates > 1:
+            ranker = CandidateRanker()
+        self.ranker = ranker
+        self._summaries = {}
+
+    def add_hook(self, hook: Callable[[CallRecord], None]) -> None:
+        """Registers a callable receiving a CallRecord after every call.
+
+        Args:
+            hook: The callable, e.g. a collector from ``classes.metrics``.
+        """
+        self.hooks.append(hook)
+
+    def emit(self, record: CallRecord) -> None:
+        """Passes a call record to every hook.
+
+        Args:
+            record: The record of the finished call.
+        """
+        for hook in self.hooks:
+            hook(record)
+
+    def cache_key(self, prompt: str, n: int = 1) -> Optional[str]:
+        """Builds the response cache key for a prompt.
+
+        Args:
+            prompt: The prompt to send to the model.
+            n: The number of candidates the response is chosen from.
 
         Returns:
-            A dictionary representation of the project.
+            The cache key, or None when caching is disabled.
         """
-        return {
-            "name": self.name,
-            "description": self.description,
-            "epics": self.epics,
-        }
+        if self.cache is None:
+            return None
+        return self.cache.make_key(
+            self.provider.cache_id,
+            self.model,
+            self.temperature,
+            self.max_tokens,
+            prompt,
+            n,
+        )
+
+    def prepare_messages(
+        self, prompt: str, session: Optional[ChatSession] = None
+    ) -> Tuple[List[Dict[str, str]], str]:
+        """Builds the chat messages of a request.
+
+        Args:
+            prompt: The prompt to send to the model.
+            session: The conversation the prompt continues, if any.
 
-    def save_to_yaml(self, file_path: str):
-        """Saves the project to a YAML file.
+        Returns:
+            The messages, and the text identifying the request for the cache
+            and the rate limiter: the prompt itself without a session, the
+            serialized messages with one.
+        """
+        if session is None:
+            return [{"role": "system", "content": prompt}], prompt
+        messages = session.messages(prompt)
+        return messages, json.dumps(messages, ensure_ascii=False)
+
+    def openai_call(
+        self,
+        prompt: str,
+        level: str = "",
+        kind: str = "",
+        session: Optional[ChatSession] = None,
+        choose: Optional[Callable[[List[str]], int]] = None,
+    ) -> str:
+        """Calls the language model with a given prompt.
 
         Args:
-            file_path: The path to the YAML file to save the project.
+            prompt: The prompt to send to the model.
+            level: The hierarchy level the call is for, used by the hooks.
+            kind: "list" or "name", used by the hooks.
+            session: An optional conversation the prompt is a turn of; the
+                answer is added to its history.
+            choose: An optional function picking the index of the best of
+                ``candidates`` responses; without it one is requested.
+
+        Returns:
+            The API's response.
+
+        Raises:
+            OpenAIAgentError: The request was rejected as invalid or
+                unauthorized.
+            RetriesExhaustedError: The request kept failing after
+                ``MAX_RETRIES`` attempts.
         """
+        start = time.perf_counter()
+        n = self.candidates if choose is not None else 1
+        messages, text = self.prepare_messages(prompt, session)
+        key = self.cache_key(text, n)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.emit(CallRecord(level, kind, self.model, cached=True))
+                if session is not None:
+                    session.record(prompt, cached)
+                return cached
+
+        for attempt in range(self.MAX_RETRIES):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(text, self.max_tokens * n)
+            try:
+                completion = self.provider.complete(
+                    messages, self.model, self.temperature, self.max_tokens, n
+                )
+            except ProviderError as e:
+                print(e)
+                error = e
+                if not e.retryable:
+                    break
+                if attempt + 1 < self.MAX_RETRIES:
+                    time.sleep(self.retry_delay(attempt, e))
+                continue
+
+            content = self.pick(completion.choices, choose)
+            if key is not None:
+                self.cache.set(key, content)
+            if session is not None:
+                session.record(prompt, content)
+            self.emit(
+                CallRecord(
+                    level,
+                    kind,
+                    self.model,
+                    time.perf_counter() - start,
+                    completion.prompt_tokens,
+                    completion.completion_tokens,
+                    retries=attempt,
+                )
+            )
+            return content
+
+        self.emit(
+            CallRecord(
+                level,
+                kind,
+                self.model,
+                time.perf_counter() - start,
+                retries=attempt,
+                error=str(error),
+            )
+        )
+        if not error.retryable:
+            raise OpenAIAgentError(str(error)) from error
+        raise RetriesExhaustedError(
+            f"LLM request failed after {self.MAX_RETRIES} attempts"
+        ) from error
+
+    @staticmethod
+    def pick(
+        choices: List[str], choose: Optional[Callable[[List[str]], int]]
+    ) -> str:
+        """Returns the chosen one of a completion's candidates."""
+        choices = [choice.strip() for choice in choices]
+        if choose is None or len(choices) < 2:
+            return choices[0]
+        return choices[choose(choices)]
+
+    def candidate_chooser(
+        self, level: str, siblings: Sequence[str] = ()
+    ) -> Optional[Callable[[List[str]], int]]:
+        """Builds the function ranking candidate lists of a level.
 
-        project_dict = {
-            "project": {
-                "name": self.name,
-                "description": self.description,
-                "epics": [],
-            }
-        }
-        for epic in self.epics:
-            epic_dict = epic.to_dict()
-            epic_dict["stories"] = []
-            for story in epic.stories:
-                story_dict = story.to_dict()
-                story_dict["tasks"] = []
-                for task in story.tasks:
-                    story_dict["tasks"].append(task.to_dict())
-                epic_dict["stories"].append(story_dict)
-            project_dict["project"]["epics"].append(epic_dict)
-        with open(file_path, "w", encoding="utf-8") as file:
-            yaml.safe_dump(
-                project_dict,
-                file,
-                sort_keys=False,
-                allow_unicode=True,
-                default_flow_style=False,
-                default_style=None,
+        Args:
+            level: One of "epic", "story" or "task".
+            siblings: Descriptions of existing nodes of the level the items
+                should not repeat.
+
+        Returns:
+            The function, or None when a single candidate is requested.
+        """
+        if self.candidates < 2:
+            return None
+
+        def choose(responses: List[str]) -> int:
+            return self.ranker.best(
+                level,
+                responses,
+                lambda response: self.parse_items(response)[0],
+                siblings,
+                structured=self.structured_output,
             )
 
+        return choose
+
+    @staticmethod
+    def story_siblings(project: Project, epic: Epic) -> List[str]:
+        """Describes the stories of the other epics, for candidate ranking."""
+        return [
+            story.description
+            for other in project.epics
+            if other is not epic
+            for story in other.stories
+        ]
+
+    @staticmethod
+    def task_siblings(epic: Epic, story: Story) -> List[str]:
+        """Describes the tasks of the epic's other stories, likewise."""
+        return [
+            task.description
+            for other in epic.stories
+            if other is not story
+            for task in other.tasks
+        ]
+
+    def retry_delay(self, attempt: int, error: ProviderError) -> float:
+        """Decides how long to back off after a failed attempt.
+
+        Rate limit errors also pause the shared rate limiter, so concurrent
+        callers back off together instead of retrying into more 429s.
 
-class Epic:
-    """An epic.
+        Args:
+            attempt: The number of the failed attempt, starting at 0.
+            error: The error reported by the provider.
 
-    Attributes:
-        description: A detailed description of the epic.
-        stories: A list of stories that are part of this epic.
-    """
+        Returns:
+            The number of seconds to wait before the next attempt.
+        """
+        delay = backoff_delay(
+            attempt, self.BACKOFF_BASE, self.BACKOFF_CAP, error.retry_after
+        )
+        if error.rate_limited and self.rate_limiter is not None:
+            self.rate_limiter.pause(delay)
+        return delay
 
-    def __init__(self, epic_id: int, name: str, description: str, stories=None):
-        self.epic_id = epic_id
-        self.name = name
-        self.description = description
-        self.stories = stories if stories is not None else []
+    @staticmethod
+    def parse_list(response: str) -> List[Tuple[int, str]]:
+        """Parses a numbered or bulleted list returned by the model.
 
-    def to_dict(self) -> dict:
-        """Converts the epic to a dictionary.
+        Args:
+            response: The raw response in the "#. Item" format, or with
+                "#)", "-" or "*" items.
 
         Returns:
-            A dictionary representation of the epic.
+            A list of (item_id, description) tuples in response order.
         """
-        return {
-            "epic_id": self.epic_id,
-            "name": self.name,
-            "description": self.description,
-        }
+        return parse_list(response)
+
+    def list_prompt(self, level: str, prompt: str) -> str:
+        """Adapts a list prompt to the response format of the agent."""
+        if self.structured_output:
+            return json_prompt(prompt, self.LEVEL_LABELS[level])
+        return prompt
+
+    def parse_items(
+        self, response: str
+    ) -> Tuple[List[Tuple[int, str]], List[Optional[str]]]:
+        """Parses a list response into its items and their names.
 
-    def save_to_yaml(self, file_path: str):
-        """Saves the epic to a YAML file.
+        A structured response that is not valid JSON is read as a plain
+        list, so nothing is lost when the model ignores the format.
 
         Args:
-            file_path: The path to the YAML file to save the epic.
+            response: The raw response to a list prompt.
+
+        Returns:
+            The (item_id, description) tuples, and the names given in the
+            response, with None for items that still need a name.
         """
+        if self.structured_output:
+            entries = parse_json_items(response)
+            if entries is not None:
+                items = [(item_id, desc) for item_id, desc, _ in entries]
+                return items, [name for _, _, name in entries]
+        items = self.parse_list(response)
+        return items, [None] * len(items)
+
+    def deduplicate(
+        self,
+        level: str,
+        items: List[Tuple[int, str]],
+        names: List[Optional[str]],
+    ) -> Tuple[List[Tuple[int, str]], List[Optional[str]]]:
+        """Filters duplicates out of a generated list, if dedup is enabled."""
+        if self.dedup is None:
+            return items, names
+        return self.dedup.filter(level, items, names)
+
+    def index_existing(self, project: Project) -> None:
+        """Indexes the stories and tasks a project starts with for dedup."""
+        if self.dedup is not None:
+            self.dedup.index_project(project)
+
+    def request_list(
+        self,
+        level: str,
+        prompt: str,
+        session: Optional[ChatSession] = None,
+        siblings: Sequence[str] = (),
+    ) -> Tuple[List[Tuple[int, str]], List[Optional[str]]]:
+        """Sends a list prompt and parses the response, see parse_items.
+
+        ``siblings`` are passed on to the candidate ranking.
+        """
+        response = self.openai_call(
+            self.list_prompt(level, prompt),
+            level,
+            "list",
+            session,
+            self.candidate_chooser(level, siblings),
+        )
+        return self.parse_items(response)
+
+    @staticmethod
+    def epics_prompt(project: Project) -> str:
+        """Builds the prompt listing the epics of a project."""
+        return f"""
+            You are Product Owner and you work in scrum methodology using
+            project, epics, stories and tasks hierarchy.
+            You are to create epics based on the following project description:
+            {project.description}.
+            Return one epic per line in your response.
+            The result must be a list in the format:
 
-        # build a dict with hierarchy of epic, stories and tasks
-        epic_dict = {
-            "epic": {
-                "epic_id": self.epic_id,
-                "name": self.name,
-                "description": self.description,
-                "stories": [],
-            }
-        }
-        for story in self.stories:
-            story_dict = story.to_dict()
-            story_dict["tasks"] = []
-            for task in story.tasks:
-                story_dict["tasks"].append(task.to_dict())
-            epic_dict["epic"]["stories"].append(story_dict)
-
-        with open(file_path, "w", encoding="utf-8") as file:
-            yaml.safe_dump(
-                epic_dict,
-                file,
-                sort_keys=False,
-                allow_unicode=True,
-                default_flow_style=False,
-                default_style=None,
-            )
+            #. First epic
+            #. Second epic
 
+            The number of each entry must be followed by a period.
+            If your list is empty, write "There are no epics to add at this time.
+            Unless your list is empty, do not include any headers before your numbered
+            list or follow your numbered list with any other output."""
 
-class Story:
-    """A user story.
+    @staticmethod
+    def stories_prompt(project: Project, epic: Epic) -> str:
+        """Builds the prompt listing the stories of an epic."""
+        return f"""
+            You are to create user stories. For your information main goal
+            of the project is: {project.description}. But you are going to
+            focus on the following epic only: {epic.description}. Please provide
+            only key user stories for this particiular epic. Return one user
+            story per line in your response.
+            The result must be a numbered list in the format:
 
-    Attributes:
-        story_id: A unique identifier for the story.
-        name: The name of the story.
-        description: A detailed description of the story.
-    """
+            #. First user story
+            #. Second user story
+
+            The number of each entry must be followed by a period.
+            If your list is empty, write "There are no user stories to add at this time.
+            Unless your list is empty, do not include any headers before your numbered
+            list or follow your numbered list with any other output."""
+
+    @staticmethod
+    def tasks_prompt(
+        project_description: str, epic_description: str, story: Story
+    ) -> str:
+        """Builds the prompt listing the tasks of a story."""
+        return f"""
+            You are to create tasks. The overall goal is:  {project_description}.
+            Underneath is epic: {epic_description}. But you are going to
+            focus on the following story only:: {story.description}.
+            Please provide only key tasks for this particiular story. Return 
+            one task per line in your response.
+            The result must be a list in the format:
+
+            #. First task
+            #. Second task
+
+            If your list is empty, write "There are no user tasks to add at this time.
+            Unless your list is empty, do not include any headers before your numbered
+            list or follow your numbered list with any other output."""
 
-    def __init__(self, story_id: int, name: str, description: str, tasks=None):
-        self.story_id = story_id
-        self.name = name
-        self.description = description
-        self.tasks = tasks if tasks is not None else []
+    @classmethod
+    def summary_prompt(cls, description: str) -> str:
+        """Builds the prompt summarizing a project description."""
+        return f"""You are to summarize the following project description in
+        at most {cls.SUMMARY_WORDS} words, keeping every feature and
+        requirement it names: {description}. Return only the summary."""
 
-    def to_dict(self) -> dict:
-        """Converts the story to a dictionary.
+    def project_text(self, project: Project) -> str:
+        """Returns the project description used in story and task prompts.
 
-        Returns:
-            A dictionary representation of the story.
+        This is the summary of the description once ``summarize`` made one.
         """
-        return {
-            "story_id": self.story_id,
-            "name": self.name,
-            "description": self.description,
-        }
+        return self._summaries.get(project.description, project.description)
+
+    def _needs_summary(self, project: Project) -> bool:
+        return (
+            self.budget is not None
+            and project.description not in self._summaries
+            and self.budget.needs_summary(project.description)
+        )
+
+    def _store_summary(self, project: Project, summary: str) -> None:
+        summary = summary.strip()
+        if summary and self.budget.count(summary) < self.budget.count(
+            project.description
+        ):
+            self._summaries[project.description] = summary
+        else:
+            self._summaries[project.description] = project.description
+
+    def summarize(self, project: Project) -> None:
+        """Summarizes a long project description once, see project_text."""
+        if self._needs_summary(project):
+            summary = self.openai_call(
+                self.summary_prompt(project.description), "project", "summary"
+            )
+            self._store_summary(project, summary)
 
-    def save_to_yaml(self, file_path: str):
-        """Saves the story to a YAML file.
+    def fit_prompt(self, build: Callable[..., str], *texts: str) -> str:
+        """Builds a prompt from context texts within the prompt budget."""
+        if self.budget is None:
+            return build(*texts)
+        return self.budget.fit(build, *texts)
 
-        Args:
-            file_path: The path to the YAML file to save the story.
+    def story_list_prompt(self, project: Project, epic: Epic) -> str:
+        """Builds the stories prompt of an epic within the prompt budget.
+
+        The project context is trimmed before the epic description.
         """
-        tasks_dicts = [task.to_dict() for task in self.tasks]
-        story_dict = {
-            "story": {"description": self.description, "tasks": tasks_dicts}
-        }
 
-        with open(file_path, "a", encoding="utf-8") as file:
-            yaml.safe_dump(
-                story_dict,
-                file,
-                sort_keys=False,
-                allow_unicode=True,
-                default_flow_style=False,
+        def build(project_text: str, epic_text: str) -> str:
+            return self.stories_prompt(
+                Project(project.name, project_text),
+                Epic(epic.epic_id, epic.name, epic_text),
             )
 
+        return self.fit_prompt(
+            build, self.project_text(project), epic.description
+        )
 
-class Task:
-    """A user task."""
+    def task_list_prompt(
+        self, project_description: str, epic_description: str, story: Story
+    ) -> str:
+        """Builds the tasks prompt of a story within the prompt budget.
 
-    def __init__(
-        self, task_id: int, name: str, description: str, solution=None
-    ):
-        self.task_id = task_id
-        self.name = name
-        self.description = description
-        self.solution = solution
+        The project context is trimmed before the epic description.
+        """
+        return self.fit_prompt(
+            lambda project_text, epic_text: self.tasks_prompt(
+                project_text, epic_text, story
+            ),
+            project_description,
+            epic_description,
+        )
+
+    @staticmethod
+    def session_system_prompt(
+        project_description: str, epic_description: str
+    ) -> str:
+        """Builds the system message of an epic's chat session."""
+        return f"""
+            You are Product Owner and you work in scrum methodology using
+            project, epics, stories and tasks hierarchy. The overall goal is:
+            {project_description}. You are working on the following epic
+            only: {epic_description}. You will be asked for the user stories
+            of this epic and then for the tasks of each user story."""
+
+    @staticmethod
+    def session_stories_prompt() -> str:
+        """Builds the session turn asking for the stories of the epic."""
+        return """
+            You are to create user stories. Please provide only key user
+            stories for this epic. Return one user story per line in your
+            response.
+            The result must be a numbered list in the format:
 
-    def to_dict(self) -> dict:
-        """Converts the task to a dictionary.
+            #. First user story
+            #. Second user story
+
+            The number of each entry must be followed by a period.
+            If your list is empty, write "There are no user stories to add at this time.
+            Unless your list is empty, do not include any headers before your numbered
+            list or follow your numbered list with any other output."""
+
+    @staticmethod
+    def session_tasks_prompt(story: Story) -> str:
+        """Builds the session turn asking for the tasks of a story."""
+        return f"""
+            You are to create tasks. Focus on the following user story only:
+            {story.description}. Please provide only key tasks for this
+            story. Return one task per line in your response.
+            The result must be a list in the format:
+
+            #. First task
+            #. Second task
+
+            If your list is empty, write "There are no user tasks to add at this time.
+            Unless your list is empty, do not include any headers before your numbered
+            list or follow your numbered list with any other output."""
+
+    def start_session(self, project: Project, epic: Epic) -> ChatSession:
+        """Opens the chat session of an epic in the conversational mode.
+
+        When the epic already has stories, they are replayed as the first,
+        pinned exchange, so the session has the same stable prefix as one
+        that generated them.
+
+        Args:
+            project: The project the epic belongs to.
+            epic: The epic the session is about.
 
         Returns:
-            A dictionary representation of the task.
+            The new session.
         """
-        return {
-            "task_id": self.task_id,
-            "name": self.name,
-            "description": self.description,
-        }
+        system = self.fit_prompt(
+            self.session_system_prompt,
+            self.project_text(project),
+            epic.description,
+        )
+        if self.budget is not None:
+            counter = self.budget.count
+        else:
+            counter = functools.partial(count_tokens, self.model)
+        session = self.conversation.start(system, counter)
+        if epic.stories:
+            if self.structured_output:
+                answer = json.dumps(
+                    [
+                        {
+                            "id": story.story_id,
+                            "name": story.name,
+                            "description": story.description,
+                        }
+                        for story in epic.stories
+                    ]
+                )
+            else:
+                answer = "\n".join(
+                    f"{story.story_id}. {story.description}"
+                    for story in epic.stories
+                )
+            session.record(
+                self.list_prompt("story", self.session_stories_prompt()),
+                answer,
+            )
+        return session
 
+    @staticmethod
+    def epic_name_prompt(description: str) -> str:
+        """Builds the prompt asking for an epic short name."""
+        return f"""You are to create an epic short name based on the
+        following description: {description}. Return only one or maximum three
+        words. Do not include any punctuation and apostrophies."""
 
-class OpenAIAgent:
-    """OpenAI API agent for generating story names.
+    @staticmethod
+    def story_name_prompt(description: str) -> str:
+        """Builds the prompt asking for a story short name."""
+        return f"""You are to create a user story short name based on the
+        following description: {description}. Return only one or maximum three
+        words. Do not include any punctuation and apostrophies."""
 
-    Attributes:
-        model: The name of the OpenAI model to use.
-        temperature: The randomness of the model's output.
-        max_tokens: The maximum number of tokens in the output.
-        api_key: The OpenAI API key.
-    """
+    @staticmethod
+    def task_name_prompt(description: str) -> str:
+        """Builds the prompt asking for a task short name."""
+        return f"""You are to create a user task short name based on the
+        following description: {description}. Return only one or maximum three
+        words."""
 
-    MAX_RETRIES = 3
+    @classmethod
+    def names_prompt(cls, level: str, descriptions: List[str]) -> str:
+        """Builds the prompt asking for short names of a whole level.
 
-    def __init__(
-        self, model: str, temperature: float, max_tokens: int, api_key: str
-    ):
-        self.model = model
-        self.temperature = temperature
-        self.max_tokens = max_tokens
-        openai.api_key = api_key
+        Args:
+            level: One of "epic", "story" or "task".
+            descriptions: The descriptions to name, in order.
+
+        Returns:
+            The batched naming prompt.
+        """
+        label = cls.LEVEL_LABELS[level]
+        numbered = "\n".join(
+            f"{number}. {description}"
+            for number, description in enumerate(descriptions, 1)
+        )
+        return f"""You are to create {label} short names based on the
+        following numbered list of descriptions:
+
+{numbered}
+
+        Return one name per line, numbered to match the descriptions, in the
+        format:
+
+        #. First name
+        #. Second name
+
+        Each name must be only one or maximum three words. Do not include any
+        punctuation and apostrophies. Do not include any other output."""
+
+    def name_prompt(self, level: str, description: str) -> str:
+        """Builds the single-item naming prompt for a level."""
+        prompts = {
+            "epic": self.epic_name_prompt,
+            "story": self.story_name_prompt,
+            "task": self.task_name_prompt,
+        }
+        return prompts[level](description)
 
-    def openai_call(self, prompt: str) -> str:
-        """Calls the OpenAI API with a given prompt.
+    def parse_names(self, response: str, count: int) -> List[Optional[str]]:
+        """Parses a batched naming response.
 
         Args:
-            prompt: The prompt to send to the OpenAI API.
+            response: The raw numbered list of names.
+            count: The number of descriptions that were sent.
 
         Returns:
-            The API's response.
-
-        Raises:
-            Various exceptions for API errors, timeouts, etc.
+            A list of ``count`` names, with None for entries that are missing.
         """
-        retries = 0
-        while retries < self.MAX_RETRIES:
-            try:
-                messages = [{"role": "system", "content": prompt}]
-                response = openai.ChatCompletion.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    n=1,
-                    stop=None,
-                )
-                return response.choices[0].message.content.strip()
-            except openai.error.Timeout as e:
-                print(f"OpenAI API request timed out: {e}")
-            except openai.error.APIError as e:
-                print(f"OpenAI API returned an API Error: {e}")
-            except openai.error.APIConnectionError as e:
-                print(f"OpenAI API request failed to connect: {e}")
-            except openai.error.InvalidRequestError as e:
-                print(f"OpenAI API request was invalid: {e}")
-            except openai.error.AuthenticationError as e:
-                print(f"OpenAI API request was not authorized: {e}")
-            except openai.error.PermissionError as e:
-                print(f"OpenAI API request was not permitted: {e}")
-            except openai.error.RateLimitError as e:
-                print(f"OpenAI API request exceeded rate limit: {e}")
-            except openai.error.OpenAIError as e:
-                print(f"OpenAI API request failed: {e}")
-            retries += 1
+        names = dict(self.parse_list(response or ""))
+        return [names.get(number) for number in range(1, count + 1)]
 
-    def create_epics(self, project: Project) -> Project:
-        """Creates epics based on the project description"""
-        prompt = f"""
-            You are Product Owner and you work in scrum methodology using
-            project, epics, stories and tasks hierarchy.
-            You are to create epics based on the following project description:
-            {project.description}.
-            Return one epic per line in your response.
-            The result must be a list in the format:
+    def create_names(self, level: str, descriptions: List[str]) -> List[str]:
+        """Creates short names for a whole level with one API call.
 
-            #. First epic
-            #. Second epic
+        Entries missing from the batched response fall back to a single
+        naming call each.
 
-            The number of each entry must be followed by a period.
-            If your list is empty, write "There are no epics to add at this time.
-            Unless your list is empty, do not include any headers before your numbered
-            list or follow your numbered list with any other output."""
+        Args:
+            level: One of "epic", "story" or "task".
+            descriptions: The descriptions to name, in order.
 
-        response = self.openai_call(prompt)
-        epics = response.split("\n")
+        Returns:
+            The names, aligned with ``descriptions``.
+        """
+        response = self.openai_call(
+            self.names_prompt(level, descriptions), level, "name"
+        )
+        names = self.parse_names(response, len(descriptions))
+        for index, name in enumerate(names):
+            if name is None:
+                prompt = self.name_prompt(level, descriptions[index])
+                names[index] = self.openai_call(prompt, level, "name").strip()
+        return names
+
+    def complete_names(
+        self,
+        level: str,
+        items: List[Tuple[int, str]],
+        names: List[Optional[str]],
+    ) -> List[str]:
+        """Names the items that the list response left without a name.
 
-        for epic_id, epic in enumerate(epics, 1):
-            parts = epic.strip().split(".", 1)
-            if len(parts) == 2:
-                epic_id = "".join(s for s in parts[0] if s.isnumeric())
-                description = re.sub(r"[^\w\s_]+", "", parts[1]).strip()
+        Args:
+            level: One of "epic", "story" or "task".
+            items: The (item_id, description) tuples.
+            names: The known names, with None for the missing ones.
 
-                if description.strip() and epic_id.isnumeric():
-                    project.epics.append(
-                        self.create_epic(int(epic_id), description)
-                    )
-                    print(f"{epic_id}. {description}\n")
+        Returns:
+            The names, aligned with ``items``.
+        """
+        names = list(names)
+        missing = [index for index, name in enumerate(names) if name is None]
+        descriptions = [items[index][1] for index in missing]
+        if self.batch_naming and missing:
+            created = self.create_names(level, descriptions)
+        else:
+            created = [
+                self.openai_call(
+                    self.name_prompt(level, description), level, "name"
+                ).strip()
+                for description in descriptions
+            ]
+        for index, name in zip(missing, created):
+            names[index] = name
+        return names
+
+    def create_epics(self, project: Project) -> Project:
+        """Creates epics based on the project description"""
+        if project.epics:
+            return project
+
+        items, names = self.request_list("epic", self.epics_prompt(project))
+        names = self.complete_names("epic", items, names)
+        epics = [
+            Epic(epic_id, name, description)
+            for (epic_id, description), name in zip(items, names)
+        ]
+
+        for epic in epics:
+            project.epics.append(epic)
+            print(f"{epic.epic_id}. {epic.description}\n")
+        if self.journal is not None:
+            self.journal.record_epics(epics)
+            self.journal.record_complete()
 
         return project
 
@@ -305,25 +810,22 @@ class OpenAIAgent:
         Returns:
             An Epic object.
         """
-        prompt = f"""You are to create an epic short name based on the
-        following description: {description}. Return only one or maximum three
-        words. Do not include any punctuation and apostrophies."""
-
-        name = self.openai_call(prompt).strip()
+        prompt = self.epic_name_prompt(description)
+        name = self.openai_call(prompt, "epic", "name").strip()
         return Epic(int(epic_id), name, description)
 
     def create_stories(self, project: Project) -> Project:
         """Creates stories based on the project description"""
+        self.index_existing(project)
+        self.summarize(project)
         for epic in project.epics:
-            epic = Epic(
-                epic["epic_id"],
-                epic["name"],
-                epic["description"],
-            )
+            if epic.stories:
+                continue
 
-            stories = self.create_stories_from_epic(project, epic)
-            epic.stories = stories
-            project.epics[epic.epic_id - 1] = epic
+            epic.stories = self.create_stories_from_epic(project, epic)
+            if self.journal is not None:
+                self.journal.record_stories(epic, epic.stories)
+                self.journal.record_complete(epic)
 
         return project
 
@@ -337,104 +839,93 @@ class OpenAIAgent:
         Returns:
             A Story object.
         """
-        prompt = f"""You are to create a user story short name based on the
-        following description: {description}. Return only one or maximum three
-        words. Do not include any punctuation and apostrophies."""
-
-        name = self.openai_call(prompt).strip()
+        prompt = self.story_name_prompt(description)
+        name = self.openai_call(prompt, "story", "name").strip()
         return Story(int(story_id), name, description)
 
     def create_tasks(self, project: Project) -> Project:
         """Creates tasks based on the story description"""
+        self.index_existing(project)
+        self.summarize(project)
         for epic in project.epics:
-            epic = Epic(
-                epic["epic_id"],
-                epic["name"],
-                epic["description"],
-                epic["stories"],
-            )
+            session = None
+            if self.conversation is not None and any(
+                not story.tasks for story in epic.stories
+            ):
+                session = self.start_session(project, epic)
             for story in epic.stories:
-                story = Story(
-                    story["story_id"],
-                    story["name"],
-                    story["description"],
-                    story["tasks"],
+                if story.tasks:
+                    continue
+
+                self.create_tasks_from_story(
+                    self.project_text(project),
+                    epic.description,
+                    story,
+                    session,
+                    self.task_siblings(epic, story),
                 )
-                story = self.create_tasks_from_story(
-                    project.description, epic.description, story
-                )
-                epic.stories[story.story_id - 1] = story
-            project.epics[epic.epic_id - 1] = epic
+                if self.journal is not None:
+                    self.journal.record_tasks(epic, story)
         return project
 
     def create_stories_from_epic(
-        self, project: Project, epic: Epic
+        self,
+        project: Project,
+        epic: Epic,
+        session: Optional[ChatSession] = None,
     ) -> List[Story]:
         """Creates stories based on the epic description"""
-        prompt = f"""
-            You are to create user stories. For your information main goal
-            of the project is: {project.description}. But you are going to
-            focus on the following epic only: {epic.description}. Please provide
-            only key user stories for this particiular epic. Return one user
-            story per line in your response.
-            The result must be a numbered list in the format:
-
-            #. First user story
-            #. Second user story
-
-            The number of each entry must be followed by a period.
-            If your list is empty, write "There are no user stories to add at this time.
-            Unless your list is empty, do not include any headers before your numbered
-            list or follow your numbered list with any other output."""
         stories_lst = []
-        response = self.openai_call(prompt)
-        stories = response.split("\n")
-
-        for story_id, story in enumerate(stories, 1):
-            parts = story.strip().split(".", 1)
-            if len(parts) == 2:
-                story_id = "".join(s for s in parts[0] if s.isnumeric())
-                description = re.sub(r"[^\w\s_]+", "", parts[1]).strip()
-
-                if description.strip() and story_id.isnumeric():
-                    story = self.create_story(story_id, description)
-                    print(f"Story {story_id} created")
-                    stories_lst.append(story)
+        if session is None:
+            prompt = self.story_list_prompt(project, epic)
+        else:
+            prompt = self.session_stories_prompt()
+        items, names = self.request_list(
+            "story", prompt, session, self.story_siblings(project, epic)
+        )
+        items, names = self.deduplicate("story", items, names)
+        names = self.complete_names("story", items, names)
+        stories = [
+            Story(story_id, name, description)
+            for (story_id, description), name in zip(items, names)
+        ]
+
+        for story in stories:
+            print(f"Story {story.story_id} created")
+            stories_lst.append(story)
 
         return stories_lst
 
     def create_tasks_from_story(
-        self, project_description, epic_description: str, story: Story
+        self,
+        project_description,
+        epic_description: str,
+        story: Story,
+        session: Optional[ChatSession] = None,
+        siblings: Sequence[str] = (),
     ):
-        """Creates tasks based on the story description"""
-        prompt = f"""
-            You are to create tasks. The overall goal is:  {project_description}.
-            Underneath is epic: {epic_description}. But you are going to
-            focus on the following story only:: {story.description}.
-            Please provide only key tasks for this particiular story. Return 
-            one task per line in your response.
-            The result must be a list in the format:
-
-            #. First task
-            #. Second task
+        """Creates tasks based on the story description.
 
-            If your list is empty, write "There are no user tasks to add at this time.
-            Unless your list is empty, do not include any headers before your numbered
-            list or follow your numbered list with any other output."""
-
-        response = self.openai_call(prompt)
-        tasks = response.split("\n")
-
-        for task_id, task in enumerate(tasks, 1):
-            parts = task.strip().split(".", 1)
-            if len(parts) == 2:
-                task_id = "".join(s for s in parts[0] if s.isnumeric())
-                description = re.sub(r"[^\w\s_]+", "", parts[1]).strip()
-
-                if description.strip() and task_id.isnumeric():
-                    task = self.create_task(task_id, description)
-                    print(f"Task {task_id} created")
-                    story.tasks.append(task)
+        ``siblings`` describe the existing tasks of other stories, for the
+        candidate ranking.
+        """
+        if session is None:
+            prompt = self.task_list_prompt(
+                project_description, epic_description, story
+            )
+        else:
+            prompt = self.session_tasks_prompt(story)
+        items, names = self.request_list("task", prompt, session, siblings)
+        items, names = self.deduplicate("task", items, names)
+        names = self.complete_names("task", items, names)
+        tasks = [
+            Task(task_id, name, description)
+            for (task_id, description), name in zip(items, names)
+        ]
+
+        for task in tasks:
+            print(f"Task {task.task_id} created")
+            story.tasks.append(task)
 
         return story
 
@@ -448,9 +939,869 @@ class OpenAIAgent:
         Returns:
             A Task object.
         """
-        prompt = f"""You are to create a user task short name based on the
-        following description: {description}. Return only one or maximum three
-        words."""
-
-        name = self.openai_call(prompt).strip()
+        prompt = self.task_name_prompt(description)
+        name = self.openai_call(prompt, "task", "name").strip()
         return Task(task_id, name, description)
+
+
+class AsyncOpenAIAgent(OpenAIAgent):
+    """Agent issuing its language model calls concurrently with asyncio.
+
+    Every ``acreate_*`` method mirrors its synchronous counterpart, but the
+    per-item naming calls of a level are fanned out with ``asyncio.gather``.
+    Results are collected in response order, so IDs stay deterministic.
+
+    Attributes:
+        concurrency: The maximum number of API requests in flight.
+        scheduler: The scheduler ordering the pending requests, which
+            replaces ``concurrency`` when given.
+        streaming: Whether list responses are streamed, each item being
+            handed on to naming and child generation as soon as its line
+            is complete. Structured output and several candidates need the
+            whole response, so lists are not streamed with either.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        api_key: str,
+        batch_naming: bool = False,
+        cache: Optional[ResponseCache] = None,
+        journal: Optional["Journal"] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        provider: Optional[LLMProvider] = None,
+        hooks: Optional[List[Callable[[CallRecord], None]]] = None,
+        structured_output: bool = False,
+        dedup: Optional[Deduplicator] = None,
+        budget: Optional[PromptBudget] = None,
+        conversation: Optional[SessionPolicy] = None,
+        candidates: int = 1,
+        ranker: Optional[CandidateRanker] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        scheduler: Optional[Scheduler] = None,
+        streaming: bool = False,
+    ):
+        super().__init__(
+            model,
+            temperature,
+            max_tokens,
+            api_key,
+            batch_naming,
+            cache,
+            journal,
+            rate_limiter,
+            provider,
+            hooks,
+            structured_output,
+            dedup,
+            budget,
+            conversation,
+            candidates,
+            ranker,
+        )
+        self.scheduler = scheduler or Scheduler(concurrency)
+        self.concurrency = self.scheduler.concurrency
+        self.streaming = streaming
+
+    async def aopenai_call(
+        self,
+        prompt: str,
+        level: str = "",
+        kind: str = "",
+        session: Optional[ChatSession] = None,
+        choose: Optional[Callable[[List[str]], int]] = None,
+        stream: Optional[ListStream] = None,
+    ) -> str:
+        """Calls the language model asynchronously with a given prompt.
+
+        Args:
+            prompt: The prompt to send to the model.
+            level: The hierarchy level the call is for, used by the hooks.
+            kind: "list" or "name", used by the hooks.
+            session: An optional conversation the prompt is a turn of; the
+                answer is added to its history.
+            choose: An optional function picking the index of the best of
+                ``candidates`` responses; without it one is requested.
+            stream: An optional parser fed with the response as it is
+                generated; it replaces ``choose``.
+
+        Returns:
+            The API's response.
+
+        Raises:
+            OpenAIAgentError: The request was rejected as invalid or
+                unauthorized.
+            RetriesExhaustedError: The request kept failing after
+                ``MAX_RETRIES`` attempts.
+        """
+        start = time.perf_counter()
+        n = self.candidates if choose is not None and stream is None else 1
+        messages, text = self.prepare_messages(prompt, session)
+        key = self.cache_key(text, n)
+        if key is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                self.emit(CallRecord(level, kind, self.model, cached=True))
+                if session is not None:
+                    session.record(prompt, cached)
+                if stream is not None:
+                    stream.feed(cached)
+                    stream.close()
+                return cached
+
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                # The rate limit budget is reserved once the request's turn
+                # has come, so it goes to the requests ranked first.
+                async with self.scheduler.slot(level, kind):
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.aacquire(
+                            text, self.max_tokens * n
+                        )
+                    if stream is None:
+                        completion = await self.provider.acomplete(
+                            messages,
+                            self.model,
+                            self.temperature,
+                            self.max_tokens,
+                            n,
+                        )
+                    else:
+                        stream.restart()
+                        completion = await self.provider.astream(
+                            messages,
+                            self.model,
+                            self.temperature,
+                            self.max_tokens,
+                            stream.feed,
+                        )
+                        stream.close()
+            except ProviderError as e:
+                print(e)
+                error = e
+                if not e.retryable:
+                    break
+                if attempt + 1 < self.MAX_RETRIES:
+                    await asyncio.sleep(self.retry_delay(attempt, e))
+                continue
+
+            content = self.pick(completion.choices, choose)
+            if key is not None:
+                await self.cache.aset(key, content)
+            if session is not None:
+                session.record(prompt, content)
+            self.emit(
+                CallRecord(
+                    level,
+                    kind,
+                    self.model,
+                    time.perf_counter() - start,
+                    completion.prompt_tokens,
+                    completion.completion_tokens,
+                    retries=attempt,
+                )
+            )
+            return content
+
+        self.emit(
+            CallRecord(
+                level,
+                kind,
+                self.model,
+                time.perf_counter() - start,
+                retries=attempt,
+                error=str(error),
+            )
+        )
+        if not error.retryable:
+            raise OpenAIAgentError(str(error)) from error
+        raise RetriesExhaustedError(
+            f"LLM request failed after {self.MAX_RETRIES} attempts"
+        ) from error
+
+    async def acreate_names(
+        self, level: str, descriptions: List[str]
+    ) -> List[str]:
+        """Creates short names for a whole level with one API call.
+
+        Entries missing from the batched response are named concurrently
+        with one call each.
+        """
+        response = await self.aopenai_call(
+            self.names_prompt(level, descriptions), level, "name"
+        )
+        names = self.parse_names(response, len(descriptions))
+        missing = [index for index, name in enumerate(names) if name is None]
+        fallback = await asyncio.gather(
+            *(
+                self.aopenai_call(
+                    self.name_prompt(level, descriptions[index]), level, "name"
+                )
+                for index in missing
+            )
+        )
+        for index, name in zip(missing, fallback):
+            names[index] = name.strip()
+        return names
+
+    async def asummarize(self, project: Project) -> None:
+        """Summarizes a long project description once, see project_text."""
+        if self._needs_summary(project):
+            summary = await self.aopenai_call(
+                self.summary_prompt(project.description), "project", "summary"
+            )
+            self._store_summary(project, summary)
+
+    async def arequest_list(
+        self,
+        level: str,
+        prompt: str,
+        session: Optional[ChatSession] = None,
+        siblings: Sequence[str] = (),
+    ) -> Tuple[List[Tuple[int, str]], List[Optional[str]]]:
+        """Sends a list prompt and parses the response, see request_list."""
+        response = await self.aopenai_call(
+            self.list_prompt(level, prompt),
+            level,
+            "list",
+            session,
+            self.candidate_chooser(level, siblings),
+        )
+        return self.parse_items(response)
+
+    async def acomplete_names(
+        self,
+        level: str,
+        items: List[Tuple[int, str]],
+        names: List[Optional[str]],
+    ) -> List[str]:
+        """Names the items that the list response left without a name."""
+        names = list(names)
+        missing = [index for index, name in enumerate(names) if name is None]
+        descriptions = [items[index][1] for index in missing]
+        if self.batch_naming and missing:
+            created = await self.acreate_names(level, descriptions)
+        else:
+            created = await asyncio.gather(
+                *(
+                    self.aopenai_call(
+                        self.name_prompt(level, description), level, "name"
+                    )
+                    for description in descriptions
+                )
+            )
+        for index, name in zip(missing, created):
+            names[index] = name.strip()
+        return names
+
+    async def aname(self, level: str, description: str) -> str:
+        """Names one item with its own call."""
+        prompt = self.name_prompt(level, description)
+        return (await self.aopenai_call(prompt, level, "name")).strip()
+
+    def streams_lists(self) -> bool:
+        """Tells whether list responses are streamed, see ``streaming``."""
+        return (
+            self.streaming
+            and not self.structured_output
+            and self.candidates == 1
+        )
+
+    async def astream_list(
+        self,
+        level: str,
+        prompt: str,
+        on_item: Callable[[int, str], None],
+        session: Optional[ChatSession] = None,
+    ) -> List[Tuple[int, str]]:
+        """Sends a list prompt and hands on each item as soon as it is parsed.
+
+        Stories and tasks are checked for duplicates one at a time, before
+        ``on_item`` sees them.
+
+        Args:
+            level: One of "epic", "story" or "task".
+            prompt: The list prompt.
+            on_item: Called with the item_id and description of each item.
+            session: An optional conversation the prompt is a turn of.
+
+        Returns:
+            The (item_id, description) tuples handed on, in response order.
+        """
+        items = []
+
+        def accept(item_id: int, description: str) -> None:
+            item = (item_id, description)
+            if level != "epic":
+                kept, _ = self.deduplicate(level, [item], [None])
+                if not kept:
+                    return
+            items.append(item)
+            on_item(item_id, description)
+
+        await self.aopenai_call(
+            self.list_prompt(level, prompt),
+            level,
+            "list",
+            session,
+            stream=ListStream(accept),
+        )
+        return items
+
+    async def astream_items(
+        self,
+        level: str,
+        prompt: str,
+        start: Callable[[int, str, "asyncio.Future[str]"], Awaitable],
+        session: Optional[ChatSession] = None,
+    ) -> List["asyncio.Future"]:
+        """Streams a list prompt, starting the work of each item at once.
+
+        Without batch naming, the name of each item is requested as soon as
+        the item is parsed; with it, the items are named with one call once
+        the list is complete.
+
+        Args:
+            level: One of "epic", "story" or "task".
+            prompt: The list prompt.
+            start: A function taking the item_id, the description and the
+                future of the name of an item, and returning a coroutine,
+                run as a task, or a future.
+            session: An optional conversation the prompt is a turn of.
+
+        Returns:
+            The futures of the ``start`` calls, in response order. They are
+            cancelled if the list or its naming fails.
+        """
+        started, names = [], []
+
+        def accept(item_id: int, description: str) -> None:
+            if self.batch_naming:
+                name = asyncio.get_running_loop().create_future()
+            else:
+                name = asyncio.ensure_future(self.aname(level, description))
+            names.append(name)
+            started.append(
+                asyncio.ensure_future(start(item_id, description, name))
+            )
+
+        try:
+            items = await self.astream_list(level, prompt, accept, session)
+            if self.batch_naming and items:
+                created = await self.acomplete_names(
+                    level, items, [None] * len(items)
+                )
+                for name, created_name in zip(names, created):
+                    name.set_result(created_name)
+        except BaseException:
+            for future in started + names:
+                future.cancel()
+            raise
+        return started
+
+    async def astream_nodes(
+        self,
+        level: str,
+        prompt: str,
+        node_type: type,
+        session: Optional[ChatSession] = None,
+    ) -> list:
+        """Streams a list prompt into named epics, stories or tasks.
+
+        Args:
+            level: One of "epic", "story" or "task".
+            prompt: The list prompt.
+            node_type: Epic, Story or Task.
+            session: An optional conversation the prompt is a turn of.
+
+        Returns:
+            The nodes in response order.
+        """
+
+        async def create(item_id: int, description: str, name) -> object:
+            return node_type(item_id, await name, description)
+
+        started = await self.astream_items(level, prompt, create, session)
+        return list(await asyncio.gather(*started))
+
+    def name_ahead(
+        self,
+        level: str,
+        items: List[Tuple[int, str]],
+        names: List[Optional[str]],
+    ) -> List["asyncio.Future[str]"]:
+        """Starts naming the items of a list without waiting for the names.
+
+        Child prompts only use descriptions, so the subtree of an item can
+        be generated while its name is still pending.
+
+        Args:
+            level: One of "epic", "story" or "task".
+            items: The (item_id, description) tuples.
+            names: The known names, with None for the missing ones.
+
+        Returns:
+            One future per item resolving to its name.
+        """
+        if self.batch_naming:
+            shared = asyncio.ensure_future(
+                self.acomplete_names(level, items, names)
+            )
+
+            async def pick(index: int) -> str:
+                return (await shared)[index]
+
+            return [asyncio.ensure_future(pick(i)) for i in range(len(items))]
+
+        async def name_one(description: str, name: Optional[str]) -> str:
+            if name is not None:
+                return name
+            return await self.aname(level, description)
+
+        return [
+            asyncio.ensure_future(name_one(description, name))
+            for (_, description), name in zip(items, names)
+        ]
+
+    async def acreate_epics(self, project: Project) -> Project:
+        """Creates epics based on the project description"""
+        if project.epics:
+            return project
+
+        if self.streams_lists():
+            epics = await self.astream_nodes(
+                "epic", self.epics_prompt(project), Epic
+            )
+        else:
+            items, names = await self.arequest_list(
+                "epic", self.epics_prompt(project)
+            )
+            names = await self.acomplete_names("epic", items, names)
+            epics = [
+                Epic(epic_id, name, description)
+                for (epic_id, description), name in zip(items, names)
+            ]
+        for epic in epics:
+            project.epics.append(epic)
+            print(f"{epic.epic_id}. {epic.description}\n")
+        if self.journal is not None:
+            self.journal.record_epics(epics)
+            self.journal.record_complete()
+
+        return project
+
+    async def acreate_epic(self, epic_id: int, description: str) -> Epic:
+        """Creates an epic name based on its description."""
+        prompt = self.epic_name_prompt(description)
+        name = await self.aopenai_call(prompt, "epic", "name")
+        return Epic(int(epic_id), name.strip(), description)
+
+    async def acreate_stories(self, project: Project) -> Project:
+        """Creates stories for all epics concurrently"""
+        self.index_existing(project)
+        await self.asummarize(project)
+
+        async def create_stories(epic: Epic) -> None:
+            epic.stories = await self.acreate_stories_from_epic(project, epic)
+            if self.journal is not None:
+                self.journal.record_stories(epic, epic.stories)
+                self.journal.record_complete(epic)
+
+        await asyncio.gather(
+            *(
+                create_stories(epic)
+                for epic in project.epics
+                if not epic.stories
+            )
+        )
+
+        return project
+
+    async def acreate_story(self, story_id: int, description: str) -> Story:
+        """Creates a story name based on its description."""
+        prompt = self.story_name_prompt(description)
+        name = await self.aopenai_call(prompt, "story", "name")
+        return Story(int(story_id), name.strip(), description)
+
+    async def acreate_stories_from_epic(
+        self,
+        project: Project,
+        epic: Epic,
+        session: Optional[ChatSession] = None,
+    ) -> List[Story]:
+        """Creates stories based on the epic description"""
+        CURRENT_GROUP.set(epic.epic_id)
+        if session is None:
+            prompt = self.story_list_prompt(project, epic)
+        else:
+            prompt = self.session_stories_prompt()
+        if self.streams_lists():
+            stories = await self.astream_nodes("story", prompt, Story, session)
+        else:
+            items, names = await self.arequest_list(
+                "story", prompt, session, self.story_siblings(project, epic)
+            )
+            items, names = self.deduplicate("story", items, names)
+            names = await self.acomplete_names("story", items, names)
+            stories = [
+                Story(story_id, name, description)
+                for (story_id, description), name in zip(items, names)
+            ]
+        for story in stories:
+            print(f"Story {story.story_id} created")
+
+        return list(stories)
+
+    async def acreate_tasks(self, project: Project) -> Project:
+        """Creates tasks for all stories concurrently"""
+        self.index_existing(project)
+        await self.asummarize(project)
+        if self.conversation is not None:
+            await asyncio.gather(
+                *(
+                    self.abuild_session_tasks(
+                        project, epic, self.start_session(project, epic)
+                    )
+                    for epic in project.epics
+                    if any(not story.tasks for story in epic.stories)
+                )
+            )
+            return project
+
+        await asyncio.gather(
+            *(
+                self.abuild_story(project, epic, story)
+                for epic in project.epics
+                for story in epic.stories
+                if not story.tasks
+            )
+        )
+
+        return project
+
+    async def abuild_story(
+        self,
+        project: Project,
+        epic: Epic,
+        story: Story,
+        session: Optional[ChatSession] = None,
+        named: Optional[Awaitable] = None,
+    ) -> Story:
+        """Creates and records the tasks of one story.
+
+        When given, ``named`` is awaited before the tasks are recorded, so
+        the story is journaled, with its name, before its tasks.
+        """
+        CURRENT_GROUP.set(epic.epic_id)
+        await self.acreate_tasks_from_story(
+            self.project_text(project),
+            epic.description,
+            story,
+            session,
+            self.task_siblings(epic, story),
+        )
+        if named is not None:
+            await named
+        if self.journal is not None:
+            self.journal.record_tasks(epic, story)
+        return story
+
+    async def abuild_session_tasks(
+        self, project: Project, epic: Epic, session: ChatSession
+    ) -> Epic:
+        """Creates the missing tasks of an epic's stories in its session.
+
+        The stories are handled one after the other, since every turn
+        extends the history the next one is sent with.
+        """
+        for story in epic.stories:
+            if not story.tasks:
+                await self.abuild_story(project, epic, story, session)
+        return epic
+
+    async def acreate_tasks_from_story(
+        self,
+        project_description,
+        epic_description: str,
+        story: Story,
+        session: Optional[ChatSession] = None,
+        siblings: Sequence[str] = (),
+    ) -> Story:
+        """Creates tasks based on the story description.
+
+        ``siblings`` describe the existing tasks of other stories, for the
+        candidate ranking.
+        """
+        if session is None:
+            prompt = self.task_list_prompt(
+                project_description, epic_description, story
+            )
+        else:
+            prompt = self.session_tasks_prompt(story)
+        if self.streams_lists():
+            tasks = await self.astream_nodes("task", prompt, Task, session)
+        else:
+            items, names = await self.arequest_list(
+                "task", prompt, session, siblings
+            )
+            items, names = self.deduplicate("task", items, names)
+            names = await self.acomplete_names("task", items, names)
+            tasks = [
+                Task(task_id, name, description)
+                for (task_id, description), name in zip(items, names)
+            ]
+        for task in tasks:
+            print(f"Task {task.task_id} created")
+            story.tasks.append(task)
+
+        return story
+
+    async def acreate_task(self, task_id: int, description: str) -> Task:
+        """Creates a task name based on its description."""
+        prompt = self.task_name_prompt(description)
+        name = await self.aopenai_call(prompt, "task", "name")
+        return Task(task_id, name.strip(), description)
+
+    async def arun(
+        self,
+        project: Project,
+        checkpoint: Optional[str] = None,
+        output: Optional[str] = None,
+    ) -> Project:
+        """Builds the whole epic, story and task hierarchy in one pass.
+
+        Each epic's subtree is generated as soon as the epic exists, instead
+        of waiting for every epic to be named first. Epics, stories and tasks
+        already present in the project, e.g. restored from a journal, are
+        kept and only their missing children are generated.
+
+        Args:
+            project: The project to fill with epics.
+            checkpoint: An optional YAML path rewritten after each epic.
+            output: An optional YAML path the project is streamed to, epic
+                by epic in listed order, as soon as each subtree is complete.
+                The stream goes to a temporary file next to it, which only
+                replaces the output once the whole hierarchy is generated.
+
+        Returns:
+            The project with its complete hierarchy.
+        """
+        writer = None
+        if output:
+            writer = ProjectYamlWriter(
+                output + ".tmp", project.name, project.description
+            )
+        try:
+            project = await self._arun(project, checkpoint, writer)
+        except BaseException:
+            if writer is not None:
+                writer.close()
+                os.remove(writer.file_path)
+            raise
+        if writer is not None:
+            writer.close()
+            os.replace(writer.file_path, output)
+        return project
+
+    async def _arun(
+        self,
+        project: Project,
+        checkpoint: Optional[str],
+        writer: Optional[ProjectYamlWriter],
+    ) -> Project:
+        done = []
+        ordered = None
+        self.index_existing(project)
+
+        def on_epic(epic: Epic) -> None:
+            print(f"{epic.epic_id}. {epic.description}\n")
+            if ordered is not None:
+                ordered.add(epic)
+            if checkpoint:
+                done.append(epic)
+                done.sort(key=lambda e: e.epic_id)
+                Project(project.name, project.description, done).save_to_yaml(
+                    checkpoint
+                )
+
+        if project.epics:
+            await self.asummarize(project)
+            if writer is not None:
+                ordered = OrderedEpicWriter(
+                    writer, [epic.epic_id for epic in project.epics]
+                )
+            await asyncio.gather(
+                *(self.abuild_epic(project, e, on_epic) for e in project.epics)
+            )
+            return project
+
+        async def name_epic(epic: Epic, name: "asyncio.Future[str]") -> None:
+            epic.name = await name
+            if self.journal is not None:
+                self.journal.record_epics([epic])
+
+        async def complete_epics(naming: List["asyncio.Future"]) -> None:
+            # Epics are journaled one at a time as they are named; the list
+            # is marked complete once all of them are.
+            await asyncio.gather(*naming)
+            if self.journal is not None:
+                self.journal.record_complete()
+
+        # The epics prompt keeps the full description; the summary used by
+        # the story and task prompts is made meanwhile.
+        summary = asyncio.ensure_future(self.asummarize(project))
+        if self.streams_lists():
+            if writer is not None:
+                ordered = OrderedEpicWriter(writer, [])
+
+            naming = []
+
+            async def build(epic: Epic, named: "asyncio.Future") -> Epic:
+                await summary
+                return await self.abuild_epic(project, epic, on_epic, named)
+
+            def build_epic(
+                epic_id: int, description: str, name: "asyncio.Future[str]"
+            ) -> "asyncio.Future[Epic]":
+                # Started in listed order, so epics are expected in it.
+                if ordered is not None:
+                    ordered.expect(epic_id)
+                epic = Epic(epic_id, None, description)
+                project.epics.append(epic)
+                naming.append(asyncio.ensure_future(name_epic(epic, name)))
+                return asyncio.ensure_future(build(epic, naming[-1]))
+
+            builds = await self.astream_items(
+                "epic", self.epics_prompt(project), build_epic
+            )
+            await summary
+            await asyncio.gather(complete_epics(naming), *builds)
+            return project
+
+        items, names = await self.arequest_list(
+            "epic", self.epics_prompt(project)
+        )
+        await summary
+        if writer is not None:
+            ordered = OrderedEpicWriter(writer, [eid for eid, _ in items])
+
+        epics = [
+            Epic(epic_id, name, description)
+            for (epic_id, description), name in zip(items, names)
+        ]
+        # Epics and stories join the project as soon as they are listed, so
+        # the candidate lists of their siblings are ranked against them.
+        project.epics.extend(epics)
+        naming = [
+            asyncio.ensure_future(name_epic(epic, name))
+            for epic, name in zip(epics, self.name_ahead("epic", items, names))
+        ]
+        await asyncio.gather(
+            complete_epics(naming),
+            *(
+                self.abuild_epic(project, epic, on_epic, named)
+                for epic, named in zip(epics, naming)
+            ),
+        )
+
+        return project
+
+    async def abuild_epic(
+        self,
+        project: Project,
+        epic: Epic,
+        on_epic: Optional[Callable[[Epic], None]] = None,
+        named: Optional[Awaitable] = None,
+    ) -> Epic:
+        """Builds the missing stories and tasks of one epic.
+
+        Stories are generated from the epic's description, possibly while
+        the epic is still being named, and their tasks likewise while the
+        stories are named.
+
+        Args:
+            project: The project the epic belongs to.
+            epic: The epic to complete.
+            on_epic: An optional callback run once the subtree is complete.
+            named: An optional awaitable completing once the epic is named
+                and journaled; it is awaited before any story is journaled.
+
+        Returns:
+            The complete Epic object.
+        """
+        # The requests of this task and of the tasks it starts are
+        # scheduled in turn with those of the other epics.
+        CURRENT_GROUP.set(epic.epic_id)
+        if self.conversation is not None:
+            session = self.start_session(project, epic)
+            if not epic.stories:
+                epic.stories = await self.acreate_stories_from_epic(
+                    project, epic, session
+                )
+                if named is not None:
+                    await named
+                if self.journal is not None:
+                    self.journal.record_stories(epic, epic.stories)
+                    self.journal.record_complete(epic)
+            await self.abuild_session_tasks(project, epic, session)
+        elif epic.stories:
+            await asyncio.gather(
+                *(
+                    self.abuild_story(project, epic, story)
+                    for story in epic.stories
+                    if not story.tasks
+                )
+            )
+        else:
+
+            async def name_story(
+                story: Story, name: "asyncio.Future[str]"
+            ) -> None:
+                story.name = await name
+                if named is not None:
+                    await named
+                if self.journal is not None:
+                    self.journal.record_stories(epic, [story])
+                print(f"Story {story.story_id} created")
+
+            async def build_story(
+                story_id: int, description: str, name: "asyncio.Future[str]"
+            ) -> Story:
+                story = Story(story_id, None, description)
+                epic.stories.append(story)
+                return await self.abuild_story(
+                    project,
+                    epic,
+                    story,
+                    named=asyncio.ensure_future(name_story(story, name)),
+                )
+
+            prompt = self.story_list_prompt(project, epic)
+            if self.streams_lists():
+                builds = await self.astream_items("story", prompt, build_story)
+            else:
+                items, names = await self.arequest_list(
+                    "story",
+                    prompt,
+                    siblings=self.story_siblings(project, epic),
+                )
+                items, names = self.deduplicate("story", items, names)
+                naming = self.name_ahead("story", items, names)
+                builds = [
+                    build_story(story_id, description, name)
+                    for (story_id, description), name in zip(items, naming)
+                ]
+            await asyncio.gather(*builds)
+            # The stories are all journaled; the marker follows the epic.
+            if named is not None:
+                await named
+            if self.journal is not None:
+                self.journal.record_complete(epic)
+
+        if named is not None:
+            await named
+        if on_epic is not None:
+            on_epic(epic)
+        return epic
@@ -0,0 +1,108 @@
+"""Token accounting of the prompt context.
+
+Story and task prompts repeat the project and epic descriptions. A
+``PromptBudget`` measures prompts with the model's tokenizer, tells when a
+project description is long enough to be replaced by a summary, and trims
+the context of prompts that exceed the budget.
+"""
+import functools
+from typing import Callable, Optional
+
+
+@functools.lru_cache(maxsize=None)
+def encoding_for(model: str):
+    """Returns the tiktoken encoding of a model, loaded once per process."""
+    import tiktoken  # pylint: disable=import-outside-toplevel
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(model: str, text: str) -> int:
+    """Counts the tokens of a text with the tokenizer of a model."""
+    return len(encoding_for(model).encode(text))
+
+
+class PromptBudget:
+    """Keeps prompts under a number of tokens.
+
+    Attributes:
+        model: The model whose tokenizer measures prompts.
+        max_prompt_tokens: The maximum number of tokens of a prompt, or None
+            for no limit.
+        summary_threshold: The number of tokens from which a project
+            description is summarized, or None to never summarize.
+    """
+
+    ELLIPSIS = " ..."
+    MARGIN = 4
+
+    def __init__(
+        self,
+        model: str,
+        max_prompt_tokens: Optional[int] = None,
+        summary_threshold: Optional[int] = None,
+    ):
+        self.model = model
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_threshold = summary_threshold
+
+    def count(self, text: str) -> int:
+        """Counts the tokens of a text."""
+        return count_tokens(self.model, text)
+
+    def truncate(self, text: str, tokens: int) -> str:
+        """Cuts a text down to a number of tokens.
+
+        Args:
+            text: The text to shorten.
+            tokens: The number of tokens to keep.
+
+        Returns:
+            The text, or its first ``tokens`` tokens followed by an ellipsis.
+        """
+        encoding = encoding_for(self.model)
+        encoded = encoding.encode(text)
+        if len(encoded) <= tokens:
+            return text
+        return encoding.decode(encoded[: max(tokens, 0)]) + self.ELLIPSIS
+
+    def needs_summary(self, description: str) -> bool:
+        """Tells whether a project description should be summarized."""
+        return (
+            self.summary_threshold is not None
+            and self.count(description) > self.summary_threshold
+        )
+
+    def fit(self, build: Callable[..., str], *texts: str) -> str:
+        """Builds a prompt, trimming its context to fit the budget.
+
+        Args:
+            build: A function building the prompt from ``texts``.
+            texts: The context texts, the most expendable first. Each is
+                cut as far as needed, down to nothing, before the next one
+                is touched.
+
+        Returns:
+            The prompt.
+        """
+        prompt = build(*texts)
+        if self.max_prompt_tokens is None:
+            return prompt
+        overflow = self.count(prompt) - self.max_prompt_tokens
+        if overflow <= 0:
+            return prompt
+
+        trimmed = []
+        for text in texts:
+            if overflow <= 0:
+                trimmed.append(text)
+                continue
+            tokens = self.count(text)
+            # The ellipsis and re-tokenized boundaries take a few tokens.
+            cut = min(overflow + self.MARGIN, tokens)
+            trimmed.append(self.truncate(text, tokens - cut))
+            overflow -= cut
+        return build(*trimmed)
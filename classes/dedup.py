@@ -0,0 +1,193 @@
+"""Semantic deduplication of generated stories and tasks.
+
+Descriptions are embedded into a chromadb collection per level. A new item
+whose nearest neighbour is at least ``threshold`` similar is a duplicate:
+it is dropped before it costs a naming call, or only reported in "flag"
+mode. The default embedding is computed locally, so no model download or
+network access is needed; it is lexical, so rephrasings with different
+verbs ("Set up database", "Create database") need a sentence embedding
+model to be caught.
+"""
+import hashlib
+import math
+import re
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+WORD = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in into is it its of on or our the "
+    "this that to with your".split()
+)
+
+
+class HashingEmbedding:
+    """An offline embedding of words and character trigrams.
+
+    Features are hashed into a fixed number of signed dimensions and the
+    vector is L2-normalized, so the cosine similarity of two descriptions
+    grows with the words and word fragments they share. Stop words are
+    ignored, so "Store the news in the database" and "Store news in
+    database" are identical.
+
+    Attributes:
+        dimensions: The length of the vectors.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def embed(self, text: str) -> List[float]:
+        """Embeds one text."""
+        vector = [0.0] * self.dimensions
+        for word in WORD.findall(text.lower()):
+            if word in STOP_WORDS:
+                continue
+            features = [word]
+            padded = f" {word} "
+            features.extend(
+                padded[index : index + 3] for index in range(len(padded) - 2)
+            )
+            for feature in features:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 1 else -1.0
+                vector[(digest >> 1) % self.dimensions] += sign
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    # chromadb passes the documents as a positional argument named "input".
+    # pylint: disable-next=redefined-builtin
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return [self.embed(text) for text in input]
+
+
+class Deduplicator:
+    """Flags or drops items similar to ones already generated.
+
+    Attributes:
+        threshold: The cosine similarity from which items are duplicates.
+        mode: "merge" to drop duplicates, "flag" to keep and report them.
+        duplicates: (level, description, existing description, similarity)
+            tuples of every duplicate found.
+    """
+
+    MODES = ("merge", "flag")
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        mode: str = "merge",
+        embedding_function: Optional[Callable] = None,
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown deduplication mode: {mode}")
+        self.threshold = threshold
+        self.mode = mode
+        self.embedding_function = embedding_function or HashingEmbedding()
+        self.duplicates: List[Tuple[str, str, str, float]] = []
+        self._client = None
+        self._collections = {}
+
+    def _collection(self, level: str):
+        if level not in self._collections:
+            if self._client is None:
+                # pylint: disable=import-outside-toplevel
+                import chromadb
+                from chromadb.config import Settings
+
+                self._client = chromadb.EphemeralClient(
+                    Settings(anonymized_telemetry=False)
+                )
+            self._collections[level] = self._client.get_or_create_collection(
+                f"{level}-{id(self)}",
+                embedding_function=self.embedding_function,
+                metadata={"hnsw:space": "cosine"},
+            )
+        return self._collections[level]
+
+    @staticmethod
+    def _key(description: str) -> str:
+        return hashlib.sha1(description.encode("utf-8")).hexdigest()
+
+    def index(self, level: str, descriptions: List[str]) -> None:
+        """Adds existing descriptions to the index of a level.
+
+        Args:
+            level: "story" or "task".
+            descriptions: The descriptions to index.
+        """
+        if descriptions:
+            unique = list(dict.fromkeys(descriptions))
+            self._collection(level).upsert(
+                ids=[self._key(description) for description in unique],
+                documents=unique,
+            )
+
+    def index_project(self, project) -> None:
+        """Indexes the stories and tasks a project already has."""
+        self.index(
+            "story",
+            [story.description for e in project.epics for story in e.stories],
+        )
+        self.index(
+            "task",
+            [
+                task.description
+                for epic in project.epics
+                for story in epic.stories
+                for task in story.tasks
+            ],
+        )
+
+    def nearest(
+        self, level: str, description: str
+    ) -> Optional[Tuple[str, float]]:
+        """Finds the most similar indexed description.
+
+        Returns:
+            The description and its cosine similarity, or None if the index
+            of the level is empty.
+        """
+        collection = self._collection(level)
+        if collection.count() == 0:
+            return None
+        result = collection.query(query_texts=[description], n_results=1)
+        if not result["ids"][0]:
+            return None
+        return result["documents"][0][0], 1.0 - result["distances"][0][0]
+
+    def filter(
+        self,
+        level: str,
+        items: List[Tuple[int, str]],
+        names: List[Optional[str]],
+    ) -> Tuple[List[Tuple[int, str]], List[Optional[str]]]:
+        """Removes the duplicates from a freshly generated list.
+
+        Kept items are indexed, so duplicates within the list are caught
+        as well.
+
+        Args:
+            level: "story" or "task".
+            items: The (item_id, description) tuples.
+            names: The names aligned with ``items``.
+
+        Returns:
+            The items and names without duplicates; in "flag" mode they are
+            returned unchanged.
+        """
+        kept_items, kept_names = [], []
+        for item, name in zip(items, names):
+            match = self.nearest(level, item[1])
+            if match is not None and match[1] >= self.threshold:
+                self.duplicates.append((level, item[1], match[0], match[1]))
+                print(
+                    f"Duplicate {level}: {item[1]!r} ~ {match[0]!r} "
+                    f"({match[1]:.2f})"
+                )
+                if self.mode == "merge":
+                    continue
+            self.index(level, [item[1]])
+            kept_items.append(item)
+            kept_names.append(name)
+        return kept_items, kept_names
@@ -0,0 +1,53 @@
+"""Exceptions raised by the agents."""
+from typing import Optional
+
+
+class OpenAIAgentError(Exception):
+    """An API call could not be completed."""
+
+
+class RetriesExhaustedError(OpenAIAgentError):
+    """An API call still failed after the maximum number of retries."""
+
+
+class ProviderError(Exception):
+    """A language model backend failed to complete a request.
+
+    Attributes:
+        retryable: Whether the same request may succeed if sent again.
+        retry_after: The delay requested by the backend in seconds, if any.
+        rate_limited: Whether the backend rejected the request for exceeding
+            its rate limit.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        retryable: bool = True,
+        retry_after: Optional[float] = None,
+        rate_limited: bool = False,
+    ):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+class JiraExportError(Exception):
+    """The Jira REST API rejected a request.
+
+    Attributes:
+        status: The HTTP status code of the response, or None if no response
+            was received.
+        retry_after: The delay requested by the server in seconds, if any.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
@@ -0,0 +1,464 @@
+"""Export of project files to several formats in one pass.
+
+``export_project`` parses a YAML or JSON lines project file once and fans
+its nodes out to any number of sinks, one per output file. Sinks are
+registered by format name in ``SINKS``; each receives the nodes in batches,
+from its own writer thread when several sinks run at the same time, so a
+slow format such as Parquet does not hold back the others.
+"""
+import csv
+import json
+import os
+import queue
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Type
+
+from classes.storage import iter_project_nodes
+
+BATCH_SIZE = 512
+
+
+class Row:
+    """One node of a project with the IDs of its ancestors.
+
+    Attributes:
+        level: "project", "epic", "story" or "task".
+        fields: The node's scalar values as read from the file.
+        epic_id: The ID of the node's epic, or None for the project.
+        story_id: The ID of the node's story, or None above stories.
+        task_id: The ID of the task, or None above tasks.
+    """
+
+    __slots__ = ("level", "fields", "epic_id", "story_id", "task_id")
+
+    def __init__(
+        self,
+        level: str,
+        fields: dict,
+        epic_id: Optional[int] = None,
+        story_id: Optional[int] = None,
+        task_id: Optional[int] = None,
+    ):
+        self.level = level
+        self.fields = fields
+        self.epic_id = epic_id
+        self.story_id = story_id
+        self.task_id = task_id
+
+    @property
+    def node_id(self):
+        """The node's own ID, or None for the project."""
+        return self.fields.get(f"{self.level}_id")
+
+    @property
+    def name(self) -> str:
+        """The node's name."""
+        return self.fields.get("name") or ""
+
+    @property
+    def description(self) -> str:
+        """The node's description."""
+        return self.fields.get("description") or ""
+
+
+def iter_rows(file_path: str) -> Iterator[Row]:
+    """Reads a project file into rows carrying their ancestors' IDs.
+
+    Args:
+        file_path: The path to the YAML or JSON lines project file.
+
+    Yields:
+        The rows in document order.
+    """
+    epic_id = story_id = None
+    for level, fields in iter_project_nodes(file_path):
+        if level == "project":
+            yield Row(level, fields)
+        elif level == "epic":
+            epic_id, story_id = fields.get("epic_id"), None
+            yield Row(level, fields, epic_id)
+        elif level == "story":
+            story_id = fields.get("story_id")
+            yield Row(level, fields, epic_id, story_id)
+        elif level == "task":
+            yield Row(level, fields, epic_id, story_id, fields.get("task_id"))
+
+
+class Sink:
+    """Base class of the export formats.
+
+    Attributes:
+        path: The path of the output file.
+    """
+
+    extension = ""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def open(self) -> None:
+        """Prepares the output before the first batch."""
+
+    def write(self, rows: List[Row]) -> None:
+        """Writes a batch of rows in document order."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Completes the output after the last batch."""
+
+
+class TextSink(Sink):
+    """Base class of the formats written to a text file."""
+
+    newline: Optional[str] = None
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.file = None
+
+    def open(self) -> None:
+        self.file = open(  # pylint: disable=consider-using-with
+            self.path, "w", encoding="utf-8", newline=self.newline
+        )
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+SINKS: Dict[str, Type[Sink]] = {}
+
+
+def register_sink(name: str) -> Callable[[Type[Sink]], Type[Sink]]:
+    """Registers a sink class under a format name."""
+
+    def register(cls: Type[Sink]) -> Type[Sink]:
+        SINKS[name] = cls
+        return cls
+
+    return register
+
+
+@register_sink("csv")
+class CsvSink(TextSink):
+    """Plain CSV with one row per epic, story and task."""
+
+    extension = ".csv"
+    newline = ""
+
+    def open(self) -> None:
+        super().open()
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["Type", "ID", "Name", "Description"])
+
+    def write(self, rows: List[Row]) -> None:
+        self.writer.writerows(
+            [
+                row.level.capitalize(),
+                "" if row.node_id is None else row.node_id,
+                row.name,
+                row.description,
+            ]
+            for row in rows
+            if row.level != "project"
+        )
+
+
+@register_sink("jira-csv")
+class JiraCsvSink(TextSink):
+    """CSV for the Jira importer, with tasks as sub-tasks of their story.
+
+    Story and task IDs restart in every parent, so rows are numbered in
+    file order to give the importer unique Issue and Parent IDs.
+    """
+
+    extension = ".jira.csv"
+    newline = ""
+    ISSUE_TYPES = {"epic": "Epic", "story": "Story", "task": "Sub-task"}
+
+    def open(self) -> None:
+        super().open()
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(
+            ["Issue Id", "Issue Type", "Parent Id", "Summary", "Description"]
+        )
+        self.issue_id = 0
+        self.parents = {"epic": "", "story": ""}
+
+    def write(self, rows: List[Row]) -> None:
+        for row in rows:
+            if row.level == "project":
+                continue
+            self.issue_id += 1
+            if row.level == "epic":
+                parent = ""
+            elif row.level == "story":
+                parent = self.parents["epic"]
+            else:
+                parent = self.parents["story"]
+            self.parents[row.level] = self.issue_id
+            self.writer.writerow(
+                [
+                    self.issue_id,
+                    self.ISSUE_TYPES[row.level],
+                    parent,
+                    row.name,
+                    row.description,
+                ]
+            )
+
+
+@register_sink("markdown")
+class MarkdownSink(TextSink):
+    """Markdown with epic and story headings and task checklists."""
+
+    extension = ".md"
+
+    def write(self, rows: List[Row]) -> None:
+        lines = []
+        for row in rows:
+            description = " ".join(row.description.split())
+            if row.level == "project":
+                lines.append(f"# {row.name}\n\n{row.description.strip()}\n")
+            elif row.level == "epic":
+                lines.append(
+                    f"\n## Epic {row.epic_id}: {row.name}\n\n{description}\n"
+                )
+            elif row.level == "story":
+                lines.append(
+                    f"\n### Story {row.epic_id}.{row.story_id}: {row.name}\n\n"
+                    f"{description}\n\n"
+                )
+            else:
+                lines.append(f"- [ ] **{row.name}**: {description}\n")
+        self.file.write("".join(lines))
+
+
+@register_sink("jsonl")
+class JsonLinesSink(TextSink):
+    """The JSON lines project format, readable by ``load_project``."""
+
+    extension = ".jsonl"
+
+    def write(self, rows: List[Row]) -> None:
+        self.file.write(
+            "".join(
+                json.dumps(
+                    {"level": row.level, **row.fields}, ensure_ascii=False
+                )
+                + "\n"
+                for row in rows
+            )
+        )
+
+
+def _import_pyarrow():
+    """Imports pyarrow, the optional dependency of the columnar formats.
+
+    Raises:
+        ImportError: pyarrow is not installed.
+    """
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        raise ImportError(
+            "The parquet and arrow formats need pyarrow: "
+            "pip install 'babyagi[parquet]'"
+        ) from None
+    return pyarrow
+
+
+class ArrowSink(Sink):
+    """Base class of the columnar formats, one record per node.
+
+    The columns are level, epic_id, story_id, task_id, name and
+    description; IDs above a node's level are null. pyarrow is imported
+    when the sink is created, so a missing install is reported before any
+    output is written.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.pyarrow = _import_pyarrow()
+        self.writer = None
+        self.schema = None
+
+    def open(self) -> None:
+        pyarrow = self.pyarrow
+        self.schema = pyarrow.schema(
+            [
+                ("level", pyarrow.string()),
+                ("epic_id", pyarrow.int64()),
+                ("story_id", pyarrow.int64()),
+                ("task_id", pyarrow.int64()),
+                ("name", pyarrow.string()),
+                ("description", pyarrow.string()),
+            ]
+        )
+        self.writer = self.create_writer()
+
+    def create_writer(self):
+        """Opens the pyarrow writer of the format."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _id(value) -> Optional[int]:
+        # Older project files quote some IDs, e.g. task_id: '1'.
+        return None if value is None else int(value)
+
+    def write(self, rows: List[Row]) -> None:
+        columns = {
+            "level": [row.level for row in rows],
+            "epic_id": [self._id(row.epic_id) for row in rows],
+            "story_id": [self._id(row.story_id) for row in rows],
+            "task_id": [self._id(row.task_id) for row in rows],
+            "name": [row.name for row in rows],
+            "description": [row.description for row in rows],
+        }
+        self.writer.write_table(
+            self.pyarrow.Table.from_pydict(columns, schema=self.schema)
+        )
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+@register_sink("parquet")
+class ParquetSink(ArrowSink):
+    """A Parquet file, one row group per batch."""
+
+    extension = ".parquet"
+
+    def create_writer(self):
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+
+        return pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+
+@register_sink("arrow")
+class ArrowFileSink(ArrowSink):
+    """An Arrow IPC (Feather v2) file."""
+
+    extension = ".arrow"
+
+    def create_writer(self):
+        return self.pyarrow.ipc.new_file(self.path, self.schema)
+
+
+class SinkThread:
+    """Feeds a sink from its own thread through a bounded queue.
+
+    An error raised by the sink stops its thread and is raised again by
+    ``close``; the batches sent meanwhile are dropped.
+    """
+
+    QUEUE_SIZE = 8
+
+    def __init__(self, sink: Sink):
+        self.sink = sink
+        self.error: Optional[BaseException] = None
+        self._queue: queue.Queue = queue.Queue(self.QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            rows = self._queue.get()
+            if rows is None:
+                return
+            if self.error is None:
+                try:
+                    self.sink.write(rows)
+                except Exception as e:  # pylint: disable=broad-except
+                    self.error = e
+
+    def write(self, rows: List[Row]) -> None:
+        """Queues a batch, waiting while the sink is behind."""
+        self._queue.put(rows)
+
+    def close(self) -> None:
+        """Waits for the queued batches and raises the sink's error."""
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def default_path(file_path: str, name: str, directory: str = "") -> str:
+    """Derives an output path from the input path and a format name."""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(directory, stem + SINKS[name].extension)
+
+
+def create_sink(name: str, path: str) -> Sink:
+    """Creates the sink of a registered format.
+
+    Raises:
+        ValueError: The format is not registered.
+    """
+    if name not in SINKS:
+        raise ValueError(
+            f"Unknown export format: {name} "
+            f"(expected one of {', '.join(sorted(SINKS))})"
+        )
+    return SINKS[name](path)
+
+
+def export_project(
+    file_path: str,
+    sinks: List[Sink],
+    parallel: bool = True,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Writes a project file to several sinks with a single parse.
+
+    Args:
+        file_path: The path to the YAML or JSON lines project file.
+        sinks: The sinks to write to.
+        parallel: Whether each sink writes from its own thread when there
+            are several.
+        batch_size: The number of rows per batch.
+
+    Returns:
+        The number of rows exported.
+    """
+    opened = []
+    writers = []
+    try:
+        for sink in sinks:
+            sink.open()
+            opened.append(sink)
+        if parallel and len(sinks) > 1:
+            writers = [SinkThread(sink) for sink in sinks]
+        else:
+            writers = list(sinks)
+
+        count = 0
+        batch = []
+        for row in iter_rows(file_path):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                for writer in writers:
+                    writer.write(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            for writer in writers:
+                writer.write(batch)
+            count += len(batch)
+    finally:
+        errors = []
+        for writer in writers:
+            if isinstance(writer, SinkThread):
+                try:
+                    writer.close()
+                except Exception as e:  # pylint: disable=broad-except
+                    errors.append(e)
+        for sink in opened:
+            sink.close()
+    if errors:
+        raise errors[0]
+    return count
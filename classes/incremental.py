@@ -0,0 +1,247 @@
+"""Incremental regeneration of the subtrees of a project.
+
+The stories of an epic are generated from the project and epic
+descriptions, and the tasks of a story from those and the story's
+description. A hash of that input context is recorded for every epic and
+story in a state file next to the project file. When a description is
+edited, the hashes that no longer match name the stale subtrees, and only
+those are regenerated and merged back into the project.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+from classes.model import Epic, Project, Story
+
+if TYPE_CHECKING:
+    from classes.classes import AsyncOpenAIAgent
+
+StoryPath = Tuple[int, int]
+
+
+def context_hash(*texts: str) -> str:
+    """Hashes the texts a prompt is built from."""
+    data = json.dumps(texts, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def stories_hash(project: Project, epic: Epic) -> str:
+    """Hashes the input context of the stories of an epic."""
+    return context_hash(project.description, epic.description)
+
+
+def tasks_hash(project: Project, epic: Epic, story: Story) -> str:
+    """Hashes the input context of the tasks of a story."""
+    return context_hash(
+        project.description, epic.description, story.description
+    )
+
+
+def state_path(project_path: str) -> str:
+    """Returns the path of the state file of a project file."""
+    return os.path.splitext(project_path)[0] + ".state.json"
+
+
+def snapshot(project: Project) -> dict:
+    """Computes the context hashes of every epic and story of a project.
+
+    Returns:
+        A mapping with an "epics" mapping of epic IDs and a "stories"
+        mapping of "EPIC.STORY" IDs to hashes.
+    """
+    state = {"epics": {}, "stories": {}}
+    for epic in project.epics:
+        state["epics"][str(epic.epic_id)] = stories_hash(project, epic)
+        for story in epic.stories:
+            key = f"{epic.epic_id}.{story.story_id}"
+            state["stories"][key] = tasks_hash(project, epic, story)
+    return state
+
+
+def load_state(path: str) -> Optional[dict]:
+    """Reads a state file, or returns None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_state(project: Project, path: str) -> None:
+    """Records the context hashes of a project in a state file."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(snapshot(project), file, indent=2)
+
+
+def parse_story_path(text: str) -> StoryPath:
+    """Parses an "EPIC.STORY" story path such as "2.4".
+
+    Raises:
+        ValueError: The text is not two dot-separated numbers.
+    """
+    epic_id, _, story_id = text.partition(".")
+    try:
+        return int(epic_id), int(story_id)
+    except ValueError:
+        raise ValueError(
+            f"Invalid story {text!r}: expected EPIC.STORY, e.g. 2.4"
+        ) from None
+
+
+def stale_targets(
+    project: Project, state: dict
+) -> Tuple[List[int], List[StoryPath]]:
+    """Finds the subtrees whose input context changed since the state.
+
+    Epics without stories and stories without tasks are included too. Nodes
+    missing from the state are new and only regenerated if incomplete.
+
+    Returns:
+        The IDs of the epics whose stories are stale, and the paths of the
+        stories, in other epics, whose tasks are stale.
+    """
+    epics, stories = [], []
+    for epic in project.epics:
+        recorded = state["epics"].get(str(epic.epic_id))
+        if not epic.stories or (
+            recorded is not None and recorded != stories_hash(project, epic)
+        ):
+            epics.append(epic.epic_id)
+            continue
+        for story in epic.stories:
+            recorded = state["stories"].get(f"{epic.epic_id}.{story.story_id}")
+            if not story.tasks or (
+                recorded is not None
+                and recorded != tasks_hash(project, epic, story)
+            ):
+                stories.append((epic.epic_id, story.story_id))
+    return epics, stories
+
+
+def _key(description: str) -> str:
+    return " ".join(description.lower().split())
+
+
+class Regenerator:
+    """Regenerates chosen subtrees of a project in place.
+
+    A regenerated epic gets a new list of stories. New stories with the
+    same description as an old one take over its name and, if their tasks'
+    context is unchanged, its tasks; the others get new tasks. A regenerated
+    story gets new tasks. The rest of the project is left untouched.
+
+    Attributes:
+        agent: The agent generating the lists.
+        state: The context hashes of the last run, or None if unknown.
+    """
+
+    def __init__(
+        self, agent: "AsyncOpenAIAgent", state: Optional[dict] = None
+    ):
+        self.agent = agent
+        self.state = state
+
+    def _unchanged(self, path: str, context: str) -> bool:
+        if self.state is None:
+            return False
+        return self.state["stories"].get(path) == context
+
+    async def arun(
+        self,
+        project: Project,
+        epic_ids: List[int],
+        story_paths: List[StoryPath],
+    ) -> Project:
+        """Regenerates the stories of epics and the tasks of stories.
+
+        Args:
+            project: The project to update in place.
+            epic_ids: The epics whose stories and tasks are regenerated.
+            story_paths: The (epic_id, story_id) paths of the stories whose
+                tasks are regenerated; stories of regenerated epics are
+                skipped.
+
+        Returns:
+            The updated project.
+
+        Raises:
+            KeyError: A target does not exist in the project.
+        """
+        epics = []
+        for epic_id in dict.fromkeys(epic_ids):
+            epic = project.get_epic(epic_id)
+            if epic is None:
+                raise KeyError(f"No epic {epic_id}")
+            epics.append(epic)
+        stories = []
+        for epic_id, story_id in dict.fromkeys(story_paths):
+            if epic_id in epic_ids:
+                continue
+            epic = project.get_epic(epic_id)
+            story = project.find(epic_id, story_id)
+            if story is None:
+                raise KeyError(f"No story {epic_id}.{story_id}")
+            stories.append((epic, story))
+
+        # The old versions of the regenerated nodes must not count as
+        # duplicates of their replacements.
+        targets: Set[int] = {id(story) for _, story in stories}
+        kept = Project(project.name, project.description)
+        for epic in project.epics:
+            if epic.epic_id in epic_ids:
+                continue
+            view = Epic(epic.epic_id, epic.name, epic.description)
+            for story in epic.stories:
+                if id(story) not in targets:
+                    view.stories.append(story)
+                else:
+                    view.stories.append(
+                        Story(story.story_id, story.name, story.description)
+                    )
+            kept.epics.append(view)
+        self.agent.index_existing(kept)
+        await self.agent.asummarize(project)
+
+        await asyncio.gather(
+            *(self.aregenerate_epic(project, epic) for epic in epics),
+            *(
+                self.aregenerate_story(project, epic, story)
+                for epic, story in stories
+            ),
+        )
+        return project
+
+    async def aregenerate_epic(self, project: Project, epic: Epic) -> Epic:
+        """Regenerates the stories of an epic and merges them."""
+        old: Dict[str, Story] = {}
+        for story in epic.stories:
+            old.setdefault(_key(story.description), story)
+        stories = await self.agent.acreate_stories_from_epic(project, epic)
+        for story in stories:
+            previous = old.pop(_key(story.description), None)
+            if previous is None:
+                continue
+            story.name = previous.name
+            path = f"{epic.epic_id}.{previous.story_id}"
+            if self._unchanged(path, tasks_hash(project, epic, story)):
+                story.tasks = previous.tasks
+        epic.stories = stories
+        await asyncio.gather(
+            *(
+                self.agent.abuild_story(project, epic, story)
+                for story in stories
+                if not story.tasks
+            )
+        )
+        print(f"Epic {epic.epic_id} regenerated")
+        return epic
+
+    async def aregenerate_story(
+        self, project: Project, epic: Epic, story: Story
+    ) -> Story:
+        """Regenerates the tasks of a story."""
+        story.tasks = []
+        await self.agent.abuild_story(project, epic, story)
+        print(f"Story {epic.epic_id}.{story.story_id} regenerated")
+        return story
@@ -0,0 +1,355 @@
+"""Export of a project hierarchy to Jira through the REST API.
+
+Issues are created with the bulk endpoint, at most ``MAX_BATCH_SIZE`` per
+request, over one pooled HTTP session. The levels are exported in order,
+epics, stories and then tasks, because every issue needs the key of its
+parent; the batches of one level are sent concurrently.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from classes.errors import JiraExportError
+from classes.model import Epic, Project, Story, Task
+from classes.ratelimit import backoff_delay
+
+BULK_PATH = "/rest/api/2/issue/bulk"
+MAX_BATCH_SIZE = 50
+SUMMARY_LENGTH = 255
+
+# A node is identified by its path of IDs: (epic_id,), (epic_id, story_id)
+# or (epic_id, story_id, task_id).
+NodePath = Tuple[int, ...]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converts a Retry-After header to a delay in seconds.
+
+    Args:
+        value: The header, either a number of seconds or an HTTP date.
+
+    Returns:
+        The delay, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class JiraClient:
+    """A client of the Jira issue API sharing one pool of connections.
+
+    Attributes:
+        url: The base URL of the Jira site.
+        session: The HTTP session whose connections are reused by all
+            requests, from any thread.
+        max_retries: The number of times a throttled request is sent again.
+        timeout: The timeout of a request in seconds.
+    """
+
+    # A throttled request was not processed and is always sent again. A 503
+    # may come from a proxy after the request was applied, so only idempotent
+    # requests are retried on it: a bulk create sent twice duplicates issues.
+    RETRY_STATUSES = (429,)
+    IDEMPOTENT_RETRY_STATUSES = (429, 503)
+
+    def __init__(
+        self,
+        url: str,
+        email: Optional[str] = None,
+        token: Optional[str] = None,
+        pool_size: int = 4,
+        max_retries: int = 5,
+        timeout: float = 30.0,
+    ):
+        self.url = url.rstrip("/")
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept"] = "application/json"
+        if token:
+            if email:
+                self.session.auth = (email, token)
+            else:
+                self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def close(self) -> None:
+        """Closes the pooled connections."""
+        self.session.close()
+
+    def post(self, path: str, payload: dict, idempotent: bool = False) -> dict:
+        """Sends a JSON request, retrying it while the server throttles.
+
+        Args:
+            path: The path of the endpoint, e.g. ``BULK_PATH``.
+            payload: The JSON body.
+            idempotent: Whether sending the request twice has the same effect
+                as once, which allows retrying it when the server is
+                unavailable too.
+
+        Returns:
+            The JSON body of the response.
+
+        Raises:
+            JiraExportError: The request failed or is still throttled after
+                ``max_retries`` retries.
+        """
+        statuses = self.RETRY_STATUSES
+        if idempotent:
+            statuses = self.IDEMPOTENT_RETRY_STATUSES
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._post(path, payload)
+            except JiraExportError as e:
+                if e.status not in statuses or attempt == self.max_retries:
+                    raise
+                time.sleep(backoff_delay(attempt, retry_after=e.retry_after))
+        raise AssertionError("unreachable")
+
+    def _post(self, path: str, payload: dict) -> dict:
+        try:
+            response = self.session.post(
+                self.url + path, json=payload, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise JiraExportError(f"Jira request failed: {e}") from e
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        # The bulk endpoint answers 400 when every issue of a request was
+        # rejected, with the same body as a partial success.
+        if response.status_code in (200, 201) or (
+            response.status_code == 400
+            and isinstance(body, dict)
+            and "errors" in body
+        ):
+            return body or {}
+
+        raise JiraExportError(
+            f"Jira returned HTTP {response.status_code}: "
+            f"{response.text[:200]}",
+            response.status_code,
+            parse_retry_after(response.headers.get("Retry-After")),
+        )
+
+    def bulk_create(
+        self, fields: List[dict]
+    ) -> Tuple[List[Optional[str]], Dict[int, str]]:
+        """Creates issues with one bulk request.
+
+        Args:
+            fields: The fields of each issue, at most ``MAX_BATCH_SIZE``.
+
+        Returns:
+            The keys of the issues, aligned with ``fields``, with None for
+            rejected ones, and the error message of each rejected index.
+        """
+        body = self.post(
+            BULK_PATH, {"issueUpdates": [{"fields": f} for f in fields]}
+        )
+        errors = {}
+        for error in body.get("errors") or []:
+            details = error.get("elementErrors") or {}
+            messages = list((details.get("errors") or {}).values())
+            messages.extend(details.get("errorMessages") or [])
+            errors[int(error["failedElementNumber"])] = (
+                "; ".join(messages) or f"HTTP {error.get('status')}"
+            )
+
+        # Created issues are listed in request order, without the rejected.
+        created = iter(body.get("issues") or [])
+        keys = []
+        for index in range(len(fields)):
+            issue = None if index in errors else next(created, None)
+            keys.append(None if issue is None else issue["key"])
+            if issue is None and index not in errors:
+                errors[index] = "missing from the response"
+        return keys, errors
+
+
+class JiraExport:
+    """The outcome of an export.
+
+    Attributes:
+        keys: The issue key of every created node, by node path.
+        errors: (node path, message) tuples of the nodes not created,
+            including the descendants of failed nodes.
+        requests: The number of bulk requests sent.
+        elapsed: The duration of the export in seconds.
+    """
+
+    def __init__(self):
+        self.keys: Dict[NodePath, str] = {}
+        self.errors: List[Tuple[NodePath, str]] = []
+        self.requests = 0
+        self.elapsed = 0.0
+
+
+class JiraExporter:
+    """Creates the epics, stories and tasks of a project as Jira issues.
+
+    Stories are linked to their epic through the ``parent`` field, as team
+    managed projects expect, or through ``epic_link_field`` in company
+    managed projects. Tasks are created as sub-tasks of their story.
+
+    Attributes:
+        client: The client sending the requests.
+        project_key: The key of the Jira project receiving the issues.
+        batch_size: The number of issues per bulk request.
+        concurrency: The number of bulk requests in flight.
+        task_type: The issue type of tasks; it must be a sub-task type.
+        epic_link_field: The ID of the "Epic Link" custom field, or None to
+            use the parent field.
+        epic_name_field: The ID of the "Epic Name" custom field, required by
+            company managed projects, or None.
+    """
+
+    def __init__(
+        self,
+        client: JiraClient,
+        project_key: str,
+        batch_size: int = MAX_BATCH_SIZE,
+        concurrency: int = 4,
+        task_type: str = "Sub-task",
+        epic_link_field: Optional[str] = None,
+        epic_name_field: Optional[str] = None,
+    ):
+        self.client = client
+        self.project_key = project_key
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.concurrency = concurrency
+        self.task_type = task_type
+        self.epic_link_field = epic_link_field
+        self.epic_name_field = epic_name_field
+
+    def issue_fields(
+        self, issue_type: str, node, parent: Optional[str] = None
+    ) -> dict:
+        """Builds the fields of the issue of an epic, story or task."""
+        summary = " ".join((node.name or node.description).split())
+        fields = {
+            "project": {"key": self.project_key},
+            "issuetype": {"name": issue_type},
+            "summary": summary[:SUMMARY_LENGTH],
+            "description": node.description,
+        }
+        if parent is not None:
+            fields["parent"] = {"key": parent}
+        return fields
+
+    def epic_fields(self, epic: Epic) -> dict:
+        """Builds the fields of the issue of an epic."""
+        fields = self.issue_fields("Epic", epic)
+        if self.epic_name_field:
+            fields[self.epic_name_field] = fields["summary"]
+        return fields
+
+    def story_fields(self, story: Story, epic_key: str) -> dict:
+        """Builds the fields of the issue of a story."""
+        if self.epic_link_field:
+            fields = self.issue_fields("Story", story)
+            fields[self.epic_link_field] = epic_key
+            return fields
+        return self.issue_fields("Story", story, epic_key)
+
+    def task_fields(self, task: Task, story_key: str) -> dict:
+        """Builds the fields of the issue of a task."""
+        return self.issue_fields(self.task_type, task, story_key)
+
+    def export(self, project: Project) -> JiraExport:
+        """Creates the issues of a whole project.
+
+        A node whose parent could not be created is skipped and reported
+        in the errors, as are its descendants.
+
+        Args:
+            project: The project to export.
+
+        Returns:
+            The keys of the created issues and the errors.
+        """
+        result = JiraExport()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            self._create(
+                executor,
+                result,
+                [((e.epic_id,), self.epic_fields(e)) for e in project.epics],
+            )
+
+            stories = []
+            for epic in project.epics:
+                for story in epic.stories:
+                    path = (epic.epic_id, story.story_id)
+                    epic_key = self._parent(result, path)
+                    if epic_key is not None:
+                        fields = self.story_fields(story, epic_key)
+                        stories.append((path, fields))
+            self._create(executor, result, stories)
+
+            tasks = []
+            for epic in project.epics:
+                for story in epic.stories:
+                    for task in story.tasks:
+                        path = (epic.epic_id, story.story_id, task.task_id)
+                        story_key = self._parent(result, path)
+                        if story_key is not None:
+                            fields = self.task_fields(task, story_key)
+                            tasks.append((path, fields))
+            self._create(executor, result, tasks)
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def _parent(result: JiraExport, path: NodePath) -> Optional[str]:
+        parent = result.keys.get(path[:-1])
+        if parent is None:
+            result.errors.append((path, "parent issue was not created"))
+        return parent
+
+    def _create(
+        self,
+        executor: ThreadPoolExecutor,
+        result: JiraExport,
+        nodes: List[Tuple[NodePath, dict]],
+    ) -> None:
+        batches = [
+            nodes[start : start + self.batch_size]
+            for start in range(0, len(nodes), self.batch_size)
+        ]
+        outcomes = executor.map(self._send, batches)
+        for batch, (keys, errors) in zip(batches, outcomes):
+            result.requests += 1
+            for index, ((path, _), key) in enumerate(zip(batch, keys)):
+                if key is None:
+                    result.errors.append((path, errors[index]))
+                else:
+                    result.keys[path] = key
+
+    def _send(
+        self, batch: List[Tuple[NodePath, dict]]
+    ) -> Tuple[List[Optional[str]], Dict[int, str]]:
+        try:
+            return self.client.bulk_create([fields for _, fields in batch])
+        except JiraExportError as e:
+            errors = dict.fromkeys(range(len(batch)), str(e))
+            return [None] * len(batch), errors
@@ -0,0 +1,176 @@
+"""Append-only journal of generated nodes.
+
+Every epic, story and task is written to a JSON lines file as soon as it is
+complete, so an interrupted run can be resumed without regenerating the
+nodes that already exist. Epics and stories may be recorded one at a time,
+so a "complete" entry marks the lists that were recorded in full: the epics
+of the project, and the stories of each epic. Tasks are recorded per story
+in one entry batch.
+"""
+import json
+import os
+from typing import Iterator, List, Optional
+
+from classes.model import Epic, Project, Story, Task
+
+
+class Journal:
+    """An append-only JSON lines log of completed nodes.
+
+    Attributes:
+        path: The path to the journal file.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not resume and os.path.exists(path):
+            os.remove(path)
+
+    def _append(self, entries: List[dict]) -> None:
+        lines = "".join(
+            json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries
+        )
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def record_epics(self, epics: List[Epic]) -> None:
+        """Records named epics.
+
+        Args:
+            epics: The epics to record.
+        """
+        self._append([{"level": "epic", **epic.to_dict()} for epic in epics])
+
+    def record_stories(self, epic: Epic, stories: List[Story]) -> None:
+        """Records the stories generated for an epic.
+
+        Args:
+            epic: The parent epic.
+            stories: The stories to record.
+        """
+        self._append(
+            [
+                {"level": "story", "epic_id": epic.epic_id, **story.to_dict()}
+                for story in stories
+            ]
+        )
+
+    def record_complete(self, epic: Optional[Epic] = None) -> None:
+        """Records that a list of children was recorded in full.
+
+        Args:
+            epic: The epic whose stories are all recorded, or None for the
+                epics of the project.
+        """
+        entry = {"level": "complete"}
+        if epic is not None:
+            entry["epic_id"] = epic.epic_id
+        self._append([entry])
+
+    def record_tasks(self, epic: Epic, story: Story) -> None:
+        """Records the tasks generated for a story.
+
+        Args:
+            epic: The epic the story belongs to.
+            story: The story whose tasks are recorded.
+        """
+        self._append(
+            [
+                {
+                    "level": "task",
+                    "epic_id": epic.epic_id,
+                    "story_id": story.story_id,
+                    **task.to_dict(),
+                }
+                for task in story.tasks
+            ]
+        )
+
+    def entries(self) -> Iterator[dict]:
+        """Reads the recorded entries in order.
+
+        A truncated last line, left by an interrupted write, is ignored.
+
+        Yields:
+            The recorded entries.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    return
+
+    def restore(self, project: Project) -> Project:
+        """Merges the recorded nodes into a project.
+
+        Nodes already present in the project are left untouched. Epics and
+        stories whose list was not marked complete are dropped, with their
+        descendants, so that the whole list is generated again; the journal
+        is rewritten without them, so the regenerated nodes do not mix with
+        the dropped ones on a later resume.
+
+        Args:
+            project: The project to complete.
+
+        Returns:
+            The project with all recorded nodes of complete lists.
+        """
+        entries = list(self.entries())
+        complete = {
+            entry.get("epic_id")
+            for entry in entries
+            if entry["level"] == "complete"
+        }
+        kept = []
+        for entry in entries:
+            fields = dict(entry)
+            level = fields.pop("level")
+            if level == "complete":
+                epic_id = fields.get("epic_id")
+                if epic_id is None or project.get_epic(epic_id) is not None:
+                    kept.append(entry)
+                continue
+            if level == "epic":
+                if None not in complete:
+                    continue
+                if project.get_epic(fields["epic_id"]) is None:
+                    project.epics.append(Epic.from_dict(fields))
+                kept.append(entry)
+                continue
+
+            epic_id = fields.pop("epic_id")
+            epic = project.get_epic(epic_id)
+            if epic is None:
+                continue
+            if level == "story":
+                if epic_id not in complete:
+                    continue
+                if epic.get_story(fields["story_id"]) is None:
+                    epic.stories.append(Story.from_dict(fields))
+            elif level == "task":
+                story = epic.get_story(fields.pop("story_id"))
+                if story is None:
+                    continue
+                if story.get_task(fields["task_id"]) is None:
+                    story.tasks.append(Task.from_dict(fields))
+            kept.append(entry)
+        self._rewrite(kept)
+        return project
+
+    def _rewrite(self, entries: List[dict]) -> None:
+        """Replaces the journal with the given entries."""
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            for entry in entries:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
@@ -0,0 +1,266 @@
+"""Per-call instrumentation of the agents.
+
+The agent reports every language model call as a ``CallRecord`` to its
+hooks. Hooks are plain callables; the collectors below write the records as
+JSON lines or aggregate them into the Prometheus text format.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, TextIO, Tuple
+
+# USD per 1,000 prompt and completion tokens.
+PRICES = {
+    "gpt-3.5-turbo": (0.0015, 0.002),
+    "gpt-3.5-turbo-16k": (0.003, 0.004),
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-32k": (0.06, 0.12),
+}
+
+
+def estimate_cost(
+    model: str, prompt_tokens: int, completion_tokens: int
+) -> float:
+    """Estimates the price of a call in USD.
+
+    Args:
+        model: The name of the model; dated snapshots use their base price.
+        prompt_tokens: The number of tokens in the prompt.
+        completion_tokens: The number of generated tokens.
+
+    Returns:
+        The estimated cost, or 0.0 for models without a known price.
+    """
+    prices = PRICES.get(model)
+    if prices is None:
+        matches = [name for name in PRICES if model.startswith(name + "-")]
+        if not matches:
+            return 0.0
+        prices = PRICES[max(matches, key=len)]
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1000
+
+
+class CallRecord:
+    """One language model call as seen by the agent.
+
+    Attributes:
+        level: The hierarchy level of the call: "epic", "story" or "task".
+        kind: "list" for prompts generating children, "name" for naming.
+        model: The name of the model.
+        latency: The wall time of the call in seconds, including retries.
+        prompt_tokens: The number of tokens in the prompt.
+        completion_tokens: The number of generated tokens.
+        retries: The number of failed attempts before the result.
+        cached: Whether the response came from the response cache.
+        error: The error message if the call failed for good.
+        cost: The estimated cost in USD.
+        timestamp: The UNIX time at which the call finished.
+    """
+
+    def __init__(
+        self,
+        level: str,
+        kind: str,
+        model: str,
+        latency: float = 0.0,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        retries: int = 0,
+        cached: bool = False,
+        error: Optional[str] = None,
+    ):
+        self.level = level
+        self.kind = kind
+        self.model = model
+        self.latency = latency
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.retries = retries
+        self.cached = cached
+        self.error = error
+        self.cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        self.timestamp = time.time()
+
+    def to_dict(self) -> dict:
+        """Converts the record to a dictionary.
+
+        Returns:
+            A dictionary representation of the record.
+        """
+        return {
+            "timestamp": self.timestamp,
+            "level": self.level,
+            "kind": self.kind,
+            "model": self.model,
+            "latency": self.latency,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "retries": self.retries,
+            "cached": self.cached,
+            "error": self.error,
+            "cost": self.cost,
+        }
+
+
+class JsonLinesCollector:
+    """Hook appending every call record to a JSON lines file.
+
+    Attributes:
+        path: The path to the output file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file: TextIO = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self, record: CallRecord) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record.to_dict()) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        """Closes the output file."""
+        with self._lock:
+            self._file.close()
+
+
+class UsageCollector:
+    """Hook totalling calls and tokens per hierarchy level.
+
+    Attributes:
+        usage: Per level, the number of calls, cached calls, prompt tokens
+            and completion tokens.
+    """
+
+    def __init__(self):
+        self.usage: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: CallRecord) -> None:
+        with self._lock:
+            totals = self.usage.setdefault(record.level, [0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += int(record.cached)
+            totals[2] += record.prompt_tokens
+            totals[3] += record.completion_tokens
+
+    def report(self) -> str:
+        """Renders the totals as one line per level.
+
+        Returns:
+            The report, empty if no call was made.
+        """
+        with self._lock:
+            return "\n".join(
+                f"{level or '-':<8}: {calls} calls ({cached} cached), "
+                f"{prompt} prompt tokens"
+                f" ({prompt / max(calls - cached, 1):.0f} per call), "
+                f"{completion} completion tokens"
+                for level, (calls, cached, prompt, completion) in sorted(
+                    self.usage.items()
+                )
+            )
+
+
+class PrometheusCollector:
+    """Hook aggregating call records into Prometheus metrics.
+
+    Counters are labelled by level and kind; latencies go to a histogram.
+
+    Attributes:
+        path: The path the text format is written to on close, or None.
+    """
+
+    BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    COUNTERS = (
+        ("calls_total", "Language model calls.", "counter"),
+        ("cache_hits_total", "Calls served from the cache.", "counter"),
+        ("errors_total", "Calls that failed after all retries.", "counter"),
+        ("retries_total", "Failed attempts that were retried.", "counter"),
+        ("prompt_tokens_total", "Prompt tokens sent.", "counter"),
+        ("completion_tokens_total", "Completion tokens received.", "counter"),
+        ("cost_usd_total", "Estimated cost in USD.", "counter"),
+    )
+    PREFIX = "babyagi_llm_"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._values: Dict[Tuple[str, str, str], float] = {}
+        self._buckets: Dict[Tuple[str, str], list] = {}
+        self._latency: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: CallRecord) -> None:
+        labels = (record.level, record.kind)
+        increments = {
+            "calls_total": 1,
+            "cache_hits_total": int(record.cached),
+            "errors_total": int(record.error is not None),
+            "retries_total": record.retries,
+            "prompt_tokens_total": record.prompt_tokens,
+            "completion_tokens_total": record.completion_tokens,
+            "cost_usd_total": record.cost,
+        }
+        with self._lock:
+            for name, value in increments.items():
+                key = (name,) + labels
+                self._values[key] = self._values.get(key, 0) + value
+            if record.cached:
+                return
+            buckets = self._buckets.setdefault(
+                labels, [0] * len(self.BUCKETS)
+            )
+            for index, bound in enumerate(self.BUCKETS):
+                if record.latency <= bound:
+                    buckets[index] += 1
+            total = self._latency.setdefault(labels, [0, 0.0])
+            total[0] += 1
+            total[1] += record.latency
+
+    def render(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format.
+
+        Returns:
+            The metrics as text.
+        """
+        lines = []
+        with self._lock:
+            for name, help_text, metric_type in self.COUNTERS:
+                metric = self.PREFIX + name
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {metric_type}")
+                for (key, level, kind), value in sorted(self._values.items()):
+                    if key == name:
+                        lines.append(
+                            f'{metric}{{level="{level}",kind="{kind}"}} {value}'
+                        )
+
+            metric = self.PREFIX + "latency_seconds"
+            lines.append(f"# HELP {metric} Latency of uncached calls.")
+            lines.append(f"# TYPE {metric} histogram")
+            for (level, kind), buckets in sorted(self._buckets.items()):
+                labels = f'level="{level}",kind="{kind}"'
+                for bound, count in zip(self.BUCKETS, buckets):
+                    lines.append(
+                        f'{metric}_bucket{{{labels},le="{bound}"}} {count}'
+                    )
+                count, total = self._latency[(level, kind)]
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{metric}_sum{{{labels}}} {total}")
+                lines.append(f"{metric}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        """Writes the metrics to ``path``, if one was given."""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(self.render())
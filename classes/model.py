@@ -0,0 +1,372 @@
+"""The project hierarchy: a project, its epics, their stories and tasks.
+
+These classes hold the generated data only; they are kept apart from the
+agent so that loading, saving and exporting project files does not import
+the language model backends.
+"""
+from typing import Optional
+
+import yaml
+
+from classes.streaming import ProjectYamlWriter
+
+
+class Parent:
+    """A node whose children can be looked up by their IDs."""
+
+    __slots__ = ("_index",)
+
+    def __init__(self):
+        self._index = None
+
+    def lookup(self, children: list, attribute: str, node_id: int):
+        """Looks up a child by its ID through an index cached on this node.
+
+        The index maps IDs to positions in the child list. It is rebuilt
+        when the list was replaced or changed length, when the child found
+        at a position no longer has the ID, e.g. after ``stories[i] = ...``
+        or an edited ID, and before a miss is reported. The first of several
+        children sharing an ID wins.
+
+        Args:
+            children: The list of children of this node.
+            attribute: The name of the ID attribute, e.g. "epic_id".
+            node_id: The ID of the child.
+
+        Returns:
+            The child, or None if no child has this ID.
+        """
+        index = self._index
+        fresh = (
+            index is None
+            or index[0] is not children
+            or index[1] != len(children)
+        )
+        while True:
+            if fresh:
+                positions = {}
+                for position, child in enumerate(children):
+                    positions.setdefault(getattr(child, attribute), position)
+                index = self._index = (children, len(children), positions)
+            position = index[2].get(node_id)
+            if position is not None:
+                child = children[position]
+                if getattr(child, attribute) == node_id:
+                    return child
+            if fresh:
+                return None
+            fresh = True
+
+
+class Project(Parent):
+    """A Project class"""
+
+    __slots__ = ("name", "description", "epics")
+
+    def __init__(self, name: str, description: str, epics=None):
+        self.name = name
+        self.description = description
+        self.epics = [
+            Epic.from_dict(epic) if isinstance(epic, dict) else epic
+            for epic in epics or []
+        ]
+        super().__init__()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Project":
+        """Creates a project and its hierarchy from a dictionary.
+
+        Args:
+            data: The mapping under the "project" key of a project file.
+
+        Returns:
+            A Project object.
+        """
+        return cls(
+            data["name"],
+            data["description"],
+            [Epic.from_dict(epic) for epic in data.get("epics") or []],
+        )
+
+    def to_dict(self) -> dict:
+        """Converts the project to a dictionary.
+
+        Returns:
+            A dictionary representation of the project.
+        """
+        return {
+            "name": self.name,
+            "description": self.description,
+            "epics": [epic.to_dict(children=True) for epic in self.epics],
+        }
+
+    def get_epic(self, epic_id: int) -> Optional["Epic"]:
+        """Looks up an epic by its ID.
+
+        Args:
+            epic_id: The ID of the epic.
+
+        Returns:
+            The epic, or None if the project has no epic with this ID.
+        """
+        return self.lookup(self.epics, "epic_id", epic_id)
+
+    def find(
+        self,
+        epic_id: int,
+        story_id: Optional[int] = None,
+        task_id: Optional[int] = None,
+    ):
+        """Looks up an epic, a story or a task by its path of IDs.
+
+        Args:
+            epic_id: The ID of the epic.
+            story_id: The ID of a story of the epic, if looking for a story
+                or a task.
+            task_id: The ID of a task of the story, if looking for a task.
+
+        Returns:
+            The node, or None if any ID along the path is unknown.
+        """
+        node = self.get_epic(epic_id)
+        if node is not None and story_id is not None:
+            node = node.get_story(story_id)
+        if node is not None and task_id is not None:
+            node = node.get_task(task_id)
+        return node
+
+    def save_to_yaml(self, file_path: str):
+        """Saves the project to a YAML file.
+
+        The file is written epic by epic, without building a nested copy of
+        the whole hierarchy first.
+
+        Args:
+            file_path: The path to the YAML file to save the project.
+        """
+        writer = ProjectYamlWriter(file_path, self.name, self.description)
+        with writer:
+            for epic in self.epics:
+                writer.write_epic(epic)
+
+
+class Epic(Parent):
+    """An epic.
+
+    Attributes:
+        description: A detailed description of the epic.
+        stories: A list of stories that are part of this epic.
+    """
+
+    __slots__ = ("epic_id", "name", "description", "stories")
+
+    def __init__(self, epic_id: int, name: str, description: str, stories=None):
+        self.epic_id = epic_id
+        self.name = name
+        self.description = description
+        self.stories = stories if stories is not None else []
+        super().__init__()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Epic":
+        """Creates an epic and its stories from a dictionary.
+
+        Args:
+            data: A dictionary representation of the epic.
+
+        Returns:
+            An Epic object.
+        """
+        return cls(
+            int(data["epic_id"]),
+            data["name"],
+            data["description"],
+            [Story.from_dict(story) for story in data.get("stories") or []],
+        )
+
+    def to_dict(self, children: bool = False) -> dict:
+        """Converts the epic to a dictionary.
+
+        Args:
+            children: Whether to include the stories and their tasks.
+
+        Returns:
+            A dictionary representation of the epic.
+        """
+        data = {
+            "epic_id": self.epic_id,
+            "name": self.name,
+            "description": self.description,
+        }
+        if children:
+            data["stories"] = [
+                story.to_dict(children=True) for story in self.stories
+            ]
+        return data
+
+    def get_story(self, story_id: int) -> Optional["Story"]:
+        """Looks up a story of the epic by its ID.
+
+        Args:
+            story_id: The ID of the story.
+
+        Returns:
+            The story, or None if the epic has no story with this ID.
+        """
+        return self.lookup(self.stories, "story_id", story_id)
+
+    def save_to_yaml(self, file_path: str):
+        """Saves the epic to a YAML file.
+
+        Args:
+            file_path: The path to the YAML file to save the epic.
+        """
+
+        # build a dict with hierarchy of epic, stories and tasks
+        epic_dict = {
+            "epic": {
+                "epic_id": self.epic_id,
+                "name": self.name,
+                "description": self.description,
+                "stories": [],
+            }
+        }
+        for story in self.stories:
+            story_dict = story.to_dict()
+            story_dict["tasks"] = []
+            for task in story.tasks:
+                story_dict["tasks"].append(task.to_dict())
+            epic_dict["epic"]["stories"].append(story_dict)
+
+        with open(file_path, "w", encoding="utf-8") as file:
+            yaml.safe_dump(
+                epic_dict,
+                file,
+                sort_keys=False,
+                allow_unicode=True,
+                default_flow_style=False,
+                default_style=None,
+            )
+
+
+class Story(Parent):
+    """A user story.
+
+    Attributes:
+        story_id: A unique identifier for the story.
+        name: The name of the story.
+        description: A detailed description of the story.
+    """
+
+    __slots__ = ("story_id", "name", "description", "tasks")
+
+    def __init__(self, story_id: int, name: str, description: str, tasks=None):
+        self.story_id = story_id
+        self.name = name
+        self.description = description
+        self.tasks = tasks if tasks is not None else []
+        super().__init__()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Story":
+        """Creates a story and its tasks from a dictionary.
+
+        Args:
+            data: A dictionary representation of the story.
+
+        Returns:
+            A Story object.
+        """
+        return cls(
+            int(data["story_id"]),
+            data["name"],
+            data["description"],
+            [Task.from_dict(task) for task in data.get("tasks") or []],
+        )
+
+    def to_dict(self, children: bool = False) -> dict:
+        """Converts the story to a dictionary.
+
+        Args:
+            children: Whether to include the tasks.
+
+        Returns:
+            A dictionary representation of the story.
+        """
+        data = {
+            "story_id": self.story_id,
+            "name": self.name,
+            "description": self.description,
+        }
+        if children:
+            data["tasks"] = [task.to_dict() for task in self.tasks]
+        return data
+
+    def get_task(self, task_id: int) -> Optional["Task"]:
+        """Looks up a task of the story by its ID.
+
+        Args:
+            task_id: The ID of the task.
+
+        Returns:
+            The task, or None if the story has no task with this ID.
+        """
+        return self.lookup(self.tasks, "task_id", task_id)
+
+    def save_to_yaml(self, file_path: str):
+        """Saves the story to a YAML file.
+
+        Args:
+            file_path: The path to the YAML file to save the story.
+        """
+        tasks_dicts = [task.to_dict() for task in self.tasks]
+        story_dict = {
+            "story": {"description": self.description, "tasks": tasks_dicts}
+        }
+
+        with open(file_path, "a", encoding="utf-8") as file:
+            yaml.safe_dump(
+                story_dict,
+                file,
+                sort_keys=False,
+                allow_unicode=True,
+                default_flow_style=False,
+            )
+
+
+class Task:
+    """A user task."""
+
+    __slots__ = ("task_id", "name", "description", "solution")
+
+    def __init__(
+        self, task_id: int, name: str, description: str, solution=None
+    ):
+        self.task_id = task_id
+        self.name = name
+        self.description = description
+        self.solution = solution
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        """Creates a task from a dictionary.
+
+        Args:
+            data: A dictionary representation of the task.
+
+        Returns:
+            A Task object.
+        """
+        return cls(int(data["task_id"]), data["name"], data["description"])
+
+    def to_dict(self) -> dict:
+        """Converts the task to a dictionary.
+
+        Returns:
+            A dictionary representation of the task.
+        """
+        return {
+            "task_id": self.task_id,
+            "name": self.name,
+            "description": self.description,
+        }
@@ -0,0 +1,182 @@
+"""Parsing of the lists returned by the language model.
+
+The prompts ask for "#. Item" lines, but models also answer with "1)",
+"- " or "* " items, markdown emphasis around the numbers, or a preamble.
+``ListStream`` accepts all of these line by line while the response is
+streamed, and ``parse_list`` applies the same rules to a whole response.
+Lines indented deeper than the first item, and bullets following a
+numbered item, are details of an item rather than items. In structured
+mode the model returns a JSON array instead, read by ``parse_json_items``.
+"""
+import json
+import re
+from typing import Callable, List, Optional, Tuple
+
+# "1. Item", "1) Item", "**1.** Item", "- Item", "* Item" or "• Item".
+ITEM_LINE = re.compile(
+    r"^([ \t]*)[ \t#*_]*(?:(\d+)[ \t]*[.)][*_]*[ \t]*|[-*•][ \t]+)(.*)$"
+)
+PUNCTUATION = re.compile(r"[^\w\s_]+")
+JSON_ARRAY = re.compile(r"\[.*\]", re.DOTALL)
+
+JSON_FORMAT = """The result must be a JSON array with one object per {label},
+            in the format:
+
+            [
+              {{"id": 1, "name": "First name", "description": "First {label}"}},
+              {{"id": 2, "name": "Second name", "description": "Second {label}"}}
+            ]
+
+            "id" numbers the entries starting from 1. "name" names the entry
+            in only one or maximum three words, without any punctuation and
+            apostrophies. If your list is empty, return []. Do not include
+            any other output."""
+
+
+def clean(text: str) -> str:
+    """Removes punctuation and surrounding whitespace from an item."""
+    return PUNCTUATION.sub("", text).strip()
+
+
+def parse_list(response: str) -> List[Tuple[int, str]]:
+    """Parses a numbered or bulleted list returned by the model.
+
+    Bullets without a number continue the numbering of the previous item.
+
+    Args:
+        response: The raw response.
+
+    Returns:
+        A list of (item_id, description) tuples in response order.
+    """
+    stream = ListStream(lambda item_id, description: None)
+    stream.feed(response or "")
+    stream.close()
+    return stream.items
+
+
+class ListStream:
+    """Parses a streamed list response as each of its lines completes.
+
+    Bullets without a number continue the numbering of the previous item.
+    Lines indented deeper than the first item are nested under an item, and
+    so are bullets once an item was numbered; neither is an item.
+    ``parse_list`` runs a whole response through a stream, so both find the
+    same items. When the request is sent again after a failure, ``restart``
+    drops the partial line and the items of the new response are only
+    reported from the first one numbered after the last item already
+    reported.
+
+    Attributes:
+        on_item: Called with the item_id and description of every item.
+        items: The (item_id, description) tuples reported so far.
+    """
+
+    def __init__(self, on_item: Callable[[int, str], None]):
+        self.on_item = on_item
+        self.items: List[Tuple[int, str]] = []
+        self.restart()
+
+    def feed(self, text: str) -> None:
+        """Adds a chunk of the response, reporting the completed lines."""
+        self._buffer += text
+        if "\n" in self._buffer:
+            *lines, self._buffer = self._buffer.split("\n")
+            for line in lines:
+                self._parse_line(line)
+
+    def close(self) -> None:
+        """Reports the last line once the response is complete."""
+        if self._buffer:
+            self._parse_line(self._buffer)
+            self._buffer = ""
+
+    def restart(self) -> None:
+        """Prepares for the response of a new attempt."""
+        self._buffer = ""
+        self._last_id = 0
+        self._indent = None
+        self._numbered = False
+        self._reported = self.items[-1][0] if self.items else 0
+
+    def _parse_line(self, line: str) -> None:
+        match = ITEM_LINE.match(line)
+        if match is None:
+            return
+        indent, number, text = match.groups()
+        indent = len(indent.expandtabs(4))
+        if self._indent is not None and indent > self._indent:
+            return
+        if number is None and self._numbered:
+            return
+        description = clean(text)
+        if not description:
+            return
+        if self._indent is None:
+            self._indent = indent
+        self._numbered = self._numbered or number is not None
+        item_id = int(number) if number else self._last_id + 1
+        self._last_id = item_id
+        if item_id <= self._reported:
+            return
+        self.items.append((item_id, description))
+        self.on_item(item_id, description)
+
+
+def parse_json_items(
+    response: str,
+) -> Optional[List[Tuple[int, str, Optional[str]]]]:
+    """Parses a JSON array of {id, name, description} objects.
+
+    Text around the array, such as a markdown code fence, is ignored.
+    Entries without a description are skipped and a missing id continues
+    the numbering of the previous entry.
+
+    Args:
+        response: The raw response.
+
+    Returns:
+        A list of (item_id, description, name) tuples, where name is None if
+        the entry has none, or None if the response holds no JSON array.
+    """
+    match = JSON_ARRAY.search(response or "")
+    if match is None:
+        return None
+    try:
+        entries = json.loads(match.group())
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(entries, list):
+        return None
+
+    items = []
+    last_id = 0
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        description = clean(str(entry.get("description") or ""))
+        if not description:
+            continue
+        try:
+            item_id = int(entry["id"])
+        except (KeyError, TypeError, ValueError):
+            item_id = last_id + 1
+        name = clean(str(entry.get("name") or "")) or None
+        items.append((item_id, description, name))
+        last_id = item_id
+    return items
+
+
+def json_prompt(prompt: str, label: str) -> str:
+    """Turns a list prompt into one asking for a JSON array.
+
+    Args:
+        prompt: A list prompt whose format section starts with "The result
+            must be".
+        label: What the entries are, e.g. "epic" or "user story".
+
+    Returns:
+        The prompt with its format section replaced.
+    """
+    context = prompt.split("The result must be", 1)[0]
+    return context + JSON_FORMAT.format(label=label)
@@ -0,0 +1,518 @@
+"""Language model backends used by the agents.
+
+The agents build prompts and parse responses; a provider only turns a list
+of chat messages into completions. Provider-specific failures are reported
+as ``ProviderError`` so the agent can apply one retry policy to all of them.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+from classes.context import count_tokens
+from classes.errors import ProviderError
+from classes.parsing import parse_list
+
+
+def _import_openai():
+    """Imports the OpenAI client, which is slow to load, on first use."""
+    import openai  # pylint: disable=import-outside-toplevel
+
+    return openai
+
+
+class Completion:
+    """The result of one completion request.
+
+    Attributes:
+        choices: The generated texts, one per requested candidate.
+        prompt_tokens: The number of tokens in the prompt.
+        completion_tokens: The number of generated tokens.
+    """
+
+    def __init__(
+        self,
+        choices: List[str],
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ):
+        self.choices = choices
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class LLMProvider:
+    """Base class of the language model backends."""
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the backend in response cache keys.
+
+        Backends answer the same request differently, and some ignore the
+        model name the agent passes, so the backend is part of the key.
+        """
+        return type(self).__name__
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        n: int = 1,
+    ) -> Completion:
+        """Completes a chat conversation.
+
+        Args:
+            messages: The chat messages sent to the model.
+            model: The name of the model requested by the agent.
+            temperature: The randomness of the model's output.
+            max_tokens: The maximum number of tokens in the output.
+            n: The number of candidates to generate.
+
+        Returns:
+            The completion.
+
+        Raises:
+            ProviderError: The backend failed to complete the request.
+        """
+        raise NotImplementedError
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        n: int = 1,
+    ) -> Completion:
+        """Completes a chat conversation without blocking the event loop.
+
+        Backends without a native async client run ``complete`` in a worker
+        thread.
+        """
+        return await asyncio.to_thread(
+            self.complete, messages, model, temperature, max_tokens, n
+        )
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_text: Callable[[str], None],
+    ) -> Completion:
+        """Completes a chat conversation, reporting the text as it comes.
+
+        Backends without streaming report the whole text at once.
+
+        Args:
+            messages: The chat messages sent to the model.
+            model: The name of the model requested by the agent.
+            temperature: The randomness of the model's output.
+            max_tokens: The maximum number of tokens in the output.
+            on_text: Called in the event loop with each chunk of text, in
+                order.
+
+        Returns:
+            The completion, with a single choice.
+
+        Raises:
+            ProviderError: The backend failed to complete the request.
+        """
+        completion = await self.acomplete(
+            messages, model, temperature, max_tokens
+        )
+        on_text(completion.choices[0])
+        return completion
+
+
+class OpenAIProvider(LLMProvider):
+    """Backend calling the OpenAI chat completion API."""
+
+    # Names of ``openai.error`` classes, resolved when an error is raised
+    # so that importing this module does not import the client.
+    ERROR_MESSAGES = [
+        ("Timeout", "OpenAI API request timed out"),
+        ("APIError", "OpenAI API returned an API Error"),
+        ("APIConnectionError", "OpenAI API request failed to connect"),
+        ("InvalidRequestError", "OpenAI API request was invalid"),
+        ("AuthenticationError", "OpenAI API request was not authorized"),
+        ("PermissionError", "OpenAI API request was not permitted"),
+        ("RateLimitError", "OpenAI API request exceeded rate limit"),
+        ("OpenAIError", "OpenAI API request failed"),
+    ]
+    FATAL_ERRORS = (
+        "InvalidRequestError",
+        "AuthenticationError",
+        "PermissionError",
+    )
+
+    def __init__(self, api_key: str):
+        self.openai = _import_openai()
+        self.openai.api_key = api_key
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        n: int = 1,
+    ) -> Completion:
+        try:
+            response = self.openai.ChatCompletion.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                n=n,
+                stop=None,
+            )
+        except self.openai.error.OpenAIError as e:
+            raise self.translate_error(e) from e
+        return self.to_completion(response)
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        n: int = 1,
+    ) -> Completion:
+        try:
+            response = await self.openai.ChatCompletion.acreate(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                n=n,
+                stop=None,
+            )
+        except self.openai.error.OpenAIError as e:
+            raise self.translate_error(e) from e
+        return self.to_completion(response)
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_text: Callable[[str], None],
+    ) -> Completion:
+        # Streamed responses carry no usage: the prompt is measured with the
+        # model's tokenizer and every chunk holds one token.
+        chunks = []
+        try:
+            response = await self.openai.ChatCompletion.acreate(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=None,
+                stream=True,
+            )
+            async for chunk in response:
+                text = chunk.choices[0].delta.get("content")
+                if text:
+                    chunks.append(text)
+                    on_text(text)
+        except self.openai.error.OpenAIError as e:
+            raise self.translate_error(e) from e
+        prompt = "\n".join(message["content"] for message in messages)
+        return Completion(
+            ["".join(chunks)], count_tokens(model, prompt), len(chunks)
+        )
+
+    @staticmethod
+    def to_completion(response) -> Completion:
+        """Converts an OpenAI response object into a Completion."""
+        usage = getattr(response, "usage", None)
+        return Completion(
+            [choice.message.content for choice in response.choices],
+            getattr(usage, "prompt_tokens", 0),
+            getattr(usage, "completion_tokens", 0),
+        )
+
+    @classmethod
+    def translate_error(cls, error: Exception) -> ProviderError:
+        """Converts an OpenAI exception into a ProviderError.
+
+        Args:
+            error: The exception raised by the OpenAI client.
+
+        Returns:
+            A ProviderError carrying a readable message, whether the request
+            may be retried, and the server's Retry-After delay if any.
+        """
+        errors = _import_openai().error
+        fatal = tuple(getattr(errors, name) for name in cls.FATAL_ERRORS)
+        for name, message in cls.ERROR_MESSAGES:
+            if isinstance(error, getattr(errors, name)):
+                break
+        headers = getattr(error, "headers", None) or {}
+        retry_after = headers.get("retry-after") or headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+
+        return ProviderError(
+            f"{message}: {error}",
+            retryable=not isinstance(error, fatal),
+            retry_after=retry_after,
+            rate_limited=isinstance(error, errors.RateLimitError),
+        )
+
+
+class LlamaCppProvider(LLMProvider):
+    """Backend running a local GGUF model with llama-cpp-python.
+
+    Loaded models are shared between providers using the same file, so the
+    weights are read once per process. llama.cpp is not thread-safe, so
+    requests to one model are serialized.
+
+    Attributes:
+        model_path: The path to the GGUF model file.
+        n_ctx: The context window of the model.
+        n_batch: The number of prompt tokens evaluated per batch.
+        n_threads: The number of CPU threads, or None for the default.
+    """
+
+    _models: Dict[tuple, object] = {}
+    _locks: Dict[tuple, threading.Lock] = {}
+    _models_lock = threading.Lock()
+
+    def __init__(
+        self,
+        model_path: str,
+        n_ctx: int = 4096,
+        n_batch: int = 512,
+        n_threads: Optional[int] = None,
+    ):
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.n_batch = n_batch
+        self.n_threads = n_threads
+
+    @property
+    def _key(self) -> tuple:
+        return (self.model_path, self.n_ctx, self.n_batch, self.n_threads)
+
+    @property
+    def cache_id(self) -> str:
+        return f"{type(self).__name__}:{os.path.abspath(self.model_path)}"
+
+    @property
+    def llm(self):
+        """The loaded llama.cpp model, loaded on first use."""
+        with self._models_lock:
+            if self._key not in self._models:
+                # pylint: disable-next=import-outside-toplevel
+                from llama_cpp import Llama
+
+                self._models[self._key] = Llama(
+                    model_path=self.model_path,
+                    n_ctx=self.n_ctx,
+                    n_batch=self.n_batch,
+                    n_threads=self.n_threads,
+                    verbose=False,
+                )
+                self._locks[self._key] = threading.Lock()
+            return self._models[self._key]
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        n: int = 1,
+    ) -> Completion:
+        llm = self.llm
+        choices = []
+        prompt_tokens = completion_tokens = 0
+        with self._locks[self._key]:
+            for _ in range(n):
+                try:
+                    response = llm.create_chat_completion(
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                    )
+                except ValueError as e:
+                    raise ProviderError(
+                        f"llama.cpp request was invalid: {e}", retryable=False
+                    ) from e
+                choices.append(response["choices"][0]["message"]["content"])
+                usage = response.get("usage", {})
+                prompt_tokens = usage.get("prompt_tokens", 0)
+                completion_tokens += usage.get("completion_tokens", 0)
+        return Completion(choices, prompt_tokens, completion_tokens)
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_text: Callable[[str], None],
+    ) -> Completion:
+        loop = asyncio.get_running_loop()
+        return await asyncio.to_thread(
+            self.stream,
+            messages,
+            temperature,
+            max_tokens,
+            lambda text: loop.call_soon_threadsafe(on_text, text),
+        )
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        on_token: Callable[[str], None],
+    ) -> Completion:
+        """Completes a chat conversation one token at a time.
+
+        Args:
+            messages: The chat messages sent to the model.
+            temperature: The randomness of the model's output.
+            max_tokens: The maximum number of tokens in the output.
+            on_token: Called from the calling thread with the text of each
+                generated token.
+
+        Returns:
+            The completion; streamed chunks carry no prompt token count.
+        """
+        llm = self.llm
+        chunks = []
+        with self._locks[self._key]:
+            try:
+                for chunk in llm.create_chat_completion(
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                ):
+                    text = chunk["choices"][0]["delta"].get("content")
+                    if text:
+                        chunks.append(text)
+                        on_token(text)
+            except ValueError as e:
+                raise ProviderError(
+                    f"llama.cpp request was invalid: {e}", retryable=False
+                ) from e
+        return Completion(["".join(chunks)], 0, len(chunks))
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic offline backend for tests and benchmarks.
+
+    List prompts are answered with ``items`` numbered entries, or a JSON
+    array of them when the prompt asks for one, and naming prompts with
+    names derived from the descriptions, so the same prompt always gives
+    the same answer.
+
+    Attributes:
+        items: The number of entries in every generated list.
+        respond: An optional callable overriding the default answers.
+        calls: The number of requests served.
+    """
+
+    NUMBERED_LINE = re.compile(r"^\s*(\d+)\.\s+(.+)$", re.MULTILINE)
+
+    def __init__(
+        self,
+        items: int = 3,
+        respond: Optional[Callable[[str], str]] = None,
+    ):
+        self.items = items
+        self.respond = respond or self.default_response
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def default_response(self, prompt: str) -> str:
+        """Builds the deterministic answer to a prompt."""
+        if "short names" in prompt:
+            return "\n".join(
+                f"{number}. {self.name_for(description)}"
+                for number, description in self.NUMBERED_LINE.findall(prompt)
+            )
+        if "short name" in prompt:
+            description = prompt.split("description:", 1)[-1]
+            return self.name_for(description)
+        level = "task"
+        if "create epics" in prompt:
+            level = "epic"
+        elif "create user stories" in prompt:
+            level = "story"
+        return "\n".join(
+            f"{number}. Generated {level} {number} for request "
+            f"{len(prompt) % 997}"
+            for number in range(1, self.items + 1)
+        )
+
+    @staticmethod
+    def name_for(description: str) -> str:
+        """Derives a short name from the first words of a description."""
+        words = re.findall(r"[A-Za-z0-9]+", description)
+        return " ".join(word.capitalize() for word in words[:3]) or "Unnamed"
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        n: int = 1,
+    ) -> Completion:
+        with self._lock:
+            self.calls += 1
+        prompt = messages[-1]["content"]
+        text = self.respond(prompt)
+        if "JSON array" in prompt and not text.lstrip().startswith("["):
+            text = json.dumps(
+                [
+                    {
+                        "id": item_id,
+                        "name": self.name_for(description),
+                        "description": description,
+                    }
+                    for item_id, description in parse_list(text)
+                ]
+            )
+        return Completion(
+            [text] * n, len(prompt.split()), len(text.split()) * n
+        )
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        n: int = 1,
+    ) -> Completion:
+        return self.complete(messages, model, temperature, max_tokens, n)
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_text: Callable[[str], None],
+    ) -> Completion:
+        completion = await self.acomplete(
+            messages, model, temperature, max_tokens
+        )
+        for line in completion.choices[0].splitlines(keepends=True):
+            on_text(line)
+        return completion
@@ -0,0 +1,218 @@
+"""Local ranking of the candidate responses to a list prompt.
+
+When several completions are requested for one list prompt, each is scored
+without further API calls on three criteria, each between 0 and 1:
+
+* count: whether the number of items falls in the target range, decreasing
+  with the distance to it;
+* parse: the share of the response's lines that parsed into items, or 1
+  for a valid JSON array in structured mode;
+* unique: one minus the share of items nearly duplicating an earlier item
+  of the same list or an existing sibling.
+
+The candidate with the highest sum wins; ties go to the earliest.
+"""
+import json
+import os
+import re
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from classes.parsing import parse_json_items
+
+WORD = re.compile(r"\w+")
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(WORD.findall(text.lower()))
+
+
+def similarity(first: frozenset, second: frozenset) -> float:
+    """The Jaccard similarity of two word sets."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class CandidateScore:
+    """The ranking criteria of one candidate.
+
+    Attributes:
+        items: The number of parsed items.
+        count: The item count score.
+        parse: The parse success score.
+        unique: The duplicate score.
+    """
+
+    __slots__ = ("items", "count", "parse", "unique")
+
+    def __init__(self, items: int, count: float, parse: float, unique: float):
+        self.items = items
+        self.count = count
+        self.parse = parse
+        self.unique = unique
+
+    @property
+    def total(self) -> float:
+        """The sum of the criteria."""
+        return self.count + self.parse + self.unique
+
+    def to_dict(self) -> dict:
+        """Serializes the score."""
+        return {
+            "items": self.items,
+            "count": round(self.count, 3),
+            "parse": round(self.parse, 3),
+            "unique": round(self.unique, 3),
+            "total": round(self.total, 3),
+        }
+
+
+class CandidateRanker:
+    """Picks the best of several responses to a list prompt.
+
+    Attributes:
+        min_items: The smallest item count in the target range.
+        max_items: The largest item count in the target range.
+        duplicate_threshold: The word overlap from which two items are
+            near-duplicates.
+        log_path: An optional JSON lines file receiving every ranking with
+            the discarded candidates.
+        discarded: (level, score, response) tuples of every candidate that
+            lost a ranking.
+    """
+
+    def __init__(
+        self,
+        min_items: int = 3,
+        max_items: int = 10,
+        duplicate_threshold: float = 0.8,
+        log_path: Optional[str] = None,
+    ):
+        self.min_items = min_items
+        self.max_items = max_items
+        self.duplicate_threshold = duplicate_threshold
+        self.log_path = log_path
+        if log_path:
+            directory = os.path.dirname(log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.discarded: List[Tuple[str, CandidateScore, str]] = []
+
+    def count_score(self, count: int) -> float:
+        """Scores an item count against the target range."""
+        if self.min_items <= count <= self.max_items:
+            return 1.0
+        if count < self.min_items:
+            return count / self.min_items
+        return self.max_items / count
+
+    @staticmethod
+    def parse_score(
+        response: str, items: int, structured: bool = False
+    ) -> float:
+        """Scores the share of a response that parsed into items."""
+        if structured and parse_json_items(response) is not None:
+            return 1.0
+        lines = sum(1 for line in response.splitlines() if line.strip())
+        return min(1.0, items / lines) if lines else 0.0
+
+    def unique_score(
+        self, descriptions: List[str], siblings: Sequence[str] = ()
+    ) -> float:
+        """Scores how few items duplicate earlier ones or the siblings."""
+        if not descriptions:
+            return 0.0
+        seen = [_words(sibling) for sibling in siblings]
+        duplicates = 0
+        for description in descriptions:
+            words = _words(description)
+            if any(
+                similarity(words, other) >= self.duplicate_threshold
+                for other in seen
+            ):
+                duplicates += 1
+            seen.append(words)
+        return 1.0 - duplicates / len(descriptions)
+
+    def score(
+        self,
+        response: str,
+        items: List[Tuple[int, str]],
+        siblings: Sequence[str] = (),
+        structured: bool = False,
+    ) -> CandidateScore:
+        """Scores one candidate.
+
+        Args:
+            response: The raw response.
+            items: The (item_id, description) tuples parsed from it.
+            siblings: Descriptions of existing nodes the items should not
+                repeat.
+            structured: Whether a JSON array was requested.
+
+        Returns:
+            The candidate's score.
+        """
+        return CandidateScore(
+            len(items),
+            self.count_score(len(items)),
+            self.parse_score(response, len(items), structured),
+            self.unique_score([desc for _, desc in items], siblings),
+        )
+
+    def best(
+        self,
+        level: str,
+        responses: List[str],
+        parse: Callable[[str], List[Tuple[int, str]]],
+        siblings: Sequence[str] = (),
+        structured: bool = False,
+    ) -> int:
+        """Ranks the candidates and logs the discarded ones.
+
+        Args:
+            level: The level of the list, for the log.
+            responses: The candidate responses.
+            parse: Parses a response into (item_id, description) tuples.
+            siblings: Descriptions of existing nodes the items should not
+                repeat.
+            structured: Whether a JSON array was requested.
+
+        Returns:
+            The index of the best candidate.
+        """
+        scores = [
+            self.score(response, parse(response), siblings, structured)
+            for response in responses
+        ]
+        index = max(range(len(scores)), key=lambda i: (scores[i].total, -i))
+        for other, (score, response) in enumerate(zip(scores, responses)):
+            if other != index:
+                self.discarded.append((level, score, response))
+                print(
+                    f"Discarded {level} candidate {other + 1}: "
+                    f"{score.items} items, score {score.total:.2f} "
+                    f"< {scores[index].total:.2f}"
+                )
+        if self.log_path:
+            self.log(level, responses, scores, index)
+        return index
+
+    def log(
+        self,
+        level: str,
+        responses: List[str],
+        scores: List[CandidateScore],
+        index: int,
+    ) -> None:
+        """Appends a ranking to the log file."""
+        entry = {
+            "level": level,
+            "chosen": index,
+            "candidates": [
+                {"score": score.to_dict(), "response": response}
+                for score, response in zip(scores, responses)
+            ],
+        }
+        with open(self.log_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
@@ -0,0 +1,218 @@
+"""Client-side rate limiting for API calls.
+
+Requests and tokens are budgeted with token buckets refilled every minute.
+A bucket hands out reservations that may drive its balance negative; the
+caller then waits until the debt is repaid, which keeps concurrent callers
+in first-come order without polling. Buckets created with ``shared=True``
+keep their state in shared memory, so one budget holds for all the processes
+of a pool.
+"""
+import asyncio
+import multiprocessing
+import random
+import threading
+import time
+from typing import Optional
+
+from classes.context import encoding_for
+
+
+class TokenBucket:
+    """A thread-safe token bucket.
+
+    Attributes:
+        capacity: The maximum number of units the bucket holds.
+        rate: The number of units added per second.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._balance = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Takes units from the bucket.
+
+        Args:
+            amount: The number of units needed.
+
+        Returns:
+            The number of seconds to wait before using them.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._balance = min(
+                self.capacity, self._balance + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._balance -= min(amount, self.capacity)
+            if self._balance >= 0:
+                return 0.0
+            return -self._balance / self.rate
+
+
+class SharedTokenBucket(TokenBucket):
+    """A token bucket shared by a parent process and its workers.
+
+    The balance lives in shared memory guarded by a process lock. Time is
+    measured with ``time.time`` because monotonic clocks are not comparable
+    between processes on every platform.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        # pylint: disable=super-init-not-called
+        self.capacity = capacity
+        self.rate = rate
+        self._state = multiprocessing.Array("d", [capacity, time.time()])
+
+    def reserve(self, amount: float) -> float:
+        with self._state.get_lock():
+            now = time.time()
+            balance, updated = self._state[0], self._state[1]
+            balance = min(
+                self.capacity, balance + max(0.0, now - updated) * self.rate
+            )
+            balance -= min(amount, self.capacity)
+            self._state[0] = balance
+            self._state[1] = now
+        if balance >= 0:
+            return 0.0
+        return -balance / self.rate
+
+
+class RateLimiter:
+    """Budgets requests per minute and tokens per minute.
+
+    Attributes:
+        model: The model whose tokenizer measures prompts.
+        requests: The bucket of requests, or None for no limit.
+        tokens: The bucket of tokens, or None for no limit.
+        shared: Whether the budget is shared with worker processes. A shared
+            limiter must be handed to the workers when they are started,
+            e.g. through the initializer of a process pool.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        model: str = "gpt-3.5-turbo",
+        shared: bool = False,
+    ):
+        self.model = model
+        self.shared = shared
+        bucket = SharedTokenBucket if shared else TokenBucket
+        self.requests = (
+            bucket(requests_per_minute, requests_per_minute / 60)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            bucket(tokens_per_minute, tokens_per_minute / 60)
+            if tokens_per_minute
+            else None
+        )
+        self._clock = time.time if shared else time.monotonic
+        self._paused_until = (
+            multiprocessing.Value("d", 0.0) if shared else 0.0
+        )
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def count_tokens(self, text: str) -> int:
+        """Counts the tokens of a text with the model's tokenizer.
+
+        Args:
+            text: The text to measure.
+
+        Returns:
+            The number of tokens.
+        """
+        return len(encoding_for(self.model).encode(text))
+
+    def reserve(self, prompt: str, max_tokens: int) -> float:
+        """Reserves capacity for one request.
+
+        The token cost is the prompt length plus ``max_tokens``, which is how
+        the API itself accounts for a request against the limit.
+
+        Args:
+            prompt: The prompt to send.
+            max_tokens: The maximum number of tokens in the output.
+
+        Returns:
+            The number of seconds to wait before sending the request.
+        """
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            cost = self.count_tokens(prompt) + max_tokens
+            delay = max(delay, self.tokens.reserve(cost))
+        with self._lock:
+            paused = self._paused() - self._clock()
+        return max(delay, paused)
+
+    def _paused(self) -> float:
+        if self.shared:
+            return self._paused_until.value
+        return self._paused_until
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every caller, e.g. after the server returned a 429.
+
+        Args:
+            seconds: How long to hold back new requests.
+        """
+        until = self._clock() + seconds
+        if self.shared:
+            with self._paused_until.get_lock():
+                self._paused_until.value = max(self._paused_until.value, until)
+            return
+        with self._lock:
+            self._paused_until = max(self._paused(), until)
+
+    def acquire(self, prompt: str, max_tokens: int) -> None:
+        """Blocks until a request may be sent."""
+        delay = self.reserve(prompt, max_tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, prompt: str, max_tokens: int) -> None:
+        """Waits asynchronously until a request may be sent."""
+        delay = self.reserve(prompt, max_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = 1.0,
+    cap: float = 60.0,
+    retry_after: Optional[float] = None,
+) -> float:
+    """Computes how long to wait before retrying a failed request.
+
+    Args:
+        attempt: The number of the failed attempt, starting at 0.
+        base: The delay of the first retry in seconds.
+        cap: The maximum delay in seconds.
+        retry_after: The delay requested by the server, if any.
+
+    Returns:
+        The delay in seconds: the server's Retry-After when given, otherwise
+        an exponential backoff with full jitter.
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(cap, base * 2**attempt))
@@ -0,0 +1,163 @@
+"""Priority scheduling of the language model requests of an agent.
+
+A list request unblocks the generation of its items' children while a name
+only completes a node, yet both wait for the same concurrency slots and
+rate limit budget. The scheduler grants the slots to the pending requests
+that unblock the most work first: the project summary and the epic list,
+then story lists, task lists and finally names. Requests of the same rank
+are granted in turn to each epic with pending requests, so one large epic
+does not hold back the others, and each level may be given its own limit
+of requests in flight.
+"""
+import asyncio
+import contextlib
+import contextvars
+import itertools
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+# The epic whose subtree the current task generates, None above epics. It
+# is set by the task building an epic and inherited by the tasks it starts.
+CURRENT_GROUP: contextvars.ContextVar = contextvars.ContextVar(
+    "scheduler_group", default=None
+)
+
+# Lower ranks are granted first.
+RANKS = {
+    ("project", "summary"): 0,
+    ("epic", "list"): 0,
+    ("story", "list"): 1,
+    ("task", "list"): 2,
+    ("epic", "name"): 3,
+    ("story", "name"): 4,
+    ("task", "name"): 5,
+}
+DEFAULT_RANK = 6
+
+# Requests in flight when OPENAI_CONCURRENCY is not configured.
+DEFAULT_CONCURRENCY = 8
+
+QueueKey = Tuple[int, str]
+
+
+class Scheduler:
+    """Grants request slots by rank, in turn to each epic.
+
+    Attributes:
+        concurrency: The maximum number of requests in flight.
+        level_limits: The maximum number of requests in flight per level,
+            e.g. {"task": 4}; levels not listed are only bound by
+            ``concurrency``.
+        priority: Whether requests are ordered by rank and epic; otherwise
+            they are granted in arrival order, within the limits.
+        running: The number of requests in flight per level.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        level_limits: Optional[Dict[str, int]] = None,
+        priority: bool = True,
+    ):
+        self.concurrency = concurrency
+        self.level_limits = dict(level_limits or {})
+        self.priority = priority
+        self.running: Dict[str, int] = {}
+        self._in_flight = 0
+        self._arrivals = itertools.count()
+        # (arrival, future) waiters by (rank, level), then by epic in turn
+        # order.
+        self._queues: Dict[QueueKey, "OrderedDict[object, Deque]"] = {}
+
+    def rank(self, level: str, kind: str) -> int:
+        """Ranks a request; lower ranks unblock more work."""
+        if not self.priority:
+            return 0
+        return RANKS.get((level, kind), DEFAULT_RANK)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, level: str = "", kind: str = "") -> AsyncIterator:
+        """Waits for the turn of a request and holds its slot meanwhile.
+
+        Args:
+            level: The hierarchy level of the request.
+            kind: "list", "name" or "summary".
+        """
+        group = CURRENT_GROUP.get() if self.priority else None
+        key = (self.rank(level, kind), level)
+        waiter = asyncio.get_running_loop().create_future()
+        groups = self._queues.setdefault(key, OrderedDict())
+        groups.setdefault(group, deque()).append(
+            (next(self._arrivals), waiter)
+        )
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been granted just before the cancellation.
+            if waiter.done() and not waiter.cancelled():
+                self._release(level)
+            raise
+        try:
+            yield
+        finally:
+            self._release(level)
+
+    def _release(self, level: str) -> None:
+        self._in_flight -= 1
+        self.running[level] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.concurrency:
+            granted = self._next()
+            if granted is None:
+                return
+            level, waiter = granted
+            self._in_flight += 1
+            self.running[level] = self.running.get(level, 0) + 1
+            waiter.set_result(None)
+
+    def _next(self) -> Optional[Tuple[str, asyncio.Future]]:
+        # Among the queues whose level is under its limit, the lowest rank
+        # wins, then the earliest arrival at the head of the queue.
+        best = None
+        for key in list(self._queues):
+            limit = self.level_limits.get(key[1])
+            if limit is not None and self.running.get(key[1], 0) >= limit:
+                continue
+            arrival = self._head(key)
+            if arrival is not None and (
+                best is None or (key[0], arrival) < best[0]
+            ):
+                best = ((key[0], arrival), key)
+        if best is None:
+            return None
+
+        key = best[1]
+        groups = self._queues[key]
+        group, waiters = next(iter(groups.items()))
+        _, waiter = waiters.popleft()
+        if waiters:
+            groups.move_to_end(group)
+        else:
+            del groups[group]
+        if not groups:
+            del self._queues[key]
+        return key[1], waiter
+
+    def _head(self, key: QueueKey) -> Optional[int]:
+        """Returns the arrival of the next waiter of a queue.
+
+        Waiters cancelled while queued are dropped on the way.
+        """
+        groups = self._queues[key]
+        while groups:
+            group, waiters = next(iter(groups.items()))
+            if not waiters[0][1].done():
+                return waiters[0][0]
+            waiters.popleft()
+            if not waiters:
+                del groups[group]
+        del self._queues[key]
+        return None
@@ -0,0 +1,121 @@
+"""Multi-turn chat sessions of the conversational mode.
+
+A session states the shared context of an epic once, in its system
+message, and every request is a follow-up turn. The history is trimmed
+oldest first, so the system message and the pinned first exchanges, the
+epic's list of stories, form a stable prefix that providers can cache.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class ChatSession:
+    """The message history of one conversation.
+
+    Attributes:
+        system: The system message stating the shared context.
+        count_tokens: Measures the tokens of a text.
+        max_tokens: The maximum number of tokens of the kept history, or
+            None for no limit.
+        max_turns: The maximum number of exchanges kept, or None.
+        pinned: The number of leading exchanges that are never dropped.
+        exchanges: The kept (prompt, response) pairs in order.
+    """
+
+    def __init__(
+        self,
+        system: str,
+        count_tokens: Callable[[str], int],
+        max_tokens: Optional[int] = None,
+        max_turns: Optional[int] = None,
+        pinned: int = 1,
+    ):
+        self.system = system
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.pinned = pinned
+        self.exchanges: List[Tuple[str, str]] = []
+        self._system_tokens = count_tokens(system)
+        self._exchange_tokens: List[int] = []
+
+    def messages(self, prompt: str) -> List[Dict[str, str]]:
+        """Builds the messages of the next turn.
+
+        Args:
+            prompt: The user message of the turn.
+
+        Returns:
+            The system message, the kept history and the new user message.
+        """
+        messages = [{"role": "system", "content": self.system}]
+        for question, answer in self.exchanges:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    @property
+    def tokens(self) -> int:
+        """The number of tokens of the system message and kept history."""
+        return self._system_tokens + sum(self._exchange_tokens)
+
+    def record(self, prompt: str, response: str) -> None:
+        """Adds a completed turn to the history and trims it.
+
+        Args:
+            prompt: The user message of the turn.
+            response: The model's answer.
+        """
+        self.exchanges.append((prompt, response))
+        self._exchange_tokens.append(
+            self.count_tokens(prompt) + self.count_tokens(response)
+        )
+        self.trim()
+
+    def trim(self) -> None:
+        """Drops the oldest unpinned exchanges until the limits are met."""
+        while len(self.exchanges) > self.pinned and self._over_limit():
+            del self.exchanges[self.pinned]
+            del self._exchange_tokens[self.pinned]
+
+    def _over_limit(self) -> bool:
+        turns = len(self.exchanges)
+        return (self.max_turns is not None and turns > self.max_turns) or (
+            self.max_tokens is not None and self.tokens > self.max_tokens
+        )
+
+
+class SessionPolicy:
+    """How the conversational mode keeps its histories.
+
+    Attributes:
+        max_tokens: The maximum number of tokens of a kept history, or None.
+        max_turns: The maximum number of exchanges kept, or None.
+        pinned: The number of leading exchanges that are never dropped.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        max_turns: Optional[int] = None,
+        pinned: int = 1,
+    ):
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.pinned = pinned
+
+    def start(
+        self, system: str, count_tokens: Callable[[str], int]
+    ) -> ChatSession:
+        """Opens a session following this policy.
+
+        Args:
+            system: The system message stating the shared context.
+            count_tokens: Measures the tokens of a text.
+
+        Returns:
+            The new session.
+        """
+        return ChatSession(
+            system, count_tokens, self.max_tokens, self.max_turns, self.pinned
+        )
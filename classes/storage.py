@@ -0,0 +1,132 @@
+"""Loading and saving of project files.
+
+Projects are stored either as YAML, meant to be read and edited by people,
+or as JSON lines, a compact format for the intermediate files passed
+between the generator scripts. The format is chosen by the file extension.
+A JSON lines project file holds one node per line in document order::
+
+    {"level": "project", "name": ..., "description": ...}
+    {"level": "epic", "epic_id": 1, "name": ..., "description": ...}
+    {"level": "story", "story_id": 1, "name": ..., "description": ...}
+    {"level": "task", "task_id": 1, "name": ..., "description": ...}
+
+Each story belongs to the epic above it and each task to the story above it.
+Older YAML files have a single "epic" root, without an ID, instead of a
+project; it is loaded as a project of that name holding epic 1.
+"""
+import json
+import os
+from typing import Iterable, Iterator, Tuple
+
+from classes.model import Epic, Project, Story, Task
+from classes.streaming import iter_nodes
+
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def is_json_lines(file_path: str) -> bool:
+    """Tells whether a path names a JSON lines project file."""
+    return os.path.splitext(file_path)[1].lower() in JSON_LINES_EXTENSIONS
+
+
+def iter_json_lines(file_path: str) -> Iterator[Tuple[str, dict]]:
+    """Reads a JSON lines project file one node at a time.
+
+    Args:
+        file_path: The path to the JSON lines file.
+
+    Yields:
+        (level, fields) tuples in document order.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                fields = json.loads(line)
+                yield fields.pop("level"), fields
+
+
+def iter_project_nodes(file_path: str) -> Iterator[Tuple[str, dict]]:
+    """Reads a YAML or JSON lines project file one node at a time.
+
+    Args:
+        file_path: The path to the project file.
+
+    Yields:
+        (level, fields) tuples in document order, where level is "project",
+        "epic", "story" or "task".
+    """
+    if is_json_lines(file_path):
+        return iter_json_lines(file_path)
+    return iter_nodes(file_path)
+
+
+def build_project(nodes: Iterable[Tuple[str, dict]]) -> Project:
+    """Assembles a project from nodes in document order.
+
+    Args:
+        nodes: (level, fields) tuples as yielded by ``iter_project_nodes``.
+
+    Returns:
+        The project with all of its epics, stories and tasks.
+    """
+    project = Project("", "")
+    epic = story = None
+    for position, (level, fields) in enumerate(nodes):
+        if level == "project":
+            project.name = fields.get("name", "")
+            project.description = fields.get("description", "")
+        elif level == "epic":
+            if position == 0:
+                project.name = fields.get("name", "")
+                project.description = fields.get("description", "")
+                fields = {"epic_id": 1, **fields}
+            epic = Epic.from_dict(fields)
+            project.epics.append(epic)
+        elif level == "story":
+            story = Story.from_dict(fields)
+            epic.stories.append(story)
+        elif level == "task":
+            story.tasks.append(Task.from_dict(fields))
+    return project
+
+
+def load_project(file_path: str) -> Project:
+    """Loads a project from a YAML or JSON lines file.
+
+    Args:
+        file_path: The path to the project file.
+
+    Returns:
+        The loaded project.
+    """
+    return build_project(iter_project_nodes(file_path))
+
+
+def save_project(project: Project, file_path: str) -> None:
+    """Saves a project as YAML or JSON lines, depending on the extension.
+
+    Args:
+        project: The project to save.
+        file_path: The path to the project file.
+    """
+    if not is_json_lines(file_path):
+        project.save_to_yaml(file_path)
+        return
+
+    def line(level: str, fields: dict) -> str:
+        return json.dumps({"level": level, **fields}, ensure_ascii=False)
+
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(
+            line(
+                "project",
+                {"name": project.name, "description": project.description},
+            )
+            + "\n"
+        )
+        for epic in project.epics:
+            file.write(line("epic", epic.to_dict()) + "\n")
+            for story in epic.stories:
+                file.write(line("story", story.to_dict()) + "\n")
+                for task in story.tasks:
+                    file.write(line("task", task.to_dict()) + "\n")
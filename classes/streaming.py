@@ -0,0 +1,270 @@
+"""Streaming serialization of project files.
+
+``ProjectYamlWriter`` writes a project node by node, so the full nested
+dictionary never has to exist in memory. Loading the file gives the same
+data as a single ``yaml.safe_dump`` of the whole hierarchy would, although
+long strings may be wrapped differently. ``iter_nodes`` reads a project
+file with the event-based parser and yields one node at a time.
+"""
+from collections import deque
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+import yaml
+
+# The libyaml bindings are several times faster than the pure Python ones.
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+CHILDREN = {"project": "epics", "epic": "stories", "story": "tasks"}
+LEVELS = {"epics": "epic", "stories": "story", "tasks": "task"}
+INDENT = {"epic": 2, "story": 4, "task": 6}
+DUMP_OPTIONS = {
+    "Dumper": DUMPER,
+    "sort_keys": False,
+    "allow_unicode": True,
+    "default_flow_style": False,
+    "default_style": None,
+}
+
+
+class ProjectYamlWriter:
+    """Writes a project file incrementally.
+
+    Nodes must be written in document order: an epic, then its stories,
+    each story followed by its tasks. Use it as a context manager, or call
+    ``close`` once the last node is written.
+
+    Attributes:
+        file_path: The path to the YAML file.
+    """
+
+    def __init__(self, file_path: str, name: str, description: str):
+        self.file_path = file_path
+        self._file: TextIO = open(file_path, "w", encoding="utf-8")
+        self._file.write(
+            yaml.dump(
+                {"project": {"name": name, "description": description}},
+                **DUMP_OPTIONS,
+            )
+        )
+        self._file.write("  epics:")
+        # Number of children written under the open project, epic and story.
+        self._open = {"project": 0}
+
+    def __enter__(self) -> "ProjectYamlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _close_levels(self, *levels: str) -> None:
+        for level in levels:
+            if level in self._open:
+                if not self._open.pop(level):
+                    self._file.write(" []")
+
+    def _write_node(self, level: str, node) -> None:
+        indent = " " * INDENT[level]
+        text = yaml.dump(
+            [node.to_dict()], width=80 - INDENT[level], **DUMP_OPTIONS
+        )
+        self._file.write("\n")
+        self._file.write(
+            "\n".join(indent + line for line in text.rstrip("\n").split("\n"))
+        )
+        self._file.write(f"\n{indent}  {CHILDREN[level]}:")
+
+    def start_epic(self, epic) -> None:
+        """Writes an epic without its stories.
+
+        Args:
+            epic: The epic; its stories are written with ``start_story``.
+        """
+        self._close_levels("story", "epic")
+        self._open["project"] += 1
+        self._write_node("epic", epic)
+        self._open["epic"] = 0
+
+    def start_story(self, story) -> None:
+        """Writes a story of the current epic without its tasks.
+
+        Args:
+            story: The story; its tasks are written with ``write_task``.
+        """
+        self._close_levels("story")
+        self._open["epic"] += 1
+        self._write_node("story", story)
+        self._open["story"] = 0
+
+    def write_task(self, task) -> None:
+        """Writes a task of the current story.
+
+        Args:
+            task: The task.
+        """
+        self._open["story"] += 1
+        indent = " " * INDENT["task"]
+        text = yaml.dump(
+            [task.to_dict()], width=80 - INDENT["task"], **DUMP_OPTIONS
+        )
+        self._file.write("\n")
+        self._file.write(
+            "\n".join(indent + line for line in text.rstrip("\n").split("\n"))
+        )
+
+    def write_epic(self, epic) -> None:
+        """Writes an epic with all of its stories and tasks.
+
+        Args:
+            epic: The complete epic.
+        """
+        self.start_epic(epic)
+        for story in epic.stories:
+            self.start_story(story)
+            for task in story.tasks:
+                self.write_task(task)
+        self._file.flush()
+
+    def close(self) -> None:
+        """Terminates the open lists and closes the file."""
+        if self._file.closed:
+            return
+        self._close_levels("story", "epic", "project")
+        self._file.write("\n")
+        self._file.close()
+
+
+_RESOLVER = yaml.resolver.Resolver()
+_CONSTRUCTOR = yaml.constructor.SafeConstructor()
+
+
+def _construct_scalar(event: yaml.ScalarEvent):
+    tag = event.tag
+    if tag is None or tag == "!":
+        tag = _RESOLVER.resolve(yaml.ScalarNode, event.value, event.implicit)
+    node = yaml.ScalarNode(tag, event.value, style=event.style)
+    construct = _CONSTRUCTOR.yaml_constructors.get(
+        tag, yaml.constructor.SafeConstructor.construct_undefined
+    )
+    return construct(_CONSTRUCTOR, node)
+
+
+def _skip(events: Iterator[yaml.Event], event: yaml.Event) -> None:
+    depth = 0
+    while True:
+        if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+            depth += 1
+        elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            depth -= 1
+        if depth == 0:
+            return
+        event = next(events)
+
+
+def _walk(
+    events: Iterator[yaml.Event], level: str
+) -> Iterator[Tuple[str, dict]]:
+    """Yields the node whose mapping has just started, then its children.
+
+    A node is yielded as soon as its child list begins, so its fields must
+    precede the children, as they do in files written by this package.
+    """
+    fields = {}
+    emitted = False
+    for event in events:
+        if isinstance(event, yaml.MappingEndEvent):
+            break
+        key = event.value
+        event = next(events)
+        if isinstance(event, yaml.ScalarEvent):
+            fields[key] = _construct_scalar(event)
+        elif (
+            isinstance(event, yaml.SequenceStartEvent)
+            and CHILDREN.get(level) == key
+        ):
+            if not emitted:
+                emitted = True
+                yield level, fields
+            for item in events:
+                if isinstance(item, yaml.SequenceEndEvent):
+                    break
+                if isinstance(item, yaml.MappingStartEvent):
+                    yield from _walk(events, LEVELS[key])
+                else:
+                    _skip(events, item)
+        else:
+            _skip(events, event)
+    if not emitted:
+        yield level, fields
+
+
+def iter_nodes(
+    file_path: str, loader: Optional[type] = None
+) -> Iterator[Tuple[str, dict]]:
+    """Reads a project file one node at a time.
+
+    Both the "project" files written by the generators and the older files
+    with a single "epic" root are supported.
+
+    Args:
+        file_path: The path to the YAML file.
+        loader: The loader class driving the parser; defaults to the libyaml
+            based ``yaml.CSafeLoader`` when available.
+
+    Yields:
+        (level, fields) tuples in document order, where level is "project",
+        "epic", "story" or "task" and fields holds the node's scalar values.
+    """
+    if loader is None:
+        loader = LOADER
+    with open(file_path, "r", encoding="utf-8") as file:
+        events = yaml.parse(file, Loader=loader)
+        for event in events:
+            if isinstance(event, yaml.MappingStartEvent):
+                break
+        for event in events:
+            if isinstance(event, yaml.MappingEndEvent):
+                return
+            root = event.value
+            event = next(events)
+            if isinstance(event, yaml.MappingStartEvent) and root in (
+                "project",
+                "epic",
+            ):
+                yield from _walk(events, root)
+            else:
+                _skip(events, event)
+
+
+class OrderedEpicWriter:
+    """Streams epics that complete in any order in their listed order.
+
+    Epics finishing early are held back until every epic listed before them
+    has been written.
+    """
+
+    def __init__(self, writer: ProjectYamlWriter, epic_ids: List[int]):
+        self.writer = writer
+        self._pending = deque(epic_ids)
+        self._ready: Dict[int, list] = {}
+
+    def expect(self, epic_id: int) -> None:
+        """Lists one more epic, e.g. while the epic list is streamed."""
+        self._pending.append(epic_id)
+        self._flush()
+
+    def _flush(self) -> None:
+        while self._pending and self._pending[0] in self._ready:
+            epic_id = self._pending.popleft()
+            epics = self._ready[epic_id]
+            self.writer.write_epic(epics.pop(0))
+            if not epics:
+                del self._ready[epic_id]
+
+    def add(self, epic) -> None:
+        """Writes an epic, or holds it back until its turn comes.
+
+        Args:
+            epic: The complete epic.
+        """
+        self._ready.setdefault(epic.epic_id, []).append(epic)
+        self._flush()
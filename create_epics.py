@@ -4,12 +4,23 @@ This script sets up the configuration for an artificial general
 intelligence system. It imports necessary libraries and modules,
 sets up environment variables, and loads extensions.
 """
+import asyncio
 import os
 
 from dotenv import load_dotenv
 
-from classes import OpenAIAgent, Project
-from functions.functions import load_config, print_in_color
+from classes import Project
+from classes.storage import save_project
+from functions.functions import (
+    close_agent,
+    create_agent,
+    intermediate_path,
+    load_config,
+    parse_args,
+    print_in_color,
+)
+
+args = parse_args(__doc__)
 
 # load openai api key from .env file
 load_dotenv()
@@ -20,8 +31,6 @@ YAML_FILE_PATH = "config.yaml"
 config = load_config(YAML_FILE_PATH)
 
 OPENAI_MODEL = config["OPENAI_MODEL"].lower()
-OPENAI_TEMPERATURE = float(config["OPENAI_TEMPERATURE"])
-OPENAI_MAX_TOKENS = int(config["OPENAI_MAX_TOKENS"])
 
 PROJECT_NAME = config["PROJECT_NAME"]
 PROJECT_DESCRIPTION = config["PROJECT_DESCRIPTION"]
@@ -34,15 +43,15 @@ print(f"LLM   : {OPENAI_MODEL}")
 print_in_color("PROJECT", "CYAN")
 print(f"{PROJECT_NAME}: {PROJECT_DESCRIPTION}")
 
-openai_agent = OpenAIAgent(
-    model=OPENAI_MODEL,
-    temperature=OPENAI_TEMPERATURE,
-    max_tokens=OPENAI_MAX_TOKENS,
-    api_key=OPENAI_API_KEY,
-)
+openai_agent = create_agent(config, args, OPENAI_API_KEY)
 
 print_in_color("PROCESSING", "MAGENTA")
 
-epic = openai_agent.create_epics(project)
+if openai_agent.journal is not None:
+    project = openai_agent.journal.restore(project)
+
+epic = asyncio.run(openai_agent.acreate_epics(project))
+
+save_project(epic, intermediate_path(config, "epics"))
 
-epic.save_to_yaml("epics.yaml")
+close_agent(openai_agent)
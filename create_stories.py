@@ -2,13 +2,22 @@
 """
 This script generates stories for an epic.
 """
+import asyncio
 import os
 
-import yaml
 from dotenv import load_dotenv
 
-from classes import OpenAIAgent, Project
-from functions.functions import load_config, print_in_color
+from classes.storage import load_project, save_project
+from functions.functions import (
+    close_agent,
+    create_agent,
+    intermediate_path,
+    load_config,
+    parse_args,
+    print_in_color,
+)
+
+args = parse_args(__doc__)
 
 # load openai api key from .env file
 load_dotenv()
@@ -19,8 +28,6 @@ YAML_FILE_PATH = "config.yaml"
 config = load_config(YAML_FILE_PATH)
 
 OPENAI_MODEL = config["OPENAI_MODEL"].lower()
-OPENAI_TEMPERATURE = float(config["OPENAI_TEMPERATURE"])
-OPENAI_MAX_TOKENS = int(config["OPENAI_MAX_TOKENS"])
 
 PROJECT_NAME = config["PROJECT_NAME"]
 PROJECT_DESCRIPTION = config["PROJECT_DESCRIPTION"]
@@ -31,23 +38,16 @@ print(f"MODEL   : {OPENAI_MODEL}")
 print_in_color("PROJECT", "CYAN")
 print(f"{PROJECT_NAME}: {PROJECT_DESCRIPTION}")
 
-openai_agent = OpenAIAgent(
-    model=OPENAI_MODEL,
-    temperature=OPENAI_TEMPERATURE,
-    max_tokens=OPENAI_MAX_TOKENS,
-    api_key=OPENAI_API_KEY,
-)
+openai_agent = create_agent(config, args, OPENAI_API_KEY)
 
 print_in_color("PROCESSING", "MAGENTA")
 
-with open("epics.yaml", encoding="utf-8") as f:
-    project = yaml.safe_load(f)
+project = load_project(intermediate_path(config, "epics"))
 
-project = Project(
-    name=project["project"]["name"],
-    description=project["project"]["description"],
-    epics=project["project"]["epics"],
-)
-project = openai_agent.create_stories(project)
+if openai_agent.journal is not None:
+    project = openai_agent.journal.restore(project)
+project = asyncio.run(openai_agent.acreate_stories(project))
+
+save_project(project, intermediate_path(config, "stories"))
 
-project.save_to_yaml("stories.yaml")
+close_agent(openai_agent)
@@ -1,11 +1,20 @@
-"""Create tasks from stories.yaml file."""
+"""Create tasks from the stories file."""
+import asyncio
 import os
 
-import yaml
 from dotenv import load_dotenv
 
-from classes import OpenAIAgent, Project
-from functions.functions import load_config, print_in_color
+from classes.storage import load_project
+from functions.functions import (
+    close_agent,
+    create_agent,
+    intermediate_path,
+    load_config,
+    parse_args,
+    print_in_color,
+)
+
+args = parse_args(__doc__)
 
 # Load OPENAI_API_KEY from .env file
 load_dotenv()
@@ -16,26 +25,15 @@ YAML_FILE_PATH = "config.yaml"
 config = load_config(YAML_FILE_PATH)
 
 OPENAI_MODEL = config["OPENAI_MODEL"].lower()
-OPENAI_TEMPERATURE = float(config["OPENAI_TEMPERATURE"])
-OPENAI_MAX_TOKENS = int(config["OPENAI_MAX_TOKENS"])
 
 PROJECT_NAME = config["PROJECT_NAME"]
 
-openai_agent = OpenAIAgent(
-    model=OPENAI_MODEL,
-    temperature=OPENAI_TEMPERATURE,
-    max_tokens=OPENAI_MAX_TOKENS,
-    api_key=OPENAI_API_KEY,
-)
+openai_agent = create_agent(config, args, OPENAI_API_KEY)
 
-with open("stories.yaml", encoding="utf-8") as f:
-    project = yaml.safe_load(f)
+project = load_project(intermediate_path(config, "stories"))
 
-project = Project(
-    name=project["project"]["name"],
-    description=project["project"]["description"],
-    epics=project["project"]["epics"],
-)
+if openai_agent.journal is not None:
+    project = openai_agent.journal.restore(project)
 
 print_in_color("CONFIGURATION", "BLUE")
 print(f"OPENAI_MODEL   : {OPENAI_MODEL}")
@@ -43,6 +41,8 @@ print(f"PROJECT  : {project.name} - {project.description}")
 
 print_in_color("PROCESSING", "MAGENTA")
 
-project = openai_agent.create_tasks(project)
+project = asyncio.run(openai_agent.acreate_tasks(project))
 
 project.save_to_yaml("tasks.yaml")
+
+close_agent(openai_agent)
@@ -0,0 +1,248 @@
+"""Batch generation of many projects in parallel worker processes."""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+import yaml
+
+from classes.incremental import save_state, state_path
+from classes.metrics import CallRecord
+from classes.model import Project
+from classes.ratelimit import RateLimiter
+from classes.streaming import LOADER
+from functions.functions import close_agent, create_agent, create_rate_limiter
+
+# Rate limiter shared by all workers, set by the pool initializer.
+_RATE_LIMITER: Optional[RateLimiter] = None
+
+
+def load_definition(file_path: str) -> Project:
+    """Load a project definition file.
+
+    Files with a "project" root keep their epics, stories and tasks, which
+    are then completed instead of regenerated. Files with an older "epic"
+    root contribute their name and description only.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = yaml.load(f, Loader=LOADER) or {}
+    if "project" in data:
+        return Project.from_dict(data["project"])
+    root = data.get("epic") or data
+    return Project(root["name"], root["description"])
+
+
+def load_definitions(path: str) -> List[Project]:
+    """Load the projects of a directory or a manifest.
+
+    A directory contributes every *.yaml and *.yml file in it. A manifest is
+    a YAML file with a "projects" list whose entries are either mappings with
+    a name and a description, or paths of definition files relative to the
+    manifest. Any other file is read as a single definition.
+    """
+    if os.path.isdir(path):
+        return [
+            load_definition(os.path.join(path, name))
+            for name in sorted(os.listdir(path))
+            if name.endswith((".yaml", ".yml"))
+        ]
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.load(f, Loader=LOADER) or {}
+    if "projects" not in data:
+        return [load_definition(path)]
+
+    projects = []
+    for entry in data["projects"]:
+        if isinstance(entry, str):
+            entry_path = os.path.join(os.path.dirname(path), entry)
+            projects.append(load_definition(entry_path))
+        else:
+            projects.append(Project(entry["name"], entry["description"]))
+    return projects
+
+
+def namespaces(projects: List[Project]) -> List[str]:
+    """Derive a unique directory name for every project."""
+    names = []
+    for project in projects:
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "-", project.name).strip("-.")
+        name = name or "project"
+        candidate, number = name, 2
+        while candidate in names:
+            candidate, number = f"{name}-{number}", number + 1
+        names.append(candidate)
+    return names
+
+
+def select_shard(items: list, shard: Optional[str]) -> list:
+    """Keep the items of one shard, given as "INDEX/COUNT"."""
+    if not shard:
+        return items
+    index, count = (int(part) for part in shard.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard {shard}: expected INDEX/COUNT")
+    return items[index::count]
+
+
+def init_worker(rate_limiter: Optional[RateLimiter]) -> None:
+    """Install the shared rate limiter in a worker process."""
+    global _RATE_LIMITER  # pylint: disable=global-statement
+    _RATE_LIMITER = rate_limiter
+
+
+def run_project(
+    project: Project, directory: str, config: dict, options: dict
+) -> dict:
+    """Generate one project into its own directory.
+
+    Everything the project writes, its console output included, goes to
+    ``directory``; the response cache stays shared between projects.
+
+    Returns:
+        The summary of the run.
+    """
+    os.makedirs(directory, exist_ok=True)
+    config = dict(config)
+    for key, file_name in (
+        ("JOURNAL_PATH", "journal.jsonl"),
+        ("METRICS_JSONL_PATH", "metrics.jsonl"),
+        ("METRICS_PROMETHEUS_PATH", "metrics.prom"),
+        ("CANDIDATES_LOG_PATH", "candidates.jsonl"),
+    ):
+        if config.get(key):
+            config[key] = os.path.join(directory, file_name)
+    args = argparse.Namespace(**dict(options, journal=None))
+
+    summary = {
+        "project": project.name,
+        "directory": directory,
+        "status": "ok",
+        "error": None,
+        "epics": 0,
+        "stories": 0,
+        "tasks": 0,
+        "calls": 0,
+        "cached": 0,
+        "failed_calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost": 0.0,
+        "wall_time": 0.0,
+    }
+
+    def collect(record: CallRecord) -> None:
+        summary["calls"] += 1
+        summary["cached"] += int(record.cached)
+        summary["failed_calls"] += int(record.error is not None)
+        summary["prompt_tokens"] += record.prompt_tokens
+        summary["completion_tokens"] += record.completion_tokens
+        summary["cost"] += record.cost
+
+    start = time.perf_counter()
+    log_path = os.path.join(directory, "log.txt")
+    with open(log_path, "w", encoding="utf-8") as log:
+        with contextlib.redirect_stdout(log):
+            agent = None
+            try:
+                agent = create_agent(
+                    config,
+                    args,
+                    os.environ.get("OPENAI_API_KEY"),
+                    _RATE_LIMITER,
+                )
+                agent.add_hook(collect)
+                if agent.journal is not None:
+                    project = agent.journal.restore(project)
+                output = os.path.join(directory, "tasks.yaml")
+                project = asyncio.run(agent.arun(project, output=output))
+                save_state(project, state_path(output))
+            except Exception as e:  # pylint: disable=broad-except
+                summary["status"] = "failed"
+                summary["error"] = f"{type(e).__name__}: {e}"
+                print(summary["error"])
+            finally:
+                if agent is not None:
+                    close_agent(agent)
+
+    summary["wall_time"] = round(time.perf_counter() - start, 3)
+    summary["cost"] = round(summary["cost"], 6)
+    summary["epics"] = len(project.epics)
+    summary["stories"] = sum(len(epic.stories) for epic in project.epics)
+    summary["tasks"] = sum(
+        len(story.tasks) for epic in project.epics for story in epic.stories
+    )
+    return summary
+
+
+def run_batch(
+    projects: List[Project],
+    output_dir: str,
+    config: dict,
+    options: dict,
+    workers: Optional[int] = None,
+) -> List[dict]:
+    """Generate projects in a pool of worker processes.
+
+    All workers draw from one rate limiter built from the config file, so
+    the configured budget holds for the whole batch. When a batch is split
+    across machines, divide the budget between them.
+
+    Returns:
+        The summaries of the runs, in the order of ``projects``.
+    """
+    directories = [
+        os.path.join(output_dir, name) for name in namespaces(projects)
+    ]
+    summaries: List[Optional[dict]] = [None] * len(projects)
+    rate_limiter = create_rate_limiter(config, shared=True)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(rate_limiter,),
+    ) as executor:
+        futures = {}
+        for index, project in enumerate(projects):
+            future = executor.submit(
+                run_project, project, directories[index], config, options
+            )
+            futures[future] = index
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries[futures[future]] = summary
+            print(
+                f"{summary['status'].upper():<6} {summary['project']}: "
+                f"{summary['tasks']} tasks in {summary['wall_time']:.1f}s"
+            )
+    return summaries
+
+
+def write_report(summaries: List[dict], output_dir: str) -> str:
+    """Write the batch summary as JSON and print a table of it.
+
+    Returns:
+        The path of the JSON report.
+    """
+    header = (
+        f"{'project':<24} {'status':<7} {'epics':>5} {'stories':>7} "
+        f"{'tasks':>6} {'calls':>6} {'tokens':>8} {'cost $':>8} {'wall s':>7}"
+    )
+    print(header)
+    for summary in summaries:
+        tokens = summary["prompt_tokens"] + summary["completion_tokens"]
+        print(
+            f"{summary['project'][:24]:<24} {summary['status']:<7} "
+            f"{summary['epics']:>5} {summary['stories']:>7} "
+            f"{summary['tasks']:>6} {summary['calls']:>6} {tokens:>8} "
+            f"{summary['cost']:>8.4f} {summary['wall_time']:>7.1f}"
+        )
+
+    path = os.path.join(output_dir, "summary.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2, ensure_ascii=False)
+    return path
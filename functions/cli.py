@@ -0,0 +1,79 @@
+"""Command line helpers shared by the scripts.
+
+This module only needs the standard library, PyYAML and colorama, so a
+command can build its parser and read its config without importing the
+agent.
+"""
+import argparse
+
+import yaml
+from colorama import Fore, Style
+
+
+def load_config(config_path: str = "config.yaml") -> dict:
+    """Load YAML config file."""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+    except FileNotFoundError as exc:
+        print(f"The specified YAML file could not be found: {exc}")
+    except yaml.YAMLError as exc:
+        print(f"Error in YAML file: {exc}")
+
+    return config
+
+
+def print_in_color(text: str, color: str = "WHITE") -> None:
+    """Print text in color."""
+    colors = {
+        "BLACK": Fore.BLACK,
+        "BLUE": Fore.BLUE,
+        "CYAN": Fore.CYAN,
+        "GREEN": Fore.GREEN,
+        "MAGENTA": Fore.MAGENTA,
+        "RED": Fore.RED,
+        "YELLOW": Fore.YELLOW,
+    }
+    color = color.upper()
+
+    if color not in colors:
+        color = "WHITE"
+
+    color = colors[color]
+
+    print(f"{color}{Style.BRIGHT}\n*****{text}*****\n{Style.RESET_ALL}")
+
+
+def parse_args(description: str) -> argparse.Namespace:
+    """Parse the command line options shared by the generator scripts."""
+    parser = argparse.ArgumentParser(description=description)
+    add_agent_arguments(parser)
+    return parser.parse_args()
+
+
+def add_agent_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options that configure the agent to a parser."""
+    parser.add_argument(
+        "--provider",
+        choices=["openai", "llama_cpp", "fake"],
+        help="language model backend (default: LLM_PROVIDER)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not read or write the response cache",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="ignore cached responses and overwrite them with fresh ones",
+    )
+    parser.add_argument(
+        "--journal",
+        help="journal recording each completed node (default: JOURNAL_PATH)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="restore nodes from the journal and generate only missing ones",
+    )
@@ -1,37 +1,283 @@
 """Functions for the main script."""
-import yaml
-from colorama import Fore, Style
-
-
-def load_config(config_path: str = "config.yaml") -> dict:
-    """Load YAML config file."""
-    try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
-    except FileNotFoundError as exc:
-        print(f"The specified YAML file could not be found: {exc}")
-    except yaml.YAMLError as exc:
-        print(f"Error in YAML file: {exc}")
-
-    return config
-
-
-def print_in_color(text: str, color: str = "WHITE") -> None:
-    """Print text in color."""
-    colors = {
-        "BLACK": Fore.BLACK,
-        "BLUE": Fore.BLUE,
-        "CYAN": Fore.CYAN,
-        "GREEN": Fore.GREEN,
-        "MAGENTA": Fore.MAGENTA,
-        "RED": Fore.RED,
-        "YELLOW": Fore.YELLOW,
-    }
-    color = color.upper()
-
-    if color not in colors:
-        color = "WHITE"
-
-    color = colors[color]
-
-    print(f"{color}{Style.BRIGHT}\n*****{text}*****\n{Style.RESET_ALL}")
+import argparse
+from typing import TYPE_CHECKING, Optional
+
+from classes.cache import ResponseCache
+from classes.classes import AsyncOpenAIAgent
+from classes.dedup import Deduplicator
+from classes.journal import Journal
+from classes.context import PromptBudget
+from classes.ranking import CandidateRanker
+from classes.metrics import (
+    JsonLinesCollector,
+    PrometheusCollector,
+    UsageCollector,
+)
+from classes.providers import (
+    FakeProvider,
+    LlamaCppProvider,
+    LLMProvider,
+    OpenAIProvider,
+)
+from classes.ratelimit import RateLimiter
+from classes.scheduler import DEFAULT_CONCURRENCY, Scheduler
+from classes.session import SessionPolicy
+
+# The command line helpers are re-exported for the generator scripts.
+from functions.cli import (  # pylint: disable=unused-import
+    add_agent_arguments,
+    load_config,
+    parse_args,
+    print_in_color,
+)
+
+if TYPE_CHECKING:
+    from classes.jira import JiraExporter
+
+
+def create_cache(
+    config: dict, args: argparse.Namespace
+) -> Optional[ResponseCache]:
+    """Create the response cache described in the config file."""
+    if args.no_cache or not config.get("CACHE_PATH"):
+        return None
+
+    max_age_days = config.get("CACHE_MAX_AGE_DAYS")
+    return ResponseCache(
+        config["CACHE_PATH"],
+        max_entries=config.get("CACHE_MAX_ENTRIES"),
+        max_age=max_age_days * 86400 if max_age_days else None,
+        refresh=args.refresh,
+    )
+
+
+def create_journal(config: dict, args: argparse.Namespace) -> Optional[Journal]:
+    """Create the journal of completed nodes, if one is configured."""
+    path = args.journal or config.get("JOURNAL_PATH")
+    if not path:
+        return None
+    return Journal(path, resume=args.resume)
+
+
+def intermediate_path(config: dict, stem: str) -> str:
+    """Build the path of a file passed between the generator scripts."""
+    return f"{stem}.{config.get('INTERMEDIATE_FORMAT') or 'yaml'}"
+
+
+def create_rate_limiter(
+    config: dict, shared: bool = False
+) -> Optional[RateLimiter]:
+    """Create the client-side rate limiter described in the config file."""
+    requests_per_minute = config.get("OPENAI_REQUESTS_PER_MINUTE")
+    tokens_per_minute = config.get("OPENAI_TOKENS_PER_MINUTE")
+    if not requests_per_minute and not tokens_per_minute:
+        return None
+    return RateLimiter(
+        requests_per_minute,
+        tokens_per_minute,
+        config["OPENAI_MODEL"].lower(),
+        shared=shared,
+    )
+
+
+def create_provider(
+    config: dict, args: argparse.Namespace, api_key: str
+) -> LLMProvider:
+    """Create the language model backend described in the config file."""
+    name = args.provider or config.get("LLM_PROVIDER", "openai")
+    if name == "llama_cpp":
+        return LlamaCppProvider(
+            config["LLAMA_MODEL_PATH"],
+            n_ctx=int(config.get("LLAMA_N_CTX", 4096)),
+            n_batch=int(config.get("LLAMA_N_BATCH", 512)),
+            n_threads=config.get("LLAMA_N_THREADS"),
+        )
+    if name == "fake":
+        return FakeProvider()
+    return OpenAIProvider(api_key)
+
+
+def create_hooks(config: dict) -> list:
+    """Create the metrics collectors described in the config file.
+
+    A UsageCollector is always installed; close_agent prints its report.
+    """
+    hooks = [UsageCollector()]
+    if config.get("METRICS_JSONL_PATH"):
+        hooks.append(JsonLinesCollector(config["METRICS_JSONL_PATH"]))
+    if config.get("METRICS_PROMETHEUS_PATH"):
+        hooks.append(PrometheusCollector(config["METRICS_PROMETHEUS_PATH"]))
+    return hooks
+
+
+def create_dedup(config: dict) -> Optional[Deduplicator]:
+    """Create the semantic deduplication index, if a threshold is set."""
+    threshold = config.get("DEDUP_THRESHOLD")
+    if not threshold:
+        return None
+    embedding_function = None
+    if config.get("DEDUP_EMBEDDING_MODEL"):
+        # pylint: disable-next=import-outside-toplevel
+        from chromadb.utils import embedding_functions
+
+        embedding_function = (
+            embedding_functions.SentenceTransformerEmbeddingFunction(
+                model_name=config["DEDUP_EMBEDDING_MODEL"]
+            )
+        )
+    return Deduplicator(
+        float(threshold),
+        config.get("DEDUP_MODE") or "merge",
+        embedding_function,
+    )
+
+
+def create_budget(config: dict) -> Optional[PromptBudget]:
+    """Create the prompt token budget described in the config file.
+
+    The budget is PROMPT_TOKEN_BUDGET, lowered if needed so that a prompt and
+    OPENAI_MAX_TOKENS of output fit into CONTEXT_WINDOW.
+    """
+    limits = []
+    if config.get("PROMPT_TOKEN_BUDGET"):
+        limits.append(int(config["PROMPT_TOKEN_BUDGET"]))
+    if config.get("CONTEXT_WINDOW"):
+        limits.append(
+            int(config["CONTEXT_WINDOW"]) - int(config["OPENAI_MAX_TOKENS"])
+        )
+    threshold = config.get("SUMMARY_THRESHOLD")
+    if not limits and not threshold:
+        return None
+    return PromptBudget(
+        config["OPENAI_MODEL"].lower(),
+        min(limits) if limits else None,
+        int(threshold) if threshold else None,
+    )
+
+
+def create_conversation(config: dict) -> Optional[SessionPolicy]:
+    """Create the session policy of the conversational mode, if enabled.
+
+    The history of a session is kept under CONVERSATION_MAX_TOKENS, lowered
+    if needed so that it and OPENAI_MAX_TOKENS of output fit into
+    CONTEXT_WINDOW, and under CONVERSATION_MAX_TURNS exchanges.
+    """
+    if not config.get("CONVERSATION_MODE", False):
+        return None
+    limits = []
+    if config.get("CONVERSATION_MAX_TOKENS"):
+        limits.append(int(config["CONVERSATION_MAX_TOKENS"]))
+    if config.get("CONTEXT_WINDOW"):
+        limits.append(
+            int(config["CONTEXT_WINDOW"]) - int(config["OPENAI_MAX_TOKENS"])
+        )
+    turns = config.get("CONVERSATION_MAX_TURNS")
+    return SessionPolicy(
+        min(limits) if limits else None, int(turns) if turns else None
+    )
+
+
+def create_ranker(config: dict) -> Optional[CandidateRanker]:
+    """Create the ranker of candidate lists, if LIST_CANDIDATES exceeds 1."""
+    if int(config.get("LIST_CANDIDATES") or 1) < 2:
+        return None
+    return CandidateRanker(
+        min_items=int(config.get("CANDIDATE_MIN_ITEMS") or 3),
+        max_items=int(config.get("CANDIDATE_MAX_ITEMS") or 10),
+        log_path=config.get("CANDIDATES_LOG_PATH") or None,
+    )
+
+
+def create_scheduler(config: dict) -> Scheduler:
+    """Create the request scheduler of the agent.
+
+    SCHEDULER selects priority ordering or plain arrival order, and
+    SCHEDULER_<LEVEL>_CONCURRENCY caps the requests in flight of a level
+    under OPENAI_CONCURRENCY.
+    """
+    limits = {}
+    for level in ("epic", "story", "task"):
+        limit = config.get(f"SCHEDULER_{level.upper()}_CONCURRENCY")
+        if limit:
+            limits[level] = int(limit)
+    return Scheduler(
+        int(config.get("OPENAI_CONCURRENCY") or DEFAULT_CONCURRENCY),
+        limits,
+        priority=(config.get("SCHEDULER") or "priority") == "priority",
+    )
+
+
+def create_jira_exporter(
+    config: dict, api_token: Optional[str] = None
+) -> "JiraExporter":
+    """Create the Jira exporter described in the config file.
+
+    The token is sent with JIRA_EMAIL as basic authentication, as Jira Cloud
+    expects, or as a bearer token when no email is configured.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from classes.jira import JiraClient, JiraExporter
+
+    concurrency = int(config.get("JIRA_CONCURRENCY", 4))
+    client = JiraClient(
+        config["JIRA_URL"],
+        config.get("JIRA_EMAIL"),
+        api_token,
+        pool_size=concurrency,
+    )
+    return JiraExporter(
+        client,
+        config["JIRA_PROJECT_KEY"],
+        batch_size=int(config.get("JIRA_BATCH_SIZE", 50)),
+        concurrency=concurrency,
+        task_type=config.get("JIRA_TASK_TYPE") or "Sub-task",
+        epic_link_field=config.get("JIRA_EPIC_LINK_FIELD"),
+        epic_name_field=config.get("JIRA_EPIC_NAME_FIELD"),
+    )
+
+
+def create_agent(
+    config: dict,
+    args: argparse.Namespace,
+    api_key: str,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> AsyncOpenAIAgent:
+    """Create the agent described in the config file.
+
+    A rate limiter passed in, e.g. one shared by several processes, replaces
+    the one described in the config file.
+    """
+    return AsyncOpenAIAgent(
+        model=config["OPENAI_MODEL"].lower(),
+        temperature=float(config["OPENAI_TEMPERATURE"]),
+        max_tokens=int(config["OPENAI_MAX_TOKENS"]),
+        api_key=api_key,
+        batch_naming=bool(config.get("BATCH_NAMING", False)),
+        cache=create_cache(config, args),
+        journal=create_journal(config, args),
+        rate_limiter=rate_limiter or create_rate_limiter(config),
+        provider=create_provider(config, args, api_key),
+        hooks=create_hooks(config),
+        structured_output=bool(config.get("STRUCTURED_OUTPUT", False)),
+        dedup=create_dedup(config),
+        budget=create_budget(config),
+        conversation=create_conversation(config),
+        candidates=int(config.get("LIST_CANDIDATES") or 1),
+        ranker=create_ranker(config),
+        scheduler=create_scheduler(config),
+        streaming=bool(config.get("STREAMING", False)),
+    )
+
+
+def close_agent(agent: AsyncOpenAIAgent) -> None:
+    """Print the statistics, close the cache and flush the collectors."""
+    if agent.cache is not None:
+        cache = agent.cache
+        print(f"CACHE  : {cache.hits} hits, {cache.misses} misses")
+        cache.close()
+    for hook in agent.hooks:
+        if isinstance(hook, UsageCollector) and hook.usage:
+            print_in_color("TOKEN USAGE", "BLUE")
+            print(hook.report())
+        if hasattr(hook, "close"):
+            hook.close()
@@ -0,0 +1,66 @@
+"""Concurrent generation with the async agent."""
+import asyncio
+import random
+
+from classes.classes import AsyncOpenAIAgent
+from classes.errors import ProviderError
+from classes.model import Project
+from classes.providers import FakeProvider
+
+
+class JitteryProvider(FakeProvider):
+    """Answers after a random delay, failing each prompt once if asked to.
+
+    Attributes:
+        peak: The largest number of requests seen in flight at once.
+    """
+
+    def __init__(self, seed, fail_first=False):
+        super().__init__()
+        self.rng = random.Random(seed)
+        self.fail_first = fail_first
+        self.failed = set()
+        self.in_flight = 0
+        self.peak = 0
+
+    async def acomplete(self, messages, model, temperature, max_tokens, n=1):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.rng.uniform(0, 0.005))
+            prompt = messages[-1]["content"]
+            if self.fail_first and prompt not in self.failed:
+                self.failed.add(prompt)
+                raise ProviderError("busy", retry_after=0.0)
+            return self.complete(messages, model, temperature, max_tokens, n)
+        finally:
+            self.in_flight -= 1
+
+
+def generate(provider, concurrency):
+    agent = AsyncOpenAIAgent(
+        "model", 0.0, 100, "key", provider=provider, concurrency=concurrency
+    )
+    return asyncio.run(agent.arun(Project("P", "Build it"))).to_dict()
+
+
+def test_concurrent_runs_are_deterministic():
+    expected = generate(FakeProvider(), 1)
+    for seed in range(3):
+        provider = JitteryProvider(seed)
+        assert generate(provider, 4) == expected
+        assert 1 < provider.peak <= 4
+
+    epics = expected["epics"]
+    assert [epic["epic_id"] for epic in epics] == [1, 2, 3]
+    for epic in epics:
+        assert [story["story_id"] for story in epic["stories"]] == [1, 2, 3]
+        for story in epic["stories"]:
+            assert [task["task_id"] for task in story["tasks"]] == [1, 2, 3]
+
+
+def test_failed_requests_are_retried():
+    provider, reference = JitteryProvider(0, fail_first=True), FakeProvider()
+    assert generate(provider, 4) == generate(reference, 4)
+    assert provider.failed
+    assert provider.calls == reference.calls
@@ -0,0 +1,80 @@
+"""Batch generation of several projects."""
+import os
+
+import pytest
+
+pytest.importorskip("colorama")
+
+from functions.batch import (
+    load_definitions,
+    namespaces,
+    run_batch,
+    select_shard,
+)
+
+CONFIG = {
+    "LLM_PROVIDER": "fake",
+    "OPENAI_MODEL": "gpt-3.5-turbo",
+    "OPENAI_TEMPERATURE": 0.0,
+    "OPENAI_MAX_TOKENS": 100,
+    "OPENAI_CONCURRENCY": 4,
+}
+OPTIONS = {
+    "provider": None,
+    "no_cache": True,
+    "refresh": False,
+    "journal": None,
+    "resume": False,
+}
+
+
+def test_shards_split_the_items():
+    items = list(range(10))
+    shards = [select_shard(items, f"{index}/3") for index in range(3)]
+    assert sorted(sum(shards, [])) == items
+    assert select_shard(items, None) == items
+    with pytest.raises(ValueError, match="INDEX/COUNT"):
+        select_shard(items, "3/3")
+
+
+def test_manifest_entries_are_inline_or_files(tmp_path):
+    (tmp_path / "shop.yaml").write_text(
+        "project:\n  name: Shop\n  description: Sell things\n",
+        encoding="utf-8",
+    )
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text(
+        "projects:\n"
+        "- shop.yaml\n"
+        "- name: Shop\n"
+        "  description: Sell more things\n",
+        encoding="utf-8",
+    )
+    projects = load_definitions(str(manifest))
+    assert [p.description for p in projects] == [
+        "Sell things",
+        "Sell more things",
+    ]
+    assert namespaces(projects) == ["Shop", "Shop-2"]
+
+
+def test_projects_are_generated_in_worker_processes(tmp_path):
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text(
+        "projects:\n"
+        "- {name: Shop, description: Sell things}\n"
+        "- {name: Blog, description: Write posts}\n"
+        "- {name: Shop, description: Sell more things}\n",
+        encoding="utf-8",
+    )
+    projects = load_definitions(str(manifest))
+    summaries = run_batch(
+        projects, str(tmp_path / "out"), CONFIG, OPTIONS, workers=2
+    )
+    assert [s["project"] for s in summaries] == ["Shop", "Blog", "Shop"]
+    assert [s["status"] for s in summaries] == ["ok"] * 3
+    assert all(s["tasks"] == 27 for s in summaries)
+    for name in ("Shop", "Blog", "Shop-2"):
+        directory = tmp_path / "out" / name
+        assert os.path.exists(directory / "tasks.yaml")
+        assert os.path.exists(directory / "tasks.state.json")
@@ -0,0 +1,95 @@
+"""Keying and access of the response cache."""
+import asyncio
+import threading
+
+from classes.cache import ResponseCache
+from classes.classes import AsyncOpenAIAgent, OpenAIAgent
+from classes.providers import (
+    Completion,
+    FakeProvider,
+    LlamaCppProvider,
+    LLMProvider,
+)
+
+
+class CannedProvider(LLMProvider):
+    """Answers every request with a fixed text."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def complete(self, messages, model, temperature, max_tokens, n=1):
+        return Completion([self.text] * n)
+
+
+def make_agent(cache, provider):
+    return OpenAIAgent(
+        "gpt-3.5-turbo", 0.1, 100, "key", cache=cache, provider=provider
+    )
+
+
+def test_key_depends_on_every_parameter():
+    base = ("FakeProvider", "model", 0.1, 100, "prompt", 1)
+    keys = {ResponseCache.make_key(*base)}
+    changes = ("OpenAIProvider", "other", 0.2, 50, "?", 3)
+    for index, value in enumerate(changes):
+        params = list(base)
+        params[index] = value
+        keys.add(ResponseCache.make_key(*params))
+    assert len(keys) == 7
+
+
+def test_backends_do_not_share_responses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    fake = make_agent(cache, FakeProvider())
+    llama = make_agent(cache, LlamaCppProvider("models/model.gguf"))
+    other = make_agent(cache, LlamaCppProvider("models/other.gguf"))
+    keys = {agent.cache_key("prompt") for agent in (fake, llama, other)}
+    assert len(keys) == 3
+
+
+def test_fake_responses_are_not_served_to_another_backend(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    make_agent(cache, FakeProvider()).openai_call("Name it", "task", "name")
+    answer = make_agent(cache, CannedProvider("Real name")).openai_call(
+        "Name it", "task", "name"
+    )
+    assert answer == "Real name"
+
+
+def test_cached_response_is_served_to_the_same_backend(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    provider = FakeProvider()
+    first = make_agent(cache, provider).openai_call("Name it", "task", "name")
+    second = make_agent(cache, provider).openai_call("Name it", "task", "name")
+    assert first == second
+    assert provider.calls == 1
+    assert cache.hits == 1
+
+
+class ThreadRecordingCache(ResponseCache):
+    """Records the threads the database is used from."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.current_thread())
+        return super().get(key)
+
+    def set(self, key, response):
+        self.threads.add(threading.current_thread())
+        super().set(key, response)
+
+
+def test_async_agent_uses_the_cache_off_the_event_loop(tmp_path):
+    cache = ThreadRecordingCache(str(tmp_path / "cache.sqlite3"))
+    agent = AsyncOpenAIAgent(
+        "model", 0.1, 100, "key", cache=cache, provider=FakeProvider()
+    )
+    for _ in range(2):
+        asyncio.run(agent.aopenai_call("Name it", "task", "name"))
+    assert cache.hits == 1 and cache.misses == 1
+    assert cache.threads
+    assert threading.main_thread() not in cache.threads
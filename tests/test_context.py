@@ -0,0 +1,81 @@
+"""Prompt token budgets and project summaries."""
+import asyncio
+
+import pytest
+
+from classes import context
+from classes.classes import AsyncOpenAIAgent
+from classes.context import PromptBudget
+from classes.model import Epic, Project
+from classes.providers import FakeProvider
+
+LONG = " ".join(f"feature{number}" for number in range(40))
+
+
+class WordEncoding:
+    """Counts words as tokens, standing in for tiktoken."""
+
+    @staticmethod
+    def encode(text):
+        return text.split()
+
+    @staticmethod
+    def decode(tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def fixture_words(monkeypatch):
+    monkeypatch.setattr(context, "encoding_for", lambda model: WordEncoding)
+
+
+def build(project_text, epic_text):
+    return f"Project: {project_text}\nEpic: {epic_text}"
+
+
+def test_fit_trims_the_most_expendable_text_first():
+    budget = PromptBudget("model", max_prompt_tokens=20)
+    prompt = budget.fit(build, LONG, "Build the checkout page")
+    assert budget.count(prompt) <= 20
+    assert prompt.startswith("Project: feature0 feature1")
+    assert " ...\nEpic: Build the checkout page" in prompt
+
+
+def test_fit_keeps_prompts_under_the_budget():
+    budget = PromptBudget("model", max_prompt_tokens=100)
+    assert budget.fit(build, LONG, "Epic") == build(LONG, "Epic")
+    assert PromptBudget("model").fit(build, LONG, "Epic") == build(LONG, "Epic")
+
+
+def summarizing(summary):
+    default = FakeProvider().default_response
+
+    def respond(prompt):
+        if "summarize the following" in prompt:
+            return summary
+        return default(prompt)
+
+    return respond
+
+
+@pytest.mark.parametrize(
+    "summary, used", [("Sell things online", True), (LONG + " more", False)]
+)
+def test_long_descriptions_are_summarized_once(summary, used):
+    provider = FakeProvider(respond=summarizing(summary))
+    agent = AsyncOpenAIAgent(
+        "model",
+        0.0,
+        100,
+        "key",
+        provider=provider,
+        budget=PromptBudget("model", summary_threshold=10),
+    )
+    project = Project("P", LONG)
+    asyncio.run(agent.asummarize(project))
+    asyncio.run(agent.asummarize(project))
+    assert provider.calls == 1
+
+    prompt = agent.story_list_prompt(project, Epic(1, "E", "Checkout"))
+    assert ("Sell things online" in prompt) == used
+    assert (LONG in prompt) != used
@@ -0,0 +1,13 @@
+"""Export formats with optional dependencies."""
+import sys
+
+import pytest
+
+from classes.exporters import create_sink
+
+
+@pytest.mark.parametrize("name", ["parquet", "arrow"])
+def test_columnar_formats_report_missing_pyarrow(monkeypatch, tmp_path, name):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(ImportError, match=r"babyagi\[parquet\]"):
+        create_sink(name, str(tmp_path / f"project.{name}"))
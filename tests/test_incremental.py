@@ -0,0 +1,66 @@
+"""Finding the stale subtrees of a project."""
+import pytest
+
+from classes.incremental import parse_story_path, snapshot, stale_targets
+from classes.model import Epic, Project, Story, Task
+
+
+def make_project():
+    epics = []
+    for epic_id in (1, 2):
+        stories = [
+            Story(story_id, "Story", f"Story {story_id}", [Task(1, "T", "Do")])
+            for story_id in (1, 2)
+        ]
+        epics.append(Epic(epic_id, "Epic", f"Epic {epic_id}", stories))
+    return Project("P", "Build it", epics)
+
+
+def test_unchanged_project_has_no_stale_targets():
+    project = make_project()
+    assert stale_targets(project, snapshot(project)) == ([], [])
+
+
+def test_edited_epic_makes_its_stories_stale():
+    project = make_project()
+    state = snapshot(project)
+    project.get_epic(2).description = "Edited"
+    assert stale_targets(project, state) == ([2], [])
+
+
+def test_edited_story_makes_its_tasks_stale():
+    project = make_project()
+    state = snapshot(project)
+    project.find(1, 2).description = "Edited"
+    assert stale_targets(project, state) == ([], [(1, 2)])
+
+
+def test_edited_project_makes_every_epic_stale():
+    project = make_project()
+    state = snapshot(project)
+    project.description = "Edited"
+    assert stale_targets(project, state) == ([1, 2], [])
+
+
+def test_incomplete_nodes_are_stale():
+    project = make_project()
+    state = snapshot(project)
+    project.get_epic(1).stories = []
+    project.find(2, 1).tasks = []
+    assert stale_targets(project, state) == ([1], [(2, 1)])
+
+
+def test_nodes_missing_from_the_state_are_stale_only_if_incomplete():
+    project = make_project()
+    state = snapshot(project)
+    project.epics.append(Epic(3, "New", "Complete", [Story(1, "S", "D")]))
+    project.get_epic(3).stories[0].tasks.append(Task(1, "T", "Do"))
+    project.epics.append(Epic(4, "New", "Without stories"))
+    project.get_epic(1).stories.append(Story(3, "New", "Without tasks"))
+    assert stale_targets(project, state) == ([4], [(1, 3)])
+
+
+def test_parse_story_path():
+    assert parse_story_path("2.4") == (2, 4)
+    with pytest.raises(ValueError, match="EPIC.STORY"):
+        parse_story_path("2")
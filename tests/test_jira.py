@@ -0,0 +1,77 @@
+"""Retries of the Jira client."""
+import time
+from email.utils import formatdate
+
+import pytest
+
+pytest.importorskip("requests")
+
+from classes.errors import JiraExportError
+from classes.jira import BULK_PATH, JiraClient, parse_retry_after
+
+CREATED = {"issues": [{"key": "BABY-1"}], "errors": []}
+
+
+class Response:
+    """A canned HTTP response."""
+
+    def __init__(self, status_code, body=None, retry_after=None):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+        self.headers = {"Retry-After": retry_after} if retry_after else {}
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("no JSON")
+        return self.body
+
+
+class Session:
+    """Answers posts with canned responses, in order."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posts = 0
+
+    def post(self, url, json, timeout):
+        self.posts += 1
+        return self.responses.pop(0)
+
+
+def make_client(*responses):
+    client = JiraClient("http://jira.test")
+    client.session = Session(*responses)
+    return client
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("3") == 3.0
+    assert 50 < parse_retry_after(formatdate(time.time() + 60, usegmt=True))
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_throttled_bulk_create_is_sent_again():
+    client = make_client(
+        Response(429, retry_after="0"), Response(201, CREATED)
+    )
+    keys, errors = client.bulk_create([{"summary": "Epic"}])
+    assert keys == ["BABY-1"] and not errors
+    assert client.session.posts == 2
+
+
+def test_unavailable_bulk_create_is_not_sent_again():
+    date = formatdate(time.time(), usegmt=True)
+    client = make_client(Response(503, retry_after=date))
+    with pytest.raises(JiraExportError) as error:
+        client.bulk_create([{"summary": "Epic"}])
+    assert error.value.status == 503
+    assert client.session.posts == 1
+
+
+def test_unavailable_idempotent_request_is_sent_again():
+    client = make_client(Response(503, retry_after="0"), Response(200, {}))
+    assert client.post(BULK_PATH, {}, idempotent=True) == {}
+    assert client.session.posts == 2
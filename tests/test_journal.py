@@ -0,0 +1,107 @@
+"""Resuming a run from its journal."""
+import asyncio
+
+import pytest
+
+from classes.classes import AsyncOpenAIAgent
+from classes.errors import OpenAIAgentError, ProviderError
+from classes.journal import Journal
+from classes.model import Epic, Project, Story, Task
+from classes.providers import FakeProvider
+
+
+def make_agent(journal, respond=None, streaming=False):
+    return AsyncOpenAIAgent(
+        "model",
+        0.0,
+        100,
+        "key",
+        journal=journal,
+        provider=FakeProvider(4, respond),
+        streaming=streaming,
+    )
+
+
+def failing_on(text):
+    """Answers as FakeProvider does, but rejects the naming of ``text``."""
+    default = FakeProvider(4).default_response
+
+    def respond(prompt):
+        if "short name" in prompt and text in prompt:
+            raise ProviderError("rejected", retryable=False)
+        return default(prompt)
+
+    return respond
+
+
+def generate(agent, project):
+    asyncio.run(agent.arun(project))
+    return project
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_resume_regenerates_partial_story_lists(tmp_path, streaming):
+    path = str(tmp_path / "journal.jsonl")
+    agent = make_agent(
+        Journal(path), failing_on("Generated story 3"), streaming
+    )
+    with pytest.raises(OpenAIAgentError):
+        generate(agent, Project("P", "Build it"))
+
+    journal = Journal(path, resume=True)
+    project = journal.restore(Project("P", "Build it"))
+    assert [epic.epic_id for epic in project.epics] == [1, 2, 3, 4]
+    assert all(not epic.stories for epic in project.epics)
+
+    generate(make_agent(journal, streaming=streaming), project)
+    expected = generate(make_agent(None), Project("P", "Build it"))
+    assert project.to_dict() == expected.to_dict()
+    restored = Journal(path, resume=True).restore(Project("P", "Build it"))
+    assert restored.to_dict() == expected.to_dict()
+
+
+def test_resume_regenerates_partial_epic_list(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    agent = make_agent(Journal(path), failing_on("Generated epic 3"))
+    with pytest.raises(OpenAIAgentError):
+        generate(agent, Project("P", "Build it"))
+
+    journal = Journal(path, resume=True)
+    project = journal.restore(Project("P", "Build it"))
+    assert not project.epics
+
+    generate(make_agent(journal), project)
+    expected = generate(make_agent(None), Project("P", "Build it"))
+    assert project.to_dict() == expected.to_dict()
+
+
+def test_restore_keeps_complete_lists(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    epic = Epic(1, "Epic", "The epic")
+    story = Story(1, "Story", "The story", [Task(1, "Task", "The task")])
+    journal.record_epics([epic])
+    journal.record_complete()
+    journal.record_stories(epic, [story])
+    journal.record_complete(epic)
+    journal.record_tasks(epic, story)
+
+    project = journal.restore(Project("P", "Build it"))
+    assert project.epics[0].stories[0].tasks[0].name == "Task"
+
+
+def test_restore_drops_incomplete_lists_from_the_journal(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    first, second = Epic(1, "First", "One"), Epic(2, "Second", "Two")
+    story = Story(1, "Story", "The story", [Task(1, "Task", "The task")])
+    journal.record_epics([first, second])
+    journal.record_complete()
+    journal.record_stories(first, [story])
+    journal.record_tasks(first, story)
+    journal.record_stories(second, [story])
+    journal.record_complete(second)
+
+    project = journal.restore(Project("P", "Build it"))
+    assert not project.get_epic(1).stories
+    assert len(project.get_epic(2).stories) == 1
+    levels = [entry["level"] for entry in journal.entries()]
+    assert levels == ["epic", "epic", "complete", "story", "complete"]
@@ -0,0 +1,70 @@
+"""Per-call instrumentation hooks and collectors."""
+import asyncio
+import json
+
+from classes.classes import AsyncOpenAIAgent
+from classes.metrics import (
+    CallRecord,
+    JsonLinesCollector,
+    PrometheusCollector,
+    UsageCollector,
+    estimate_cost,
+)
+from classes.model import Project
+from classes.providers import FakeProvider
+
+
+def test_dated_models_use_their_base_price():
+    assert estimate_cost("gpt-4", 1000, 1000) == 0.09
+    assert estimate_cost("gpt-3.5-turbo-16k-0613", 1000, 0) == 0.003
+    assert estimate_cost("local-model", 1000, 1000) == 0.0
+
+
+def test_every_call_is_reported_to_the_hooks(tmp_path):
+    records = []
+    usage = UsageCollector()
+    lines = JsonLinesCollector(str(tmp_path / "calls.jsonl"))
+    agent = AsyncOpenAIAgent(
+        "gpt-3.5-turbo",
+        0.0,
+        100,
+        "key",
+        provider=FakeProvider(),
+        hooks=[records.append, usage],
+    )
+    agent.add_hook(lines)
+    asyncio.run(agent.arun(Project("P", "Build it")))
+    lines.close()
+
+    lists = [record for record in records if record.kind == "list"]
+    assert sorted(record.level for record in lists) == (
+        ["epic"] + ["story"] * 3 + ["task"] * 9
+    )
+    assert all(record.prompt_tokens > 0 for record in lists)
+    assert all(record.cost > 0 for record in lists)
+    assert usage.usage["task"][0] == sum(
+        record.level == "task" for record in records
+    )
+    with open(tmp_path / "calls.jsonl", encoding="utf-8") as file:
+        logged = [json.loads(line) for line in file]
+    assert [entry["level"] for entry in logged] == [r.level for r in records]
+
+
+def test_prometheus_counters_and_latency_histogram(tmp_path):
+    collector = PrometheusCollector(str(tmp_path / "metrics.prom"))
+    collector(CallRecord("task", "list", "gpt-4", 0.3, 10, 20, retries=2))
+    collector(CallRecord("task", "list", "gpt-4", cached=True))
+    collector(CallRecord("task", "name", "gpt-4", 12.0, error="failed"))
+    collector.close()
+
+    text = (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+    prefix = "babyagi_llm_"
+    labels = 'level="task",kind="list"'
+    assert f"{prefix}calls_total{{{labels}}} 2" in text
+    assert f"{prefix}cache_hits_total{{{labels}}} 1" in text
+    assert f"{prefix}retries_total{{{labels}}} 2" in text
+    assert f'{prefix}errors_total{{level="task",kind="name"}} 1' in text
+    # Cached calls stay out of the latency histogram.
+    assert f'{prefix}latency_seconds_bucket{{{labels},le="0.25"}} 0' in text
+    assert f'{prefix}latency_seconds_bucket{{{labels},le="0.5"}} 1' in text
+    assert f"{prefix}latency_seconds_count{{{labels}}} 1" in text
@@ -0,0 +1,59 @@
+"""Looking nodes of the project hierarchy up by ID."""
+from classes.model import Epic, Project, Story, Task
+
+
+def make_project():
+    story = Story(4, "Story", "The story", [Task(7, "Task", "The task")])
+    epics = [Epic(1, "First", "One"), Epic(3, "Third", "Three", [story])]
+    return Project("P", "Build it", epics)
+
+
+def test_nodes_are_found_by_id():
+    project = make_project()
+    epic = project.get_epic(3)
+    assert epic.name == "Third"
+    assert epic.get_story(4).name == "Story"
+    assert epic.get_story(4).get_task(7).name == "Task"
+    assert project.find(3) is epic
+    assert project.find(3, 4) is epic.stories[0]
+    assert project.find(3, 4, 7) is epic.stories[0].tasks[0]
+
+
+def test_missing_ids_are_not_found():
+    project = make_project()
+    assert project.get_epic(2) is None
+    assert project.get_epic(3).get_story(1) is None
+    assert project.get_epic(3).get_story(4).get_task(1) is None
+    assert project.find(2, 4) is None
+    assert project.find(3, 5, 7) is None
+    assert project.find(3, 4, 8) is None
+
+
+def test_replaced_children_are_found():
+    project = make_project()
+    epic = project.get_epic(3)
+    assert epic.get_story(4).name == "Story"
+    epic.stories[0] = Story(4, "New", "The new story")
+    assert epic.get_story(4).name == "New"
+    epic.stories[0] = Story(5, "Other", "Another story")
+    assert epic.get_story(4) is None
+    assert epic.get_story(5).name == "Other"
+    epic.stories = [Story(4, "Again", "Back again")]
+    assert project.find(3, 4).name == "Again"
+
+
+def test_edited_and_appended_ids_are_found():
+    project = make_project()
+    assert project.get_epic(1).name == "First"
+    project.epics[0].epic_id = 2
+    assert project.get_epic(1) is None
+    assert project.get_epic(2).name == "First"
+    project.epics.append(Epic(1, "Last", "Appended"))
+    assert project.get_epic(1).name == "Last"
+    project.epics.pop()
+    assert project.get_epic(1) is None
+
+
+def test_first_of_duplicate_ids_wins():
+    epic = Epic(1, "Epic", "The epic", [Story(1, "A", "a"), Story(1, "B", "b")])
+    assert epic.get_story(1).name == "A"
@@ -0,0 +1,93 @@
+"""Parsing of list responses."""
+import random
+
+import pytest
+
+from classes.parsing import ListStream, parse_json_items, parse_list
+
+RESPONSES = {
+    "numbered": "1. Set up the database\n2. Build the API\n3. Ship it",
+    "parenthesis": "1) Set up\n2) Build",
+    "emphasis": "**1.** Set up\n**2.** Build\n# 3. Ship",
+    "preamble": "Here are the stories:\n\n1. Set up\n2. Build\n\nGood luck!",
+    "bullets": "- Set up\n* Build\n• Ship",
+    "nested bullets": "1. Set up\n   - choose engine\n2. Build API\n3. Ship",
+    "flat bullets": "1. Set up\n- choose engine\n2. Build API",
+    "nested numbers": "1. Set up\n    1. choose engine\n2. Build API",
+    "indented list": "  1. Set up\n    - choose engine\n  2. Build API",
+    "nested plain bullets": "- Set up\n  - choose engine\n- Build API",
+    "repeated numbers": "1. Set up\n1. Build\n2. Ship",
+    "empty": "",
+}
+
+EXPECTED = {
+    "numbered": [
+        (1, "Set up the database"),
+        (2, "Build the API"),
+        (3, "Ship it"),
+    ],
+    "parenthesis": [(1, "Set up"), (2, "Build")],
+    "emphasis": [(1, "Set up"), (2, "Build"), (3, "Ship")],
+    "preamble": [(1, "Set up"), (2, "Build")],
+    "bullets": [(1, "Set up"), (2, "Build"), (3, "Ship")],
+    "nested bullets": [(1, "Set up"), (2, "Build API"), (3, "Ship")],
+    "flat bullets": [(1, "Set up"), (2, "Build API")],
+    "nested numbers": [(1, "Set up"), (2, "Build API")],
+    "indented list": [(1, "Set up"), (2, "Build API")],
+    "nested plain bullets": [(1, "Set up"), (2, "Build API")],
+    "repeated numbers": [(1, "Set up"), (1, "Build"), (2, "Ship")],
+    "empty": [],
+}
+
+
+@pytest.mark.parametrize("kind", sorted(RESPONSES))
+def test_parse_list(kind):
+    assert parse_list(RESPONSES[kind]) == EXPECTED[kind]
+
+
+def stream(chunks):
+    reported = []
+    parser = ListStream(lambda *item: reported.append(item))
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    assert reported == parser.items
+    return reported
+
+
+def split(text, rng):
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text), 5)))
+    return [text[i:j] for i, j in zip([0, *cuts], [*cuts, len(text)])]
+
+
+@pytest.mark.parametrize("kind", sorted(RESPONSES))
+def test_stream_finds_the_items_of_parse_list(kind):
+    rng = random.Random(kind)
+    response = RESPONSES[kind]
+    for _ in range(20):
+        assert stream(split(response, rng)) == parse_list(response)
+    assert stream(response) == parse_list(response)
+
+
+def test_stream_restart_reports_only_new_items():
+    reported = []
+    parser = ListStream(lambda *item: reported.append(item))
+    parser.feed("1. Set up\n2. Build\n3. Sh")
+    parser.restart()
+    parser.feed("1. Set up\n2. Build API\n3. Ship\n4. Run")
+    parser.close()
+    assert reported == [(1, "Set up"), (2, "Build"), (3, "Ship"), (4, "Run")]
+
+
+def test_parse_json_items_ignores_fences_and_numbers_missing_ids():
+    response = (
+        "```json\n"
+        '[{"id": 1, "name": "Setup", "description": "Set up"},'
+        ' {"description": "Build!"}, {"name": "No description"}]\n'
+        "```"
+    )
+    assert parse_json_items(response) == [
+        (1, "Set up", "Setup"),
+        (2, "Build", None),
+    ]
+    assert parse_json_items("1. Set up") is None
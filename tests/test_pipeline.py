@@ -0,0 +1,42 @@
+"""Generating a whole project in one pass."""
+import asyncio
+import os
+
+import pytest
+
+from classes.classes import AsyncOpenAIAgent
+from classes.errors import OpenAIAgentError, ProviderError
+from classes.model import Project
+from classes.providers import FakeProvider
+from classes.storage import load_project
+
+
+def make_agent(provider=None, **options):
+    provider = provider or FakeProvider()
+    return AsyncOpenAIAgent(
+        "model", 0.0, 100, "key", provider=provider, **options
+    )
+
+
+def rejecting(prompt):
+    if "create user stories" in prompt:
+        raise ProviderError("rejected", retryable=False)
+    return FakeProvider().default_response(prompt)
+
+
+def test_output_is_written_once_the_run_succeeds(tmp_path):
+    output = str(tmp_path / "tasks.yaml")
+    project = Project("P", "Build it")
+    asyncio.run(make_agent().arun(project, None, output))
+    assert load_project(output).to_dict() == project.to_dict()
+    assert os.listdir(tmp_path) == ["tasks.yaml"]
+
+
+def test_failed_run_keeps_the_previous_output(tmp_path):
+    output = tmp_path / "tasks.yaml"
+    output.write_text("previous run\n", encoding="utf-8")
+    agent = make_agent(FakeProvider(respond=rejecting))
+    with pytest.raises(OpenAIAgentError):
+        asyncio.run(agent.arun(Project("P", "Build it"), None, str(output)))
+    assert output.read_text(encoding="utf-8") == "previous run\n"
+    assert os.listdir(tmp_path) == ["tasks.yaml"]
@@ -0,0 +1,42 @@
+"""Generation of subtrees while the names are still pending."""
+import asyncio
+
+from classes.classes import AsyncOpenAIAgent
+from classes.model import Project
+from classes.providers import FakeProvider
+
+
+class HeldNamesProvider(FakeProvider):
+    """Holds every naming request until a task list has been requested."""
+
+    def __init__(self):
+        super().__init__()
+        self.tasks_requested = None
+
+    async def acomplete(self, messages, model, temperature, max_tokens, n=1):
+        if self.tasks_requested is None:
+            self.tasks_requested = asyncio.Event()
+        prompt = messages[-1]["content"]
+        if "create tasks" in prompt:
+            self.tasks_requested.set()
+        elif "short name" in prompt:
+            await self.tasks_requested.wait()
+        return self.complete(messages, model, temperature, max_tokens, n)
+
+
+def test_children_do_not_wait_for_names():
+    agent = AsyncOpenAIAgent(
+        "model", 0.0, 100, "key", provider=HeldNamesProvider()
+    )
+
+    async def run():
+        # Waiting for a name before generating children would deadlock.
+        return await asyncio.wait_for(
+            agent.arun(Project("P", "Build it")), timeout=10
+        )
+
+    project = asyncio.run(run())
+    stories = [story for epic in project.epics for story in epic.stories]
+    assert all(epic.name for epic in project.epics)
+    assert all(story.name for story in stories)
+    assert [len(story.tasks) for story in stories] == [3] * 9
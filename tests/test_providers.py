@@ -0,0 +1,106 @@
+"""Language model backends and their selection."""
+import argparse
+import asyncio
+import sys
+import types
+
+import pytest
+
+from classes.classes import AsyncOpenAIAgent
+from classes.errors import ProviderError
+from classes.model import Project
+from classes.providers import FakeProvider, LlamaCppProvider
+
+
+class Llama:
+    """Stands in for ``llama_cpp.Llama``, answering with a fixed list."""
+
+    loaded = []
+
+    def __init__(self, model_path, **options):
+        self.loaded.append(model_path)
+        self.options = options
+
+    def create_chat_completion(
+        self, messages, temperature, max_tokens, stream=False
+    ):
+        if not messages[-1]["content"]:
+            raise ValueError("empty prompt")
+        text = "1. Set up the database\n2. Build the API"
+        usage = {"prompt_tokens": 7, "completion_tokens": 9}
+        if stream:
+            return (
+                {"choices": [{"delta": {"content": line}}]}
+                for line in text.splitlines(keepends=True)
+            )
+        return {"choices": [{"message": {"content": text}}], "usage": usage}
+
+
+@pytest.fixture(name="llama")
+def fixture_llama(monkeypatch):
+    monkeypatch.setitem(
+        sys.modules, "llama_cpp", types.SimpleNamespace(Llama=Llama)
+    )
+    monkeypatch.setattr(LlamaCppProvider, "_models", {})
+    monkeypatch.setattr(LlamaCppProvider, "_locks", {})
+    monkeypatch.setattr(Llama, "loaded", [])
+    return Llama
+
+
+def test_llama_models_are_loaded_once_per_file(llama):
+    messages = [{"role": "user", "content": "List it"}]
+    first = LlamaCppProvider("models/model.gguf", n_ctx=2048)
+    completion = first.complete(messages, "ignored", 0.1, 100, n=2)
+    assert completion.choices[0].startswith("1. Set up")
+    assert len(completion.choices) == 2
+    assert (completion.prompt_tokens, completion.completion_tokens) == (7, 18)
+
+    LlamaCppProvider("models/model.gguf", n_ctx=2048).complete(
+        messages, "ignored", 0.1, 100
+    )
+    assert llama.loaded == ["models/model.gguf"]
+    assert first.llm.options["n_ctx"] == 2048
+
+
+def test_llama_errors_are_not_retried(llama):
+    provider = LlamaCppProvider("models/model.gguf")
+    with pytest.raises(ProviderError) as error:
+        provider.complete([{"role": "user", "content": ""}], "m", 0.1, 100)
+    assert not error.value.retryable
+    assert llama.loaded
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_agent_generates_with_a_local_model(llama, streaming):
+    agent = AsyncOpenAIAgent(
+        "model",
+        0.1,
+        100,
+        "key",
+        provider=LlamaCppProvider("models/model.gguf"),
+        streaming=streaming,
+    )
+    project = asyncio.run(agent.acreate_epics(Project("P", "Build it")))
+    assert [epic.description for epic in project.epics] == [
+        "Set up the database",
+        "Build the API",
+    ]
+    assert llama.loaded == ["models/model.gguf"]
+
+
+def test_provider_is_chosen_by_the_command_line_then_the_config():
+    pytest.importorskip("colorama")
+    # pylint: disable-next=import-outside-toplevel
+    from functions.functions import create_provider
+
+    config = {
+        "LLM_PROVIDER": "llama_cpp",
+        "LLAMA_MODEL_PATH": "models/model.gguf",
+        "LLAMA_N_CTX": 2048,
+    }
+    provider = create_provider(config, argparse.Namespace(provider=None), "")
+    assert isinstance(provider, LlamaCppProvider)
+    assert (provider.model_path, provider.n_ctx) == ("models/model.gguf", 2048)
+    assert provider.n_batch == 512
+    fake = create_provider(config, argparse.Namespace(provider="fake"), "")
+    assert isinstance(fake, FakeProvider)
@@ -0,0 +1,66 @@
+"""Ranking of candidate lists against their siblings."""
+import asyncio
+
+from classes.classes import AsyncOpenAIAgent
+from classes.model import Epic, Project, Story, Task
+from classes.providers import Completion, FakeProvider
+from classes.ranking import CandidateRanker
+
+REPEATED = "1. Set up the database\n2. Build the API\n3. Write the docs"
+FRESH = "1. Design the schema\n2. Add the login page\n3. Deploy the app"
+
+
+class CandidatesProvider(FakeProvider):
+    """Answers list prompts with a repeating and a fresh candidate."""
+
+    def complete(self, messages, model, temperature, max_tokens, n=1):
+        prompt = messages[-1]["content"]
+        if "create user stories" in prompt and n > 1:
+            return Completion([REPEATED, FRESH][:n])
+        return super().complete(messages, model, temperature, max_tokens, n)
+
+
+def make_agent(provider=None):
+    return AsyncOpenAIAgent(
+        "model",
+        0.0,
+        100,
+        "key",
+        provider=provider or FakeProvider(),
+        candidates=2,
+        ranker=CandidateRanker(min_items=1),
+    )
+
+
+def test_siblings_penalize_repeated_items():
+    agent = make_agent()
+    siblings = ["Set up the database", "Build the API", "Write the docs"]
+    assert agent.candidate_chooser("story")([REPEATED, FRESH]) == 0
+    assert agent.candidate_chooser("story", siblings)([REPEATED, FRESH]) == 1
+
+
+def test_siblings_are_the_nodes_of_other_parents():
+    first = Epic(1, "First", "One", [Story(1, "A", "Set up the database")])
+    second = Epic(2, "Second", "Two", [Story(1, "B", "Build the API")])
+    project = Project("P", "Build it", [first, second])
+    assert AsyncOpenAIAgent.story_siblings(project, first) == ["Build the API"]
+
+    first.stories.append(Story(2, "C", "Write", [Task(1, "T", "Test it")]))
+    story = first.stories[0]
+    assert AsyncOpenAIAgent.task_siblings(first, story) == ["Test it"]
+
+
+def test_story_lists_are_ranked_against_other_epics():
+    texts = ["Set up the database", "Build the API", "Write the docs"]
+    stories = [Story(i, "Name", text) for i, text in enumerate(texts, 1)]
+    existing = Epic(1, "First", "One", stories)
+    project = Project("P", "Build it", [existing, Epic(2, "Second", "Two")])
+    agent = make_agent(CandidatesProvider())
+    stories = asyncio.run(
+        agent.acreate_stories_from_epic(project, project.epics[1])
+    )
+    assert [story.description for story in stories] == [
+        "Design the schema",
+        "Add the login page",
+        "Deploy the app",
+    ]
@@ -0,0 +1,81 @@
+"""Client-side rate limiting and backoff."""
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from classes.classes import AsyncOpenAIAgent
+from classes.errors import ProviderError
+from classes.providers import FakeProvider
+from classes.ratelimit import RateLimiter, TokenBucket, backoff_delay
+
+# Limiter of the worker processes, installed by their initializer.
+_LIMITER = None
+
+
+class WordLimiter(RateLimiter):
+    """Counts words instead of tokenizer tokens."""
+
+    def count_tokens(self, text):
+        return len(text.split())
+
+
+def test_bucket_makes_callers_wait_once_empty():
+    bucket = TokenBucket(2, 1.0)
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(1) == pytest.approx(2.0, abs=0.05)
+
+
+def test_limiter_budgets_requests_and_tokens():
+    limiter = RateLimiter(requests_per_minute=60)
+    assert all(limiter.reserve("prompt", 100) == 0.0 for _ in range(60))
+    assert limiter.reserve("prompt", 100) == pytest.approx(1.0, abs=0.05)
+
+    limiter = WordLimiter(tokens_per_minute=600)
+    assert limiter.reserve("three word prompt", 297) == 0.0
+    assert limiter.reserve("three word prompt", 297) == 0.0
+    assert limiter.reserve("three word prompt", 297) > 29
+
+
+def test_rate_limit_errors_pause_every_caller():
+    limiter = RateLimiter(requests_per_minute=600)
+    agent = AsyncOpenAIAgent(
+        "model",
+        0.0,
+        100,
+        "key",
+        rate_limiter=limiter,
+        provider=FakeProvider(),
+    )
+    error = ProviderError("slow down", retry_after=5.0, rate_limited=True)
+    assert agent.retry_delay(0, error) == 5.0
+    assert limiter.reserve("prompt", 100) == pytest.approx(5.0, abs=0.05)
+
+    agent.retry_delay(0, ProviderError("failed", retry_after=30.0))
+    assert limiter.reserve("prompt", 100) < 5.0
+
+
+def test_backoff_prefers_retry_after_and_stays_under_the_cap():
+    assert backoff_delay(3, retry_after=2.5) == 2.5
+    delays = [backoff_delay(attempt, 1.0, 4.0) for attempt in range(10)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+
+
+def install_limiter(limiter):
+    global _LIMITER  # pylint: disable=global-statement
+    _LIMITER = limiter
+
+
+def reserve_in_worker(_):
+    return _LIMITER.reserve("prompt", 100)
+
+
+def test_shared_limiter_budgets_every_process():
+    limiter = RateLimiter(requests_per_minute=6, shared=True)
+    with ProcessPoolExecutor(
+        max_workers=2, initializer=install_limiter, initargs=(limiter,)
+    ) as executor:
+        delays = list(executor.map(reserve_in_worker, range(6)))
+    assert delays == [0.0] * 6
+    assert limiter.reserve("prompt", 100) > 9
@@ -0,0 +1,107 @@
+"""Ordering and limits of the request scheduler."""
+import asyncio
+
+import pytest
+
+from classes.classes import AsyncOpenAIAgent
+from classes.providers import FakeProvider
+from classes.scheduler import CURRENT_GROUP, Scheduler
+
+
+def grant_order(scheduler, requests):
+    """Queues requests behind a held slot and returns their grant order.
+
+    Args:
+        scheduler: The scheduler, with a concurrency of 1.
+        requests: (name, level, kind, group) tuples, in arrival order.
+    """
+    order = []
+
+    async def request(name, level, kind, group):
+        CURRENT_GROUP.set(group)
+        async with scheduler.slot(level, kind):
+            order.append(name)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("project", "summary"):
+                await gate.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(request(*r)) for r in requests]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, *waiting)
+
+    asyncio.run(main())
+    return order
+
+
+REQUESTS = [
+    ("task name", "task", "name", 1),
+    ("task list", "task", "list", 1),
+    ("story name", "story", "name", 1),
+    ("story list", "story", "list", 1),
+    ("epic list", "epic", "list", None),
+]
+
+
+def test_lists_are_granted_before_names():
+    assert grant_order(Scheduler(1), REQUESTS) == [
+        "epic list",
+        "story list",
+        "task list",
+        "story name",
+        "task name",
+    ]
+
+
+def test_fifo_grants_in_arrival_order():
+    order = grant_order(Scheduler(1, priority=False), REQUESTS)
+    assert order == [name for name, *_ in REQUESTS]
+
+
+def test_epics_are_served_in_turn():
+    requests = [(f"1.{i}", "task", "name", 1) for i in range(1, 4)]
+    requests += [(f"2.{i}", "task", "name", 2) for i in range(1, 3)]
+    assert grant_order(Scheduler(1), requests) == [
+        "1.1",
+        "2.1",
+        "1.2",
+        "2.2",
+        "1.3",
+    ]
+
+
+def test_level_limits_cap_requests_in_flight():
+    scheduler = Scheduler(3, {"task": 1})
+    peaks = {"task": 0, "all": 0}
+
+    async def request(level):
+        async with scheduler.slot(level, "name"):
+            peaks["task"] = max(peaks["task"], scheduler.running["task"])
+            peaks["all"] = max(peaks["all"], sum(scheduler.running.values()))
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(
+            *(request(level) for level in ["task"] * 4 + ["story"] * 2)
+        )
+
+    asyncio.run(main())
+    assert peaks == {"task": 1, "all": 3}
+    assert scheduler.running == {"task": 0, "story": 0}
+
+
+def test_config_without_concurrency_uses_the_agent_default():
+    pytest.importorskip("colorama")
+    # pylint: disable-next=import-outside-toplevel
+    from functions.functions import create_scheduler
+
+    agent = AsyncOpenAIAgent(
+        "model", 0.0, 100, "key", provider=FakeProvider()
+    )
+    assert create_scheduler({}).concurrency == agent.concurrency
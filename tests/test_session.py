@@ -0,0 +1,100 @@
+"""Chat sessions of the conversational mode."""
+import asyncio
+
+import pytest
+
+from classes import context
+from classes.classes import AsyncOpenAIAgent
+from classes.model import Project
+from classes.providers import FakeProvider
+from classes.session import ChatSession, SessionPolicy
+
+
+class WordEncoding:
+    """Counts words as tokens, standing in for tiktoken."""
+
+    @staticmethod
+    def encode(text):
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def fixture_words(monkeypatch):
+    monkeypatch.setattr(context, "encoding_for", lambda model: WordEncoding)
+
+
+class RecordingProvider(FakeProvider):
+    """Keeps the messages of every request."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def complete(self, messages, model, temperature, max_tokens, n=1):
+        self.requests.append(messages)
+        return super().complete(messages, model, temperature, max_tokens, n)
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_history_is_trimmed_after_the_pinned_exchange():
+    session = ChatSession("Shared context", words, max_turns=2)
+    for turn in range(4):
+        session.record(f"question {turn}", f"answer {turn}")
+    assert session.exchanges == [
+        ("question 0", "answer 0"),
+        ("question 3", "answer 3"),
+    ]
+    assert [m["role"] for m in session.messages("next")] == [
+        "system",
+        "user",
+        "assistant",
+        "user",
+        "assistant",
+        "user",
+    ]
+
+
+def test_history_is_kept_under_its_token_limit():
+    session = ChatSession("two words", words, max_tokens=10)
+    for turn in range(5):
+        session.record(f"question {turn}", f"answer {turn}")
+        assert session.tokens <= 10 or len(session.exchanges) == 1
+    assert session.exchanges[0] == ("question 0", "answer 0")
+    assert session.tokens == 2 + 4 + 4
+
+
+def test_epic_subtrees_are_generated_in_sessions():
+    provider = RecordingProvider()
+    agent = AsyncOpenAIAgent(
+        "model",
+        0.0,
+        100,
+        "key",
+        provider=provider,
+        conversation=SessionPolicy(max_turns=2),
+    )
+    project = asyncio.run(agent.arun(Project("P", "Build it")))
+    stories = [story for epic in project.epics for story in epic.stories]
+    assert [len(story.tasks) for story in stories] == [3] * 9
+
+    task_lists = [
+        messages
+        for messages in provider.requests
+        if "create tasks" in messages[-1]["content"]
+    ]
+    assert len(task_lists) == 9
+    for messages in task_lists:
+        assert messages[0]["role"] == "system"
+        assert "create user stories" in messages[1]["content"]
+        assert len(messages) <= 2 * 2 + 2
+    # One session per epic, opened by its story list.
+    systems = {messages[0]["content"] for messages in task_lists}
+    assert len(systems) == 3
+    assert systems == {
+        messages[0]["content"]
+        for messages in provider.requests
+        if "create user stories" in messages[-1]["content"]
+    }
@@ -0,0 +1,63 @@
+"""Modules imported by the light commands."""
+import json
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_startup import FORBIDDEN, PROBE, ROOT
+
+# The agent and what only generation needs, on top of the heavy backends.
+HEAVY = (*FORBIDDEN, "asyncio", "sqlite3", "classes.classes")
+
+
+def imported(code):
+    """Runs code in a fresh interpreter and lists the heavy modules loaded."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"{code}\nimport json, sys\n"
+            f"print(json.dumps(sorted(set(sys.modules) & {set(HEAVY)!r})))",
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_model_and_exporters_do_not_load_the_agent():
+    code = (
+        "import classes\n"
+        "from classes import Project\n"
+        "import classes.exporters, classes.storage, yaml2csv, yaml2jira"
+    )
+    assert imported(code) == []
+
+
+def test_package_exports_are_loaded_on_first_access():
+    assert imported("import classes\nclasses.Task") == []
+    assert "classes.classes" in imported("import classes\nclasses.OpenAIAgent")
+
+
+def test_export_command_imports_no_backend(tmp_path):
+    pytest.importorskip("colorama")
+    command = [
+        "babyagi.py",
+        "export",
+        "tasks_old.yaml",
+        "--format",
+        "csv",
+        "--output-dir",
+        str(tmp_path),
+    ]
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(command), json.dumps(HEAVY)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(result.stdout.splitlines()[-1]) == []
@@ -0,0 +1,81 @@
+"""Streaming reads and writes of project files."""
+import yaml
+
+from classes.model import Epic, Project, Story, Task
+from classes.storage import load_project, save_project
+from classes.streaming import LOADER, iter_nodes
+
+LONG = " ".join(["A description long enough to be wrapped"] * 8)
+
+
+def make_project():
+    tasks = [
+        Task(1, "Schema", LONG),
+        Task(2, "Quoted", "yes"),
+        Task(3, "Number", "12"),
+    ]
+    stories = [
+        Story(1, "Story: colon", "Multi\nline\n  indented", tasks),
+        Story(2, "Empty", "No tasks yet"),
+    ]
+    epics = [
+        Epic(1, "Épique", "Unicode — «quoted» text", stories),
+        Epic(3, "Empty", "No stories yet"),
+    ]
+    return Project("P", LONG, epics)
+
+
+def test_streamed_yaml_loads_as_a_single_dump(tmp_path):
+    project = make_project()
+    path = tmp_path / "tasks.yaml"
+    project.save_to_yaml(str(path))
+    expected = yaml.safe_load(
+        yaml.safe_dump({"project": project.to_dict()}, sort_keys=False)
+    )
+    with open(path, encoding="utf-8") as file:
+        assert yaml.load(file, Loader=LOADER) == expected
+    assert load_project(str(path)).to_dict() == project.to_dict()
+
+
+def test_iter_nodes_yields_the_document_order(tmp_path):
+    path = str(tmp_path / "tasks.yaml")
+    make_project().save_to_yaml(path)
+    assert [level for level, _ in iter_nodes(path)] == [
+        "project",
+        "epic",
+        "story",
+        "task",
+        "task",
+        "task",
+        "story",
+        "epic",
+    ]
+
+
+def test_json_lines_round_trip(tmp_path):
+    project = make_project()
+    path = str(tmp_path / "tasks.jsonl")
+    save_project(project, path)
+    assert load_project(path).to_dict() == project.to_dict()
+
+
+def test_epic_rooted_file_loads_as_a_project(tmp_path):
+    path = tmp_path / "epic.yaml"
+    path.write_text(
+        "epic:\n"
+        "  name: CryptoNews\n"
+        "  description: Follow the news\n"
+        "  stories:\n"
+        "  - story_id: 1\n"
+        "    name: Connect\n"
+        "    description: Connect to the API\n"
+        "    tasks:\n"
+        "    - task_id: 1\n"
+        "      name: Client\n"
+        "      description: Write the client\n",
+        encoding="utf-8",
+    )
+    project = load_project(str(path))
+    assert project.name == "CryptoNews"
+    assert project.description == "Follow the news"
+    assert project.find(1, 1, 1).name == "Client"
@@ -1,60 +1,27 @@
 """
-This script converts an epic, stories, and tasks from a YAML file to a CSV format 
-that can be imported into Jira.
+This script converts a project's epics, stories and tasks from a YAML file
+to a CSV format that can be imported into Jira. See ``babyagi jira`` to
+create the issues directly and ``babyagi export`` for the other formats.
 """
 
-import csv
-
-import yaml
+from classes.exporters import JiraCsvSink, export_project
 
 
 def yaml_to_jira_csv(yaml_file, csv_file):
     """
     Convert YAML data to Jira-friendly CSV format.
 
+    The YAML file is read node by node, so rows are written as soon as
+    they are parsed and memory stays flat for large projects. Both
+    "project" files and single "epic" files are supported, as are the
+    JSON lines project files written by the generator scripts.
+
     Parameters:
-    yaml_file (str): The path of the YAML file.
+    yaml_file (str): The path of the YAML or JSON lines file.
     csv_file (str): The path of the output CSV file.
     """
-    # Read YAML data
-    with open(yaml_file, "r") as yf:
-        yaml_data = yaml.safe_load(yf)
-
-    # Open a CSV file for writing
-    with open(csv_file, "w", newline="") as cf:
-        csv_writer = csv.writer(cf)
-
-        # Write the CSV header
-        csv_writer.writerow(
-            ["Issue Id", "Issue Type", "Parent Id", "Summary", "Description"]
-        )
-
-        # Write epic data
-        epic = yaml_data.get("epic", {})
-        epic_name = epic.get("name", "")
-        epic_desc = epic.get("description", "")
-        csv_writer.writerow(["", "Epic", "", epic_name, epic_desc])
-        epic_id = epic_name  # Assuming epic name to be unique for a Parent ID placeholder
-
-        # Write stories and tasks data
-        stories = epic.get("stories", [])
-        for story in stories:
-            story_id = story.get("story_id", "")
-            story_name = story.get("name", "")
-            story_desc = story.get("description", "")
-            csv_writer.writerow(
-                [story_id, "Story", epic_id, story_name, story_desc]
-            )
-
-            tasks = story.get("tasks", [])
-            for task in tasks:
-                task_id = task.get("task_id", "")
-                task_name = task.get("name", "")
-                task_desc = task.get("description", "")
-                csv_writer.writerow(
-                    [task_id, "Task", story_id, task_name, task_desc]
-                )
+    export_project(yaml_file, [JiraCsvSink(csv_file)])
 
 
 if __name__ == "__main__":
-    yaml_to_jira_csv("epic.yaml", "jira_output.csv")
+    yaml_to_jira_csv("tasks.yaml", "jira_output.csv")